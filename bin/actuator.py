@@ -0,0 +1,216 @@
+import os
+import abc
+import time
+import threading
+
+import pyautogui
+
+# ---------------------
+# 마우스 / 키보드 입력 백엔드
+# ---------------------
+# 클릭 / 단축키는 모두 이 모듈을 거침 (macro, generator, schedular)
+# - "pyautogui": pyautogui 사용, 호출마다 붙는 전역 PAUSE(기본 0.1초)는 건너뜀
+# - "xtest": X11 XTest 확장으로 이벤트를 직접 보냄, 연속된 동작은 한 번에 보내고 sync 한 번 (python-xlib 필요)
+# - "mock": 실제 입력 없이 동작만 기록 (화면 없는 테스트용)
+# 동작 사이 대기는 ("sleep", 초) 동작으로 함께 넘겨서 한 묶음으로 실행
+
+try:
+    from Xlib import X, XK
+    from Xlib import display as xdisplay
+    from Xlib.ext import xtest
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
+
+# 사용할 백엔드 ("auto" / "pyautogui" / "xtest" / "mock")
+# auto: X11 화면이 있고 python-xlib이 설치되어 있으면 xtest, 아니면 pyautogui
+ACTUATOR_BACKEND = "auto"
+
+# pyautogui 키 이름 → X keysym 이름
+XTEST_KEY_NAMES = {
+    "ctrl": "Control_L",
+    "shift": "Shift_L",
+    "alt": "Alt_L",
+    "enter": "Return",
+    "esc": "Escape",
+    "tab": "Tab",
+    "backspace": "BackSpace",
+}
+
+
+class Actuator(abc.ABC):
+    """
+    입력 백엔드 기본 클래스
+    동작: ("click", x, y) / ("hotkey", key, ...) / ("sleep", 초)
+    """
+    name = "base"
+
+    def run(self, actions: list):
+        """동작을 순서대로 실행"""
+        for action in actions:
+            if action[0] == "sleep":
+                time.sleep(action[1])
+            else:
+                self._perform(action)
+
+    @abc.abstractmethod
+    def _perform(self, action: tuple):
+        """대기가 아닌 동작 하나 실행 (백엔드마다 구현, 없으면 생성할 때 TypeError)"""
+
+
+class PyAutoGuiActuator(Actuator):
+    """pyautogui 백엔드 (호출마다 붙는 PAUSE 없음)"""
+    name = "pyautogui"
+
+    def _perform(self, action: tuple):
+        if action[0] == "click":
+            pyautogui.click(action[1], action[2], _pause=False)
+        elif action[0] == "hotkey":
+            pyautogui.hotkey(*action[1:], _pause=False)
+        else:
+            raise ValueError(f"알 수 없는 동작: {action[0]}")
+
+
+class XTestActuator(Actuator):
+    """X11 XTest 백엔드 (연속된 동작은 sync 한 번으로 보냄)"""
+    name = "xtest"
+
+    def __init__(self):
+        self._display = xdisplay.Display()
+        self._keycodes = {}
+        self._lock = threading.Lock()
+
+    def _keycode(self, key: str) -> int:
+        keycode = self._keycodes.get(key)
+        if keycode is None:
+            keysym = XK.string_to_keysym(XTEST_KEY_NAMES.get(key, key))
+            keycode = self._display.keysym_to_keycode(keysym)
+            if not keycode:
+                raise ValueError(f"알 수 없는 키: {key}")
+            self._keycodes[key] = keycode
+        return keycode
+
+    def _perform(self, action: tuple):
+        if action[0] == "click":
+            xtest.fake_input(self._display, X.MotionNotify, x=action[1], y=action[2])
+            xtest.fake_input(self._display, X.ButtonPress, 1)
+            xtest.fake_input(self._display, X.ButtonRelease, 1)
+        elif action[0] == "hotkey":
+            keycodes = [self._keycode(key) for key in action[1:]]
+            for keycode in keycodes:
+                xtest.fake_input(self._display, X.KeyPress, keycode)
+            for keycode in reversed(keycodes):
+                xtest.fake_input(self._display, X.KeyRelease, keycode)
+        else:
+            raise ValueError(f"알 수 없는 동작: {action[0]}")
+
+    def run(self, actions: list):
+        with self._lock:
+            for action in actions:
+                if action[0] == "sleep":
+                    # 대기 전에 쌓인 이벤트를 보내야 화면이 반응함
+                    self._display.sync()
+                    time.sleep(action[1])
+                else:
+                    self._perform(action)
+            self._display.sync()
+
+
+class RecordingActuator(Actuator):
+    """실제 입력 없이 동작을 기록 (대기도 기록만 하고 기다리지 않음)"""
+    name = "mock"
+
+    def __init__(self):
+        self.calls = []
+
+    def run(self, actions: list):
+        now = time.perf_counter()
+        self.calls.extend((now, action) for action in actions)
+
+    def _perform(self, action: tuple):
+        self.calls.append((time.perf_counter(), action))
+
+
+_actuator = None
+_actuator_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"batches": 0, "actions": 0, "input_sec": 0.0}  # input_sec: 대기를 뺀 입력 시간
+
+
+def _create_actuator(backend: str) -> Actuator:
+    if backend == "auto":
+        backend = "xtest" if XLIB_AVAILABLE and os.environ.get("DISPLAY") else "pyautogui"
+    if backend == "xtest":
+        if not XLIB_AVAILABLE:
+            raise RuntimeError("xtest 백엔드에는 python-xlib이 필요합니다")
+        try:
+            return XTestActuator()
+        except Exception as e:
+            print(f"[actuator] [ERROR] X11 연결 실패, pyautogui 사용: {e}")
+            return PyAutoGuiActuator()
+    if backend == "pyautogui":
+        return PyAutoGuiActuator()
+    if backend == "mock":
+        return RecordingActuator()
+    raise ValueError(f"알 수 없는 입력 백엔드: {backend}")
+
+
+def get_actuator() -> Actuator:
+    """현재 입력 백엔드 (처음 호출 시 ACTUATOR_BACKEND로 생성)"""
+    global _actuator
+    with _actuator_lock:
+        if _actuator is None:
+            _actuator = _create_actuator(ACTUATOR_BACKEND)
+            print(f"[actuator] 입력 백엔드: {_actuator.name}")
+        return _actuator
+
+
+def set_backend(backend: str) -> Actuator:
+    """입력 백엔드 교체 (테스트에서 "mock"으로 바꿀 때 사용)"""
+    global _actuator, ACTUATOR_BACKEND
+    actuator = _create_actuator(backend)
+    with _actuator_lock:
+        ACTUATOR_BACKEND = backend
+        _actuator = actuator
+    print(f"[actuator] 입력 백엔드: {actuator.name}")
+    return actuator
+
+
+def run(actions: list):
+    """
+    동작 묶음 실행
+
+    사용 예:
+        actuator.run([("click", x, y), ("sleep", 0.1), ("hotkey", "ctrl", "a")])
+    """
+    start = time.perf_counter()
+    get_actuator().run(actions)
+    elapsed = time.perf_counter() - start
+    sleep_sec = sum(action[1] for action in actions if action[0] == "sleep")
+    with _stats_lock:
+        _stats["batches"] += 1
+        _stats["actions"] += sum(1 for action in actions if action[0] != "sleep")
+        _stats["input_sec"] += max(0.0, elapsed - sleep_sec)
+
+
+def click(x: int, y: int):
+    run([("click", x, y)])
+
+
+def double_click(x: int, y: int, interval: float = 0.3):
+    """interval 간격으로 두 번 클릭"""
+    run([("click", x, y), ("sleep", interval), ("click", x, y)])
+
+
+def hotkey(*keys: str):
+    run([("hotkey", *keys)])
+
+
+def get_actuator_stats() -> dict:
+    """입력 통계 반환 (동작당 평균 입력 시간 포함, 대기 제외)"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["backend"] = _actuator.name if _actuator is not None else None
+    stats["avg_action_ms"] = stats["input_sec"] / stats["actions"] * 1000 if stats["actions"] else 0.0
+    return stats
@@ -0,0 +1,258 @@
+import os
+import glob
+import json
+import random
+import hashlib
+import argparse
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+import macro
+
+# ---------------------
+# 짧은 맞장구 답장 로컬 검색
+# ---------------------
+# convert2.py가 만든 학습 JSONL에서 (관계, 상대방 최근 메시지 → 이가을 답장) 예시를 모아
+# 관계별로 해시 문자 n-gram 벡터 인덱스를 만들고, 최근 상대방 메시지와 아주 비슷한 예시의
+# 답장이 짧은 맞장구("ㅇㅋ", "웅웅<split>알겠어" 등)이면 제네레이터 호출 없이 바로 사용
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 학습 JSONL 경로 패턴 (convert2.py 출력 파일)
+CANNED_TRAINING_GLOB = os.path.join(BASE_DIR, "..", "데이터 라벨링", "*.jsonl")
+
+CANNED_ENABLED = True
+CANNED_QUERY_MESSAGES = 2  # 비교할 상대방 최근 메시지 수
+CANNED_MAX_REPLY_CHARS = 12  # 로컬 답장으로 쓸 수 있는 답장 길이 (<split> 제외)
+CANNED_MAX_REPLY_SEGMENTS = 2
+CANNED_MIN_SIMILARITY = 0.85  # 이 코사인 유사도 이상인 예시만 후보
+CANNED_MIN_CANDIDATES = 2  # 후보가 이 수 이상일 때만 (우연히 하나만 비슷한 경우 제외)
+CANNED_SKIP_QUESTIONS = True  # 마지막 메시지가 질문이면 맞장구로 답하지 않음
+
+# 후보 중 답장 선택 방식: "top" (가장 비슷한 예시) / "sample" (유사도 가중 무작위)
+CANNED_SAMPLING = "sample"
+CANNED_SAMPLE_TOP_K = 5
+CANNED_SAMPLE_TEMPERATURE = 0.05  # 작을수록 가장 비슷한 예시에 몰림
+CANNED_SERVE_RATE = 1.0  # 조건을 만족해도 이 확률로만 로컬 답장 (나머지는 LLM, 비교용)
+
+NGRAM_SIZES = (1, 2, 3)
+VECTOR_DIM = 4096
+SELF_NAME = "이가을"
+SPLIT_TOKEN = "<split>"
+
+# {relationship: {"vectors": np.ndarray (n, VECTOR_DIM), "replies": [str]}}
+_index = {}
+_index_lock = threading.Lock()
+_index_loaded = False
+_build_lock = threading.Lock()
+_build_thread = None
+
+_stats_lock = threading.Lock()
+_stats = {
+    "lookups": 0,
+    "served": 0,  # 로컬 답장으로 처리한 수
+    "no_query": 0,  # 답할 상대방 메시지가 없음
+    "no_index": 0,  # 관계에 해당하는 인덱스가 없음
+    "low_similarity": 0,  # 비슷한 예시가 부족
+    "sampled_out": 0,  # 조건은 만족했지만 CANNED_SERVE_RATE 표본에서 빠져 LLM으로 넘김
+    "skipped_question": 0,
+    "lookup_time_us": 0.0,
+}
+
+
+def _ngram_bucket(gram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little") % VECTOR_DIM
+
+
+def vectorize(text: str) -> np.ndarray:
+    """문자 n-gram을 VECTOR_DIM 차원으로 해싱한 L2 정규화 벡터"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    text = " ".join(text.split())
+    for size in NGRAM_SIZES:
+        for i in range(len(text) - size + 1):
+            vector[_ngram_bucket(text[i:i + size])] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def query_text(messages: list) -> Optional[str]:
+    """
+    마지막 이가을 발화 이후 상대방 메시지 중 최근 CANNED_QUERY_MESSAGES개를 이어 붙인 검색어
+    (마지막 발화가 이가을이거나 상대방 메시지가 없으면 None)
+    """
+    burst = []
+    for message in reversed(messages):
+        if message["speaker"] == SELF_NAME:
+            break
+        burst.append(message["text"])
+    if not burst:
+        return None
+    return " / ".join(reversed(burst[:CANNED_QUERY_MESSAGES]))
+
+
+def _is_short_reply(reply: str) -> bool:
+    segments = [segment for segment in reply.split(SPLIT_TOKEN) if segment.strip()]
+    return 0 < len(segments) <= CANNED_MAX_REPLY_SEGMENTS and sum(len(s.strip()) for s in segments) <= CANNED_MAX_REPLY_CHARS
+
+
+def _load_examples(paths: list) -> dict:
+    """학습 JSONL에서 {relationship: [(검색어, 답장)]} 추출 (짧은 답장만)"""
+    examples = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages = json.loads(line)["messages"]
+                except (ValueError, KeyError):
+                    continue
+                user = next((m["content"] for m in messages if m["role"] == "user"), "")
+                reply = next((m["content"] for m in messages if m["role"] == "assistant"), "")
+                if not user or not _is_short_reply(reply):
+                    continue
+                # user 내용: 첫 줄은 관계, 나머지는 "[화자] [시간] 내용" 줄
+                relationship, _, context = user.partition("\n")
+                query = query_text(macro.parse_chat_messages(context))
+                if query:
+                    examples.setdefault(relationship.strip(), []).append((query, reply.strip()))
+    return examples
+
+
+def build_index(paths: Optional[list] = None) -> dict:
+    """
+    학습 JSONL로 관계별 인덱스 생성 후 교체
+
+    Returns:
+        dict: {relationship: 예시 수}
+    """
+    global _index_loaded
+    if paths is None:
+        paths = sorted(glob.glob(CANNED_TRAINING_GLOB))
+
+    start = time.perf_counter()
+    index = {}
+    for relationship, items in _load_examples(paths).items():
+        index[relationship] = {
+            "vectors": np.stack([vectorize(query) for query, _ in items]),
+            "replies": [reply for _, reply in items],
+        }
+    with _index_lock:
+        _index.clear()
+        _index.update(index)
+        _index_loaded = True
+
+    sizes = {relationship: len(item["replies"]) for relationship, item in index.items()}
+    print(f"[canned] 인덱스 생성: {len(paths)}개 파일, {sizes} ({(time.perf_counter() - start)*1000:.0f}ms)")
+    return sizes
+
+
+def _ensure_index() -> bool:
+    """
+    인덱스가 준비되었는지 확인 (처음 호출 시 백그라운드 스레드에서 생성 시작)
+    이벤트 루프에서 호출되므로 생성이 끝날 때까지 기다리지 않음
+    """
+    global _build_thread
+    if _index_loaded:
+        return True
+    with _build_lock:
+        if _build_thread is None:
+            _build_thread = threading.Thread(target=build_index, daemon=True)
+            _build_thread.start()
+    return False
+
+
+def _choose(similarities: np.ndarray, candidates: np.ndarray, replies: list) -> str:
+    """후보 중 답장 하나 선택 (CANNED_SAMPLING)"""
+    order = candidates[np.argsort(-similarities[candidates])][:CANNED_SAMPLE_TOP_K]
+    if CANNED_SAMPLING == "top":
+        return replies[order[0]]
+    weights = np.exp((similarities[order] - similarities[order[0]]) / CANNED_SAMPLE_TEMPERATURE)
+    return replies[random.choices(list(order), weights=weights.tolist())[0]]
+
+
+def lookup(message_context: str, relationship: str) -> Optional[dict]:
+    """
+    로컬 답장 검색
+
+    Args:
+        message_context: 채팅 내용 (날짜 줄 제거된 상태)
+        relationship: 관계 유형
+
+    Returns:
+        dict: {"reply", "similarity", "candidates", "elapsed_us"} 또는 None (LLM으로 생성해야 할 때)
+    """
+    if not CANNED_ENABLED or not _ensure_index():
+        return None
+
+    start = time.perf_counter()
+    result = None
+    reason = None
+    messages = macro.parse_chat_messages(message_context)
+    query = query_text(messages)
+    with _index_lock:
+        item = _index.get(relationship)
+
+    if query is None:
+        reason = "no_query"
+    elif item is None:
+        reason = "no_index"
+    elif CANNED_SKIP_QUESTIONS and messages[-1]["text"].rstrip().endswith(("?", "？")):
+        reason = "skipped_question"
+    else:
+        similarities = item["vectors"] @ vectorize(query)
+        candidates = np.flatnonzero(similarities >= CANNED_MIN_SIMILARITY)
+        if len(candidates) < CANNED_MIN_CANDIDATES:
+            reason = "low_similarity"
+        elif random.random() >= CANNED_SERVE_RATE:
+            reason = "sampled_out"
+        else:
+            result = {
+                "reply": _choose(similarities, candidates, item["replies"]),
+                "similarity": float(similarities[candidates].max()),
+                "candidates": int(len(candidates)),
+            }
+
+    elapsed_us = (time.perf_counter() - start) * 1_000_000
+    with _stats_lock:
+        _stats["lookups"] += 1
+        _stats["lookup_time_us"] += elapsed_us
+        if result is not None:
+            _stats["served"] += 1
+        else:
+            _stats[reason] += 1
+
+    if result is not None:
+        result["elapsed_us"] = elapsed_us
+        print(f"[canned] 로컬 답장: {result['reply']!r} (유사도 {result['similarity']:.2f}, "
+              f"후보 {result['candidates']}개, {elapsed_us:.0f}us)")
+    return result
+
+
+def get_canned_stats() -> dict:
+    """로컬 답장 통계 반환 (처리 비율, 평균 검색 시간 포함)"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["served_rate"] = stats["served"] / stats["lookups"] if stats["lookups"] else 0.0
+    stats["avg_time_us"] = stats["lookup_time_us"] / stats["lookups"] if stats["lookups"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="학습 JSONL 기반 로컬 답장 검색 확인")
+    parser.add_argument("--data", action="append", help="학습 JSONL 경로, 여러 번 지정 가능 (기본: 데이터 라벨링/*.jsonl)")
+    parser.add_argument("--relationship", default="FRIEND")
+    parser.add_argument("message", nargs="*", help="상대방 메시지 (여러 개면 순서대로)")
+    args = parser.parse_args()
+
+    build_index(args.data or None)
+    if args.message:
+        context = "\n".join(f"[상대] [오후 1:00] {text}" for text in args.message)
+        print(lookup(context, args.relationship))
+
+
+if __name__ == "__main__":
+    main()
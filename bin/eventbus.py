@@ -0,0 +1,254 @@
+import time
+import heapq
+import queue
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+# ---------------------
+# 이벤트 버스 + 고정 크기 작업 풀
+# ---------------------
+# 감지 / 결정 / 전송 / 종료 같은 일은 타입이 있는 이벤트로 발행하고, 처리 함수는 시작할 때 한 번만 등록
+# 처리 함수와 백그라운드 작업은 크기가 정해진 작업 풀에서 실행 (요청마다 스레드를 새로 만들지 않음)
+# - "events": 이벤트 처리 함수
+# - "rooms": 지연 큐에서 채팅방 열기 (한 번에 하나)
+# - "watch": 열린 채팅방 감시 루프 (한 번에 하나, 이전 감시가 끝나야 다음 감시 시작)
+# - "background": stale 생성, shadow 검증, 전송 후 finish 등
+# 지연 실행(call_later)은 타이머 스레드 하나가 모두 처리
+# 풀별 대기 / 실행 중 작업 수는 get_eventbus_stats()로 확인
+
+POOL_SIZES = {
+    "events": 2,
+    "rooms": 1,
+    "watch": 1,
+    "background": 4,
+}
+
+# 이 이상 쌓이면 로그로 남김 (처리가 밀리고 있음)
+POOL_QUEUE_WARN = 20
+
+
+# ---- 이벤트 ----
+
+@dataclass(frozen=True)
+class RegionChanged:
+    """감시 영역 변화로 채팅방 내용을 새로 복사함 (watcher / 지연 큐 / 채팅방 감시)"""
+    title_key: str
+    content: str
+
+
+@dataclass(frozen=True)
+class TranscriptDelta:
+    """PREVIEW_DICT의 채팅방 대화 내용이 바뀜"""
+    title_key: str
+    content: str
+    version: int
+
+
+@dataclass(frozen=True)
+class DecisionMade:
+    """스케줄러가 태그를 결정함 (<INSTANT> / <WAIT> / <FINISH>)"""
+    title_key: str
+    tag: str
+
+
+@dataclass(frozen=True)
+class ReplySent:
+    """답장 전송 후 확인까지 끝남"""
+    title_key: str
+    changed: bool  # 전송 중 상대방 발화가 있었는지
+
+
+@dataclass(frozen=True)
+class RoomFinished:
+    """finish 액션으로 채팅방 처리가 끝남"""
+    title_key: str
+
+
+@dataclass(frozen=True)
+class RoomStuck:
+    """채팅방이 한 상태에 제한 시간보다 오래 머묾 (roomstate)"""
+    title_key: str
+    state: str
+    elapsed: float
+
+
+# ---- 작업 풀 ----
+
+class WorkerPool:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._stats = {"submitted": 0, "completed": 0, "errors": 0, "max_queued": 0, "wait_sec": 0.0}
+        self._threads = []
+
+    def _ensure_threads(self):
+        """작업자 스레드 시작 (_lock을 잡은 상태, 처음 submit할 때 한 번)"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """작업 추가 (바로 반환, 작업자가 비면 실행)"""
+        with self._lock:
+            self._ensure_threads()
+            self._stats["submitted"] += 1
+            queued = self._queue.qsize() + 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], queued)
+        self._queue.put((time.perf_counter(), fn, args, kwargs))
+        if queued == POOL_QUEUE_WARN:
+            print(f"[eventbus] [{self.name}] 대기 작업 {queued}개 (작업자 {self.workers}개)")
+
+    def _work(self):
+        while True:
+            enqueued, fn, args, kwargs = self._queue.get()
+            with self._lock:
+                self._active += 1
+                self._stats["wait_sec"] += time.perf_counter() - enqueued
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                print(f"[eventbus] [{self.name}] [ERROR] 작업 {getattr(fn, '__name__', fn)} 실행 중 오류: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._stats["completed"] += 1
+
+    def get_stats(self) -> dict:
+        """대기 / 실행 중 작업 수와 누적 통계"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+        stats["queued"] = self._queue.qsize()
+        stats["workers"] = self.workers
+        stats["avg_wait_sec"] = stats["wait_sec"] / stats["completed"] if stats["completed"] else 0.0
+        return stats
+
+
+# ---- 지연 실행 ----
+
+class TimerQueue:
+    """call_later용 타이머 스레드 하나 (만료되면 작업 풀에 넘김)"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # [(deadline, seq, timer)]
+        self._timers = []
+        self._seq = itertools.count()
+        self._thread = None
+
+    def call_later(self, delay: float, pool: str, fn: Callable, *args, **kwargs) -> Callable[[], bool]:
+        """
+        delay초 뒤 pool에서 fn 실행
+
+        Returns:
+            취소 함수 (아직 실행되지 않았으면 취소하고 True)
+        """
+        timer = {"pool": pool, "fn": fn, "args": args, "kwargs": kwargs, "cancelled": False, "fired": False}
+        with self._cond:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._seq), timer))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="timers", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+        def cancel() -> bool:
+            with self._cond:
+                if timer["fired"] or timer["cancelled"]:
+                    return False
+                timer["cancelled"] = True
+                return True
+        return cancel
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    timeout = self._timers[0][0] - time.monotonic() if self._timers else None
+                    self._cond.wait(timeout)
+                _, _, timer = heapq.heappop(self._timers)
+                if timer["cancelled"]:
+                    continue
+                timer["fired"] = True
+            POOLS[timer["pool"]].submit(timer["fn"], *timer["args"], **timer["kwargs"])
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for _, _, timer in self._timers if not timer["cancelled"])
+
+
+# ---- 이벤트 버스 ----
+
+class EventBus:
+    def __init__(self, pool: str = "events"):
+        self.pool = pool
+        self._handlers = {}  # {event_type: [handler]}
+        self._lock = threading.Lock()
+        self._published = {}  # {event_type 이름: 발행 수}
+
+    def subscribe(self, event_type: type, handler: Callable):
+        """event_type 이벤트 처리 함수 등록 (시작할 때 한 번)"""
+        with self._lock:
+            self._handlers.setdefault(event_type, []).append(handler)
+
+    def publish(self, event):
+        """이벤트 발행 (바로 반환, 처리 함수는 작업 풀에서 실행)"""
+        with self._lock:
+            handlers = list(self._handlers.get(type(event), []))
+            name = type(event).__name__
+            self._published[name] = self._published.get(name, 0) + 1
+        for handler in handlers:
+            POOLS[self.pool].submit(handler, event)
+
+    def get_published(self) -> dict:
+        with self._lock:
+            return dict(self._published)
+
+
+POOLS = {name: WorkerPool(name, workers) for name, workers in POOL_SIZES.items()}
+TIMERS = TimerQueue()
+BUS = EventBus()
+
+
+def publish(event):
+    """BUS.publish 단축 함수"""
+    BUS.publish(event)
+
+
+def subscribe(event_type: type, handler: Callable):
+    """BUS.subscribe 단축 함수"""
+    BUS.subscribe(event_type, handler)
+
+
+def run_in_pool(pool: str, fn: Callable, *args, **kwargs):
+    """작업 풀에서 fn 실행 (스레드를 새로 만들지 않음)"""
+    POOLS[pool].submit(fn, *args, **kwargs)
+
+
+def call_later(delay: float, pool: str, fn: Callable, *args, **kwargs) -> Callable[[], bool]:
+    """TIMERS.call_later 단축 함수"""
+    return TIMERS.call_later(delay, pool, fn, *args, **kwargs)
+
+
+def get_eventbus_stats() -> dict:
+    """
+    풀별 대기 / 실행 중 작업 수, 대기 중인 타이머 수, 이벤트별 발행 수 반환
+
+    Returns:
+        dict: {"pools": {name: {"queued", "active", "workers", ...}}, "timers", "events", "threads"}
+    """
+    return {
+        "pools": {name: pool.get_stats() for name, pool in POOLS.items()},
+        "timers": TIMERS.pending(),
+        "events": BUS.get_published(),
+        "threads": threading.active_count(),
+    }
@@ -0,0 +1,219 @@
+import re
+import time
+import random
+import threading
+from typing import Optional
+
+import macro
+
+# ---------------------
+# 스케줄러 앞단 로컬 분류기
+# ---------------------
+# 프롬프트(schedular.txt)에 적힌 명확한 규칙(질문, 직접 호출, 연속 발화)은
+# LLM 호출 없이 로컬에서 바로 결정하고, 애매한 경우만 call_scheduler_api로 넘김
+
+SELF_NAME = "이가을"
+
+# 이 값 이상의 신뢰도일 때만 로컬에서 결정 (그 외는 LLM으로 에스컬레이션)
+FASTPATH_CONFIDENCE_THRESHOLD = 0.8
+
+# 로컬에서 결정한 경우 중 일부를 백그라운드에서 LLM에도 물어 일치율 측정
+FASTPATH_SHADOW_RATE = 0.1
+
+# 일치율 통계를 GUI 로그에 남기는 주기 (결정 횟수)
+FASTPATH_STATS_LOG_EVERY = 20
+
+# 가을아 / 가을야 / 가을씨 / 가을님 / 가을 언니 등 직접 호출 (호격 뒤는 공백, 문장 부호, 끝)
+# 호격 없는 "가을"(계절)이나 조사로도 쓰이는 "가을이"는 직접 호출로 보지 않음 (LLM이 판단)
+VOCATIVE_PATTERN = re.compile(r'가을(아|야|씨|님|\s*(언니|누나|오빠|형))(?=$|[\s.,!?~…？！ㅋㅎㅠㅜ^])')
+QUESTION_END_PATTERN = re.compile(r'[?？]\s*$')
+QUESTION_WORDS = ["뭐해", "어디", "언제", "왜", "어때", "할래", "갈래", "몇", "누구", "어떻게", "괜찮아", "됨?", "임?"]
+
+# 상대방 연속 발화 판단 (같은 분 안에 이 개수 이상 이어지면 연속 발화 중)
+BURST_MIN_MESSAGES = 3
+
+_stats_lock = threading.Lock()
+_stats = {
+    "local_decisions": 0,  # 로컬에서 결정한 횟수
+    "escalations": 0,  # LLM으로 넘긴 횟수
+    "compared": 0,  # 로컬 추정과 LLM 결과를 비교한 횟수
+    "agreed": 0,  # 그 중 일치한 횟수
+    "confident_compared": 0,  # 로컬 결정(shadow) 중 비교한 횟수
+    "confident_agreed": 0,
+    "local_time_us": 0.0,  # 로컬 분류 누적 시간 (마이크로초)
+}
+
+
+def extract_features(messages: list, relationship: str) -> dict:
+    """
+    파싱된 메시지 리스트에서 분류용 특징 추출
+
+    Args:
+        messages: macro.parse_chat_messages 결과
+        relationship: 관계 유형
+
+    Returns:
+        dict: 특징값
+    """
+    features = {
+        "relationship": relationship,
+        "last_speaker_self": False,
+        "trailing_question": False,
+        "question_word": False,
+        "vocative": False,
+        "burst_len": 0,
+        "burst_same_minute": False,
+        "has_messages": bool(messages),
+    }
+    if not messages:
+        return features
+
+    last = messages[-1]
+    features["last_speaker_self"] = last["speaker"] == SELF_NAME
+    if features["last_speaker_self"]:
+        return features
+
+    # 마지막 이가을 발화 이후 상대방 메시지 묶음
+    burst = []
+    for message in reversed(messages):
+        if message["speaker"] == SELF_NAME:
+            break
+        burst.append(message)
+    burst.reverse()
+
+    features["burst_len"] = len(burst)
+    features["burst_same_minute"] = len(burst) >= BURST_MIN_MESSAGES and len({m["time"] for m in burst[-BURST_MIN_MESSAGES:]}) == 1
+
+    last_text = last["text"]
+    features["trailing_question"] = bool(QUESTION_END_PATTERN.search(last_text))
+    features["question_word"] = any(word in last_text for word in QUESTION_WORDS)
+    features["vocative"] = any(VOCATIVE_PATTERN.search(m["text"]) for m in burst)
+    return features
+
+
+def score_features(features: dict) -> tuple:
+    """
+    특징값으로 (태그, 신뢰도) 계산
+
+    Returns:
+        tuple: (tag, confidence)
+    """
+    if not features["has_messages"]:
+        return "<WAIT>", 0.0
+
+    # 마지막 발화가 이가을이면 답할 것이 없음
+    if features["last_speaker_self"]:
+        return "<WAIT>", 0.95
+
+    group = features["relationship"] == "GROUP_MIXED"
+
+    # 직접 호출은 단톡에서도 확실한 발화 타이밍
+    if features["vocative"]:
+        return "<INSTANT>", 0.9 if features["trailing_question"] else 0.85
+
+    if features["trailing_question"]:
+        # 단톡 질문은 다른 사람에게 한 것일 수 있으므로 애매
+        return "<INSTANT>", 0.6 if group else 0.9
+
+    if features["question_word"]:
+        return "<INSTANT>", 0.5 if group else 0.7
+
+    # 같은 분 안에 연속 발화 중이면 기다림
+    if features["burst_same_minute"]:
+        return "<WAIT>", 0.8 if group else 0.75
+
+    return ("<WAIT>", 0.6) if group else ("<INSTANT>", 0.4)
+
+
+def classify(message_context: str, relationship: str) -> dict:
+    """
+    로컬 분류 수행
+
+    Args:
+        message_context: 채팅 내용 (날짜 줄 제거된 상태)
+        relationship: 관계 유형
+
+    Returns:
+        dict: {"tag": str, "confidence": float, "confident": bool, "features": dict, "elapsed_us": float}
+    """
+    start = time.perf_counter()
+    messages = macro.parse_chat_messages(message_context)
+    features = extract_features(messages, relationship)
+    tag, confidence = score_features(features)
+    elapsed_us = (time.perf_counter() - start) * 1_000_000
+
+    confident = confidence >= FASTPATH_CONFIDENCE_THRESHOLD
+    with _stats_lock:
+        _stats["local_time_us"] += elapsed_us
+        if confident:
+            _stats["local_decisions"] += 1
+        else:
+            _stats["escalations"] += 1
+
+    return {
+        "tag": tag,
+        "confidence": confidence,
+        "confident": confident,
+        "features": features,
+        "elapsed_us": elapsed_us,
+    }
+
+
+def should_shadow_check() -> bool:
+    """로컬 결정을 LLM으로 검증할지 (FASTPATH_SHADOW_RATE 확률)"""
+    return random.random() < FASTPATH_SHADOW_RATE
+
+
+def record_agreement(result: dict, llm_tag: Optional[str]):
+    """
+    로컬 분류 결과와 LLM 결과 비교 기록
+
+    Args:
+        result: classify() 결과
+        llm_tag: LLM이 반환한 태그 (None이면 기록하지 않음)
+    """
+    if llm_tag not in ("<INSTANT>", "<WAIT>"):
+        return
+
+    agreed = result["tag"] == llm_tag
+    with _stats_lock:
+        _stats["compared"] += 1
+        if agreed:
+            _stats["agreed"] += 1
+        if result["confident"]:
+            _stats["confident_compared"] += 1
+            if agreed:
+                _stats["confident_agreed"] += 1
+        compared = _stats["compared"]
+
+    print(f"[fastpath] 로컬 {result['tag']} ({result['confidence']:.2f}) vs LLM {llm_tag}: {'일치' if agreed else '불일치'}")
+    if not agreed:
+        print(f"[fastpath]   - features: {result['features']}")
+
+    if compared % FASTPATH_STATS_LOG_EVERY == 0:
+        stats = get_fastpath_stats()
+        from datetime import datetime
+        time_str = datetime.now().strftime("%H:%M:%S")
+        macro.log_message(
+            f"[{time_str}] [fastpath] 로컬 결정 {stats['local_rate']*100:.0f}%, "
+            f"일치율 {stats['agreement_rate']*100:.0f}% (확신 {stats['confident_agreement_rate']*100:.0f}%)"
+        )
+
+
+def get_fastpath_stats() -> dict:
+    """
+    로컬 분류기 통계 반환 (임계값 튜닝용)
+
+    Returns:
+        dict: 횟수, 로컬 결정 비율, 일치율, 평균 분류 시간(us)
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["local_decisions"] + stats["escalations"]
+    stats["local_rate"] = stats["local_decisions"] / total if total else 0.0
+    stats["agreement_rate"] = stats["agreed"] / stats["compared"] if stats["compared"] else 0.0
+    stats["confident_agreement_rate"] = (
+        stats["confident_agreed"] / stats["confident_compared"] if stats["confident_compared"] else 0.0
+    )
+    stats["avg_time_us"] = stats["local_time_us"] / total if total else 0.0
+    return stats
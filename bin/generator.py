@@ -1,111 +1,105 @@
 import os
 import time
 import threading
-import pyautogui
+import itertools
 import pyperclip
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, Iterable, Iterator, AsyncIterator
 
 import macro
+import actuator
+import prompts
+import llmcall
+import canned
+import memory
 import schedular
+import singleflight
+import sendtiming
+import roomdiff
+import uiactor
+import eventbus
+import roomstate
+import tracing
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(BASE_DIR, "macro_config.json")
 PROMPT_PATH = os.path.join(BASE_DIR, "..", "프롬프트", "generator.txt")
 
+# 스트리밍 생성: 첫 <split> 구간이 완성되는 즉시 전송을 시작하고
+# 나머지 구간은 생성되는 대로 이어서 전송
+GENERATOR_STREAMING_ENABLED = True
+SPLIT_TOKEN = "<split>"
 
-def load_prompt(path: str = PROMPT_PATH) -> str:
-    """프롬프트 파일을 읽어옴"""
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
-        return ""
-
-
-def calculate_send_delay(message: str) -> float:
-    """
-    메시지 길이에 따른 전송 버튼 클릭 후 지연 시간 계산
-    짧은 메시지는 빠르게, 긴 메시지는 더 긴 지연
-    """
-    length = len(message)
-    if length <= 10:
-        return 0.3
-    elif length <= 30:
-        return 0.5
-    elif length <= 50:
-        return 0.7
-    else:
-        return 1.0
+# 전송 후 마지막 발화가 이가을이면 이 시간 동안 상대방 답장을 기다린 뒤 finish 액션
+POST_SEND_WATCH_SEC = 8.0
 
 
-def calculate_input_delay(message: str) -> float:
-    """
-    메시지 길이에 따른 입력 전 지연 시간 계산
-    두 번째 메시지부터 사용
-    짧은 메시지는 짧은 딜레이, 긴 메시지는 긴 딜레이
-    """
-    length = len(message)
-    if length <= 10:
-        return 0.2
-    elif length <= 30:
-        return 0.4
-    elif length <= 50:
-        return 0.6
-    elif length <= 100:
-        return 0.8
-    else:
-        return 1.2
+def load_prompt(path: str = PROMPT_PATH) -> str:
+    """프롬프트 파일을 읽어옴 (prompts 캐시 사용, 파일이 바뀌면 다시 읽음)"""
+    return prompts.load_prompt(path)
 
 
-def send_message(message: str, chat_input_coord: tuple, send_button_coord: tuple) -> bool:
+@tracing.traced("send_message")
+def send_message(
+    message: str,
+    chat_input_coord: tuple,
+    send_button_coord: tuple,
+    relationship: Optional[str] = None,
+    title_key: Optional[str] = None
+) -> bool:
     """
     단일 메시지를 전송
     1. 채팅입력칸 클릭
     2. 메시지를 클립보드에 복사 후 ctrl-V로 붙여넣기
-    3. 전송버튼 클릭
-    4. 지연 시간 적용
+    3. 입력하는 시간만큼 대기 (sendtiming 모델, 관계별 타이핑 속도)
+    4. 전송버튼 클릭
+    title_key는 trace 기록용 (None이면 바깥 span의 채팅방)
     
     Returns:
         성공 여부
     """
-    # 채팅 입력 중 픽셀 검사 방지를 위한 플래그 설정
-    macro.clicking_in_progress = True
+    # UI actor에서 한 번에 실행 (입력 중 다른 클릭 / 복사가 끼어들지 않고, 픽셀 검사도 쉼)
     try:
-        x_input, y_input = chat_input_coord
-        x_send, y_send = send_button_coord
-        
-        # 채팅입력칸 클릭
-        pyautogui.click(x_input, y_input)
-        time.sleep(0.2)
-        
-        # 기존 내용 선택 및 삭제 (혹시 모를 기존 텍스트 제거)
-        pyautogui.hotkey('ctrl', 'a')
-        time.sleep(0.05)
-        
-        # 메시지를 클립보드에 복사
-        pyperclip.copy(message)
-        time.sleep(0.05)
-        
-        # ctrl-V로 붙여넣기
-        pyautogui.hotkey('ctrl', 'v')
-        time.sleep(0.1)
-        
-        # 입력 완료 후 전송 버튼 클릭 전 1초 딜레이
-        time.sleep(1.0)
-        
-        # 전송버튼 클릭
-        pyautogui.click(x_send, y_send)
-        
-        # 메시지 길이에 따른 지연
-        delay = calculate_send_delay(message)
-        time.sleep(delay)
-        
-        return True
+        return uiactor.transaction(
+            "send_message", _send_message_steps, message, chat_input_coord, send_button_coord, relationship
+        )
     except Exception as e:
         return False
-    finally:
-        # 채팅 입력 완료 후 플래그 해제
-        macro.clicking_in_progress = False
+
+
+def _send_message_steps(
+    message: str,
+    chat_input_coord: tuple,
+    send_button_coord: tuple,
+    relationship: Optional[str]
+) -> bool:
+    """send_message의 실제 동작 (UI actor 스레드에서 실행)"""
+    x_input, y_input = chat_input_coord
+    x_send, y_send = send_button_coord
+    
+    # 채팅입력칸 클릭
+    with sendtiming.step("focus_input"):
+        actuator.click(x_input, y_input)
+    
+    # 기존 내용 선택 및 삭제 (혹시 모를 기존 텍스트 제거)
+    with sendtiming.step("select_all"):
+        actuator.hotkey('ctrl', 'a')
+    
+    # 메시지를 클립보드에 복사
+    with sendtiming.step("clipboard"):
+        pyperclip.copy(message)
+    
+    # ctrl-V로 붙여넣기
+    with sendtiming.step("paste"):
+        actuator.hotkey('ctrl', 'v')
+    
+    # 메시지 길이에 따른 입력 시간
+    sendtiming.pause("typing", sendtiming.get_timing_model().typing_sec(message, relationship))
+    
+    # 전송버튼 클릭
+    with sendtiming.step("send_click"):
+        actuator.click(x_send, y_send)
+    
+    return True
 
 
 def check_chatting_room_changed(before_content: str) -> Tuple[bool, Optional[str]]:
@@ -133,6 +127,63 @@ def check_chatting_room_changed(before_content: str) -> Tuple[bool, Optional[str
         return False, None
 
 
+def append_sent_messages(before_content: str, sent_messages: list) -> str:
+    """전송 전 내용 뒤에 보낸 메시지를 복사 내용과 같은 형식([이가을] [오후 1:00] 내용)으로 붙임"""
+    current_time = macro.format_korean_time()
+    lines = [f"[이가을] [{current_time}] {message}" for message in sent_messages]
+    return "\n".join([before_content.rstrip("\n")] + lines)
+
+
+def _build_generator_messages(title_key: str, message_context: str, relationship: str) -> Optional[list]:
+    """제네레이터 요청 messages 구성 (프롬프트를 로드할 수 없으면 None)"""
+    prompt = load_prompt()
+    if not prompt:
+        return None
+    
+    current_time = macro.format_korean_time()
+    
+    # 최근 대화만 그대로 보내고, 오래된 대화는 관련 있는 부분만 붙임
+    message_context = memory.build_context(title_key, message_context)
+    
+    # 프롬프트에 입력 정보 추가 (캐시 가능한 앞부분 유지를 위해 TIME은 마지막)
+    user_message = prompts.build_user_message(
+        relationship,
+        message_context,
+        current_time,
+        instruction="위 정보를 바탕으로 이가을의 응답 메시지를 생성하세요."
+    )
+
+    # API로 보낼 입력을 그대로 로그로 출력
+    print(f"[generator] [{title_key}] 요청 메시지:\n{user_message}")
+    
+    return prompts.build_messages(prompt, user_message)
+
+
+def _generator_request_kwargs(title_key: str, messages: list) -> dict:
+    """chat.completions.create에 전달할 제네레이터 요청 인자"""
+    return {
+        "model": "ft:gpt-4.1-mini-2025-04-14:personal:generator-gpt4-1mini:CkpPWFZH",  # fine-tuning된 모델
+        "messages": messages,
+        "max_completion_tokens": 500,
+        **prompts.cache_request_options("generator", title_key)
+    }
+
+
+def _handle_generator_response(title_key: str, messages: list, response, usage: Optional[dict] = None) -> Optional[str]:
+    """API 응답에서 생성된 메시지 추출 (usage가 주어지면 토큰 사용량을 채워 넣음)"""
+    if not response or not response.choices:
+        return None
+    
+    response_usage = prompts.report_usage("generator", title_key, messages, response)
+    if usage is not None:
+        usage.update(response_usage)
+    
+    response_text = response.choices[0].message.content
+    
+    return response_text
+
+
+@tracing.traced("generate")
 def call_generator_api(
     title_key: str,
     message_context: str,
@@ -158,48 +209,197 @@ def call_generator_api(
     if not client:
         return None
     
-    prompt = load_prompt()
-    if not prompt:
+    messages = _build_generator_messages(title_key, message_context, relationship)
+    if messages is None:
         return None
     
-    current_time = macro.format_korean_time()
+    try:
+        response = llmcall.create("generator", title_key, client, **_generator_request_kwargs(title_key, messages))
+        return _handle_generator_response(title_key, messages, response)
+    except Exception as e:
+        print(f"[generator] [{title_key}] API 호출 중 오류 발생: {e}")
+        return None
+
+
+@tracing.traced("generate")
+async def call_generator_api_async(
+    title_key: str,
+    message_context: str,
+    relationship: str = "FRIEND",
+    usage: Optional[dict] = None
+) -> Optional[str]:
+    """
+    call_generator_api의 asyncio 버전 (pipeline에서 사용)
+    태스크가 취소되면 진행 중인 HTTP 요청도 함께 중단됨 (CancelledError 전파)
+    usage가 주어지면 토큰 사용량을 채워 넣음 (추측 생성 낭비 토큰 집계용)
+    
+    Returns:
+        생성된 메시지 문자열 (<split> 태그 포함 가능)
+    """
+    client = macro.get_async_openai_client()
+    if not client:
+        return None
     
-    # 프롬프트에 입력 정보 추가
-    user_message = f"""TIME: {current_time}
-RELATIONSHIP: {relationship}
+    messages = _build_generator_messages(title_key, message_context, relationship)
+    if messages is None:
+        return None
+    
+    try:
+        response = await llmcall.acreate("generator", title_key, client, **_generator_request_kwargs(title_key, messages))
+        return _handle_generator_response(title_key, messages, response, usage)
+    except Exception as e:
+        print(f"[generator] [{title_key}] API 호출 중 오류 발생: {e}")
+        return None
 
-MESSAGE_CONTEXT:
-{message_context}
 
-위 정보를 바탕으로 이가을의 응답 메시지를 생성하세요."""
+class SplitSegmenter:
+    """
+    스트리밍으로 들어오는 텍스트 조각에서 <split> 구분자를 점진적으로 찾아
+    완성된 구간을 돌려줌 (구분자가 조각 경계에 걸쳐 있어도 처리)
+    """
 
-    # API로 보낼 입력을 그대로 로그로 출력
-    print(f"[generator] [{title_key}] 요청 메시지:\n{user_message}")
+    def __init__(self, delimiter: str = SPLIT_TOKEN):
+        self.delimiter = delimiter
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> list:
+        """조각 추가 후 완성된 구간 리스트 반환 (빈 구간 제외)"""
+        self._buffer += chunk
+        segments = []
+        while self.delimiter in self._buffer:
+            segment, self._buffer = self._buffer.split(self.delimiter, 1)
+            if segment.strip():
+                segments.append(segment.strip())
+        return segments
+
+    def flush(self) -> list:
+        """남은 내용을 마지막 구간으로 반환"""
+        segment, self._buffer = self._buffer, ""
+        return [segment.strip()] if segment.strip() else []
+
+    def discard(self) -> str:
+        """남은 내용을 버리고 반환 (중간에 끊긴 스트림의 미완성 구간)"""
+        segment, self._buffer = self._buffer, ""
+        return segment.strip()
+
+
+def _stream_request_kwargs(title_key: str, messages: list) -> dict:
+    """스트리밍 요청 인자 (마지막 청크에 토큰 사용량 포함)"""
+    return {
+        **_generator_request_kwargs(title_key, messages),
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+
+
+def _chunk_text(title_key: str, messages: list, chunk) -> str:
+    """스트리밍 청크에서 텍스트 추출 (사용량 청크는 기록만 함)"""
+    if getattr(chunk, "usage", None):
+        prompts.report_usage("generator", title_key, messages, chunk)
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _chunk_finish_reason(chunk) -> Optional[str]:
+    """스트리밍 청크의 finish_reason (마지막 내용 청크에만 있음)"""
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].finish_reason
+
+
+def _finish_segments(title_key: str, segmenter: SplitSegmenter, finish_reason: Optional[str]) -> list:
+    """
+    스트림이 끝난 뒤 남은 구간
+    정상 종료("stop")일 때만 마지막 구간을 보내고, 오류 / 토큰 한도로 끊겼으면 미완성 구간은 버림
+    """
+    if finish_reason == "stop":
+        return segmenter.flush()
+    dropped = segmenter.discard()
+    if dropped:
+        print(f"[generator] [{title_key}] [WARNING] 스트림이 끝나지 않고 끊김 (finish_reason: {finish_reason}), "
+              f"미완성 구간 버림: {dropped!r}")
+    return []
+
+
+def _record_stream(stage: str, title_key: str, start: float, first_segment_at: Optional[float]):
+    """스트리밍 생성 구간 기록 (generator라 span 대신 시각을 직접 잼, 전송과 겹치는 시간 포함)"""
+    tracing.record(
+        stage, start, time.time(), title_key, streamed=True,
+        first_segment_ms=round((first_segment_at - start) * 1000, 2) if first_segment_at else None
+    )
+
+
+def stream_generator_segments(
+    title_key: str,
+    message_context: str,
+    relationship: str = "FRIEND"
+) -> Iterator[str]:
+    """
+    제네레이터를 스트리밍으로 호출하여 <split> 구간이 완성될 때마다 하나씩 반환
+    오류가 나거나 토큰 한도로 끊기면 그때까지 완성된 구간만 반환하고 종료 (미완성 마지막 구간은 버림)
+    """
+    if not macro.OPENAI_AVAILABLE:
+        return
+    
+    client = macro.get_openai_client()
+    if not client:
+        return
     
+    messages = _build_generator_messages(title_key, message_context, relationship)
+    if messages is None:
+        return
     
+    segmenter = SplitSegmenter()
+    start, first_segment_at = time.time(), None
+    finish_reason = None
     try:
-        response = client.chat.completions.create(
-            model="ft:gpt-4.1-mini-2025-04-14:personal:generator-gpt4-1mini:CkpPWFZH",  # fine-tuning된 모델
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_completion_tokens=500
-        )
-        
-        if not response or not response.choices:
-            return None
-        
-        response_text = response.choices[0].message.content
-        
-        return response_text
-        
+        stream = llmcall.create("generator", title_key, client, **_stream_request_kwargs(title_key, messages))
+        for chunk in stream:
+            finish_reason = _chunk_finish_reason(chunk) or finish_reason
+            for segment in segmenter.feed(_chunk_text(title_key, messages, chunk)):
+                first_segment_at = first_segment_at or time.time()
+                yield segment
     except Exception as e:
-        return None
+        print(f"[generator] [{title_key}] 스트리밍 중 오류 발생: {e}")
+    yield from _finish_segments(title_key, segmenter, finish_reason)
+    _record_stream("generate", title_key, start, first_segment_at)
+
+
+async def stream_generator_segments_async(
+    title_key: str,
+    message_context: str,
+    relationship: str = "FRIEND"
+) -> AsyncIterator[str]:
+    """stream_generator_segments의 asyncio 버전 (pipeline에서 사용)"""
+    client = macro.get_async_openai_client()
+    if not client:
+        return
+    
+    messages = _build_generator_messages(title_key, message_context, relationship)
+    if messages is None:
+        return
+    
+    segmenter = SplitSegmenter()
+    start, first_segment_at = time.time(), None
+    finish_reason = None
+    try:
+        stream = await llmcall.acreate("generator", title_key, client, hedge=False, **_stream_request_kwargs(title_key, messages))
+        async for chunk in stream:
+            finish_reason = _chunk_finish_reason(chunk) or finish_reason
+            for segment in segmenter.feed(_chunk_text(title_key, messages, chunk)):
+                first_segment_at = first_segment_at or time.time()
+                yield segment
+    except Exception as e:
+        print(f"[generator] [{title_key}] 스트리밍 중 오류 발생: {e}")
+    for segment in _finish_segments(title_key, segmenter, finish_reason):
+        yield segment
+    _record_stream("generate", title_key, start, first_segment_at)
 
 
+@tracing.traced("send")
 def send_messages_with_split_check(
-    messages: list[str],
+    messages: Iterable[str],
     title_key: str,
     chat_input_coord: tuple,
     send_button_coord: tuple,
@@ -211,7 +411,7 @@ def send_messages_with_split_check(
     (제네레이터가 입력한 메시지들 사이에 상대방 발화가 있었는지 확인)
     
     Args:
-        messages: 전송할 메시지 리스트
+        messages: 전송할 메시지 리스트 (스트리밍 시에는 구간이 생성되는 대로 나오는 iterator)
         title_key: 채팅방 제목
         chat_input_coord: 채팅입력칸 좌표 (x, y)
         send_button_coord: 전송버튼 좌표 (x, y)
@@ -223,6 +423,11 @@ def send_messages_with_split_check(
     """
     # 채팅방 감시 중지
     macro.chatting_room_watching = True
+    macro.chatting_room_sending = True
+    relationship = macro.get_chat_relationship_tag(title_key)
+    timing = sendtiming.get_timing_model()
+    
+    sent_messages = []
     
     try:
         # 모든 메시지 전송
@@ -231,45 +436,48 @@ def send_messages_with_split_check(
             if not message:
                 continue
             
-            # 두 번째 메시지부터는 메시지 길이에 따른 딜레이 부여
+            # 두 번째 메시지부터는 메시지 사이 간격 부여
             if i > 0:
-                delay = calculate_input_delay(message)
-                print(f"[generator] 두 번째 메시지부터 딜레이 적용: {delay}초 (메시지 길이: {len(message)} 문자)")
-                time.sleep(delay)
+                sendtiming.pause("gap", timing.gap_sec(message, relationship))
             
             # 메시지 전송
-            success = send_message(message, chat_input_coord, send_button_coord)
+            success = send_message(message, chat_input_coord, send_button_coord, relationship, title_key=title_key)
             if not success:
                 continue
+            sent_messages.append(message)
         
-        # 전송 완료 후 chatting_room_center 클릭 후 ctrl-A, ctrl-C로 변경 체크
         # 제네레이터가 입력한 메시지들 사이에 상대방 발화가 있었는지 1회 체크
-        time.sleep(0.5)  # 마지막 전송 후 대기
-        changed, final_content = check_chatting_room_changed(before_content)
+        # 화면 비교로 내 메시지만 추가된 것이 확인되면 복사 생략,
+        # 아니면 chatting_room_center 클릭 후 ctrl-A, ctrl-C로 변경 체크
+        sendtiming.settle("verify")  # 마지막 전송 메시지가 화면에 그려질 때까지 대기
+        with sendtiming.step("verify_pixels"):
+            verified = roomdiff.verify_sent(title_key, before_content, len(sent_messages))
+        if verified is not None:
+            # 감시 기준 해시도 전송 후 화면으로 갱신 (내 메시지로 인한 재복사 방지)
+            macro.last_chatting_room_hash = verified["hash"]
+            return True, append_sent_messages(before_content, sent_messages), False
+        
+        with sendtiming.step("verify_copy"):
+            changed, final_content = check_chatting_room_changed(before_content)
         
         return True, final_content, changed
         
     finally:
         # 채팅방 감시 재개
+        macro.chatting_room_sending = False
         macro.chatting_room_watching = False
 
 
-def generate_and_send_message(
-    title_key: str,
-    on_scheduler_callback: Optional[Callable[[str, str], None]] = None
-):
+def prepare_generation_context(title_key: str) -> Optional[tuple]:
     """
-    제네레이터를 호출하여 메시지를 생성하고 전송
-    전송 완료 후 상대방 발화 여부를 확인하여 스케줄러 재호출
-    스케줄러의 태그가 <INSTANT>일 때만 제네레이터가 호출됨
+    PREVIEW_DICT에서 제네레이터 입력을 준비 (날짜 줄 제거, 관계 유형 결정)
     
-    Args:
-        title_key: 채팅방 제목
-        on_scheduler_callback: 스케줄러 호출 콜백 (title_key, content)
+    Returns:
+        tuple: (message_context, relationship) 또는 None (내용이 없을 때)
     """
     if title_key not in macro.PREVIEW_DICT:
         print(f"[generator] [{title_key}] PREVIEW_DICT에 내용이 없습니다.")
-        return
+        return None
     
     message_context = macro.PREVIEW_DICT[title_key]
     
@@ -279,21 +487,98 @@ def generate_and_send_message(
     # 관계 유형 결정
     relationship = macro.get_chat_relationship_tag(title_key)
     
-    # 전송 시작 전 chatting_room 내용 저장
-    before_content = macro.copy_chatting_room_content()
-    if before_content is None:
-        return
+    return message_context, relationship
+
+
+def lookup_canned_reply(title_key: str, message_context: str, relationship: str) -> Optional[str]:
+    """
+    짧은 맞장구로 충분하면 학습 데이터에서 찾은 답장 반환 (제네레이터 호출 생략)
     
-    # 설정 파일에서 좌표 읽기
+    Returns:
+        답장 문자열 (<split> 포함 가능) 또는 None (LLM으로 생성)
+    """
+    try:
+        result = canned.lookup(message_context, relationship)
+    except Exception as e:
+        print(f"[generator] [{title_key}] [ERROR] 로컬 답장 검색 중 오류: {e}")
+        return None
+    if result is None:
+        return None
+    
+    from datetime import datetime
+    time_str = datetime.now().strftime("%H:%M:%S")
+    macro.log_message(f"[{time_str}] [제네레이터] {title_key}: 로컬 답장 (유사도 {result['similarity']:.2f})")
+    return result["reply"]
+
+
+def load_send_coords() -> Optional[tuple]:
+    """
+    설정 파일에서 채팅입력칸 / 전송버튼 좌표 읽기
+    
+    Returns:
+        tuple: (chat_input_coord, send_button_coord) 또는 None (좌표가 잘못되었을 때)
+    """
     config = macro.load_config_dict(CONFIG_PATH)
     chat_input = config.get("chat_input", [1000, 800])
     send_button = config.get("send_button", [1500, 800])
     
     if len(chat_input) != 2 or len(send_button) != 2:
+        return None
+    
+    return tuple(chat_input), tuple(send_button)
+
+
+def generate_and_send_message(
+    title_key: str,
+    on_scheduler_callback: Optional[Callable[[str, str], None]] = None
+):
+    """
+    제네레이터를 호출하여 메시지를 생성하고 전송
+    전송 완료 후 상대방 발화 여부를 확인하여 스케줄러 재호출
+    스케줄러의 태그가 <INSTANT>일 때만 제네레이터가 호출됨
+    
+    Args:
+        title_key: 채팅방 제목
+        on_scheduler_callback: 스케줄러 호출 콜백 (title_key, content)
+    """
+    context = prepare_generation_context(title_key)
+    if context is None:
+        return
+    message_context, relationship = context
+    roomstate.transition(title_key, roomstate.GENERATING, "stale")
+    
+    # 전송 시작 전 chatting_room 내용 저장
+    before_content = roomdiff.copy_before_send(title_key)
+    if before_content is None:
+        return
+    
+    if load_send_coords() is None:
+        return
+    
+    # 짧은 맞장구는 로컬 답장으로 바로 전송
+    response_text = lookup_canned_reply(title_key, message_context, relationship)
+    if response_text:
+        send_generated_reply(
+            title_key=title_key,
+            response_text=response_text,
+            before_content=before_content,
+            on_scheduler_callback=on_scheduler_callback
+        )
         return
     
-    chat_input_coord = tuple(chat_input)
-    send_button_coord = tuple(send_button)
+    if GENERATOR_STREAMING_ENABLED:
+        # 구간이 생성되는 대로 전송 (첫 구간 완성 시점부터 입력 시작)
+        send_generated_segments(
+            title_key=title_key,
+            segments=stream_generator_segments(
+                title_key=title_key,
+                message_context=message_context,
+                relationship=relationship
+            ),
+            before_content=before_content,
+            on_scheduler_callback=on_scheduler_callback
+        )
+        return
     
     # OpenAI API 호출하여 메시지 생성
     response_text = call_generator_api(
@@ -302,11 +587,36 @@ def generate_and_send_message(
         relationship=relationship
     )
     
+    send_generated_reply(
+        title_key=title_key,
+        response_text=response_text,
+        before_content=before_content,
+        on_scheduler_callback=on_scheduler_callback
+    )
+
+
+def send_generated_reply(
+    title_key: str,
+    response_text: Optional[str],
+    before_content: str,
+    on_scheduler_callback: Optional[Callable[[str, str], None]] = None
+):
+    """
+    생성된 응답을 <split> 단위로 전송하고 후속 처리
+    - 상대방 발화가 있었거나 상대방이 마지막 발화자면 스케줄러 재호출
+    - 마지막 발화자가 이가을이면 8초 동안 감시 후 finish 액션 실행
+    
+    Args:
+        title_key: 채팅방 제목
+        response_text: 제네레이터 응답 (<split> 태그 포함 가능)
+        before_content: 전송 시작 전 chatting_room 내용
+        on_scheduler_callback: 스케줄러 호출 콜백 (title_key, content)
+    """
     if not response_text:
         return
     
     # <split> 태그로 메시지 분할
-    messages = [msg.strip() for msg in response_text.split("<split>") if msg.strip()]
+    messages = [msg.strip() for msg in response_text.split(SPLIT_TOKEN) if msg.strip()]
     
     if not messages:
         return
@@ -320,7 +630,55 @@ def generate_and_send_message(
     else:
         macro.log_message(f"[{time_str}] [제네레이터] {title_key}: {message_preview}")
     
+    _send_and_follow_up(title_key, messages, before_content, on_scheduler_callback)
+
+
+def send_generated_segments(
+    title_key: str,
+    segments: Iterable[str],
+    before_content: str,
+    on_scheduler_callback: Optional[Callable[[str, str], None]] = None
+):
+    """
+    스트리밍으로 생성되는 구간을 받는 대로 전송하고 후속 처리 (send_generated_reply와 동일)
+    첫 구간이 나오기 전에 생성이 실패하면 아무것도 전송하지 않음
+    
+    Args:
+        title_key: 채팅방 제목
+        segments: <split> 단위 구간 iterator
+        before_content: 전송 시작 전 chatting_room 내용
+        on_scheduler_callback: 스케줄러 호출 콜백 (title_key, content)
+    """
+    segments = iter(segments)
+    first_segment = next(segments, None)
+    if first_segment is None:
+        return
+    
+    def logged_segments():
+        from datetime import datetime
+        for i, segment in enumerate(itertools.chain([first_segment], segments)):
+            time_str = datetime.now().strftime("%H:%M:%S")
+            message_preview = segment[:30] + "..." if len(segment) > 30 else segment
+            macro.log_message(f"[{time_str}] [제네레이터] {title_key}: {message_preview} ({i + 1}번째, 스트리밍)")
+            yield segment
+    
+    _send_and_follow_up(title_key, logged_segments(), before_content, on_scheduler_callback)
+
+
+def _send_and_follow_up(
+    title_key: str,
+    messages: Iterable[str],
+    before_content: str,
+    on_scheduler_callback: Optional[Callable[[str, str], None]]
+):
+    """메시지 전송 후 상대방 발화 여부에 따라 스케줄러 재호출 또는 finish 감시"""
+    coords = load_send_coords()
+    if coords is None:
+        return
+    chat_input_coord, send_button_coord = coords
+    
     # 메시지 전송
+    roomstate.transition(title_key, roomstate.SENDING)
     success, final_content, changed = send_messages_with_split_check(
         messages=messages,
         title_key=title_key,
@@ -330,7 +688,10 @@ def generate_and_send_message(
     )
     
     if not success or final_content is None:
+        roomstate.transition(title_key, roomstate.WATCHING, "send_failed")
         return
+    tracing.end_trace(title_key, "sent")
+    eventbus.publish(eventbus.ReplySent(title_key, changed))
     
     # 마지막 발화자 확인
     last_speaker = macro.extract_last_speaker(final_content)
@@ -345,6 +706,7 @@ def generate_and_send_message(
     macro.save_chatting_content(title_key, final_content, skip_callback=True)
     
     if should_recall:
+        roomstate.transition(title_key, roomstate.WATCHING, "recall")
         # 상대방 발화가 있었거나 상대방이 마지막 발화자인 경우 스케줄러 호출
         if on_scheduler_callback:
             try:
@@ -354,39 +716,56 @@ def generate_and_send_message(
                 import traceback
                 traceback.print_exc()
     else:
-        # 마지막 발화자가 나(이가을)이고 상대방 발화가 없었으면 8초 동안 감시 후 finish 액션 실행
-        def watch_and_finish():
-            watch_duration = 8.0
-            check_interval = 0.1
-            start_time = time.time()
-            last_content = final_content
-            
-            while time.time() - start_time < watch_duration:
-                # PREVIEW_DICT에서 변경 감지 (watch_chatting_room이 갱신했을 수 있음)
-                if title_key in macro.PREVIEW_DICT:
-                    current_content = macro.PREVIEW_DICT[title_key]
-                    
-                    # 내용이 변경되었는지 확인
-                    if current_content != last_content:
-                        # 상대방이 메시지를 보냈으므로 스케줄러 재호출
-                        if on_scheduler_callback:
-                            try:
-                                on_scheduler_callback(title_key, current_content)
-                            except Exception as e:
-                                pass
-                        return
-                
-                time.sleep(check_interval)
-            
-            # 8초 동안 변경이 없었으면 finish 액션 실행
-            try:
-                import schedular
-                schedular.process_finish_action(title_key)
-            except Exception as e:
-                pass
-        
-        finish_thread = threading.Thread(target=watch_and_finish, daemon=True)
-        finish_thread.start()
+        # 마지막 발화자가 나(이가을)이고 상대방 발화가 없었으면 POST_SEND_WATCH_SEC 동안 감시 후 finish 액션 실행
+        roomstate.transition(title_key, roomstate.COOLDOWN)
+        watch_after_send(title_key)
+
+
+def watch_after_send(title_key: str, watch_sec: Optional[float] = None):
+    """
+    전송 후 감시: 채팅방 변경 구독 + 마감 타이머 (폴링 없음)
+    - 마감 전에 대화 내용이 바뀌면(watch_chatting_room이 갱신) 감시만 끝냄
+      (같은 변경이 딕셔너리 변경 콜백 → TranscriptDelta로 파이프라인에 제출되므로 여기서는 다시 제출하지 않음)
+    - 마감까지 바뀌지 않으면 finish 액션 실행
+    둘 중 먼저 일어난 쪽만 실행됨
+    
+    Args:
+        title_key: 채팅방 제목
+        watch_sec: 감시 시간 (None이면 POST_SEND_WATCH_SEC)
+    """
+    fired = threading.Event()
+    
+    def claim() -> bool:
+        """처음 호출한 쪽만 True (변경 / 마감 중 하나만 실행)"""
+        with claim_lock:
+            if fired.is_set():
+                return False
+            fired.set()
+        unsubscribe()
+        cancel_timer()
+        return True
+    
+    def on_change(changed_title_key: str, content: str):
+        if not claim():
+            return
+        roomstate.transition(title_key, roomstate.WATCHING, "reply_received", only_from=(roomstate.COOLDOWN,))
+    
+    def on_deadline():
+        if not claim():
+            return
+        # 감시 시간 동안 변경이 없었으면 finish 액션 실행
+        try:
+            schedular.process_finish_action(title_key)
+        except Exception as e:
+            pass
+    
+    # 구독 / 타이머 등록이 끝나기 전에는 claim이 진행되지 않도록 같은 lock 안에서 등록
+    claim_lock = threading.Lock()
+    with claim_lock:
+        unsubscribe = macro.subscribe_room_change(title_key, on_change)
+        cancel_timer = eventbus.call_later(
+            POST_SEND_WATCH_SEC if watch_sec is None else watch_sec, "background", on_deadline
+        )
 
 
 def generate_chatting_room_update(
@@ -396,6 +775,7 @@ def generate_chatting_room_update(
     """
     chatting_room이 업데이트될 때마다 호출되는 함수
     PREVIEW_DICT에서 해당 title_key의 내용을 가져와서 제네레이터 호출
+    같은 채팅방의 생성/전송이 이미 진행 중이면 후속 요청 하나로 합쳐서 끝난 뒤 실행
     
     Args:
         title_key: 채팅방 제목
@@ -404,7 +784,9 @@ def generate_chatting_room_update(
     if title_key not in macro.PREVIEW_DICT:
         return
     
-    generate_and_send_message(
+    singleflight.GENERATIONS.run(
+        title_key,
+        generate_and_send_message,
         title_key=title_key,
         on_scheduler_callback=on_scheduler_callback
     )
@@ -316,6 +316,11 @@ class PreviewStackGUI:
                 seconds = int(remaining_seconds % 60)
                 display_text = f"{title}: {minutes:02d}:{seconds:02d}"
             
+            # 큐 대기 중 흡수한 새 메시지 수 표시
+            merged_count = queue_status.get("merged_count", 0)
+            if merged_count:
+                display_text += f" (+{merged_count})"
+            
             # 라벨 생성
             label = tk.Label(
                 self.queue_inner_frame,
@@ -0,0 +1,541 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Optional
+
+import macro
+import ratelimit
+import telemetry
+
+# ---------------------
+# OpenAI 호출 안정화 계층
+# ---------------------
+# 스케줄러 / 제네레이터의 모든 chat.completions.create 호출이 이 모듈을 거침
+# - 호출별 deadline (전체 시간 제한)과 시도별 timeout
+# - 일시적 오류(연결 오류, 타임아웃, 429, 5xx)는 지터를 넣은 지수 백오프로 제한된 횟수만 재시도
+# - (asyncio) 응답이 최근 p95보다 늦으면 같은 요청을 하나 더 보내고 먼저 온 응답 사용 (hedging)
+# - 연속으로 실패하면 circuit breaker가 열려 일정 시간 동안 바로 실패 처리
+#   (스케줄러는 <WAIT>로 대체되어 대기 없이 넘어감)
+# - 종류별 최근 지연 시간 p50 / p95 / p99 통계
+# - 요청마다 ratelimit.GOVERNOR에서 권한을 받아 전역 속도 / 동시성 제한을 지킴
+# - 호출마다 telemetry에 소요 시간 / 토큰 / 결과 기록
+
+# 호출 종류별 정책
+CALL_POLICIES = {
+    "scheduler": {
+        "deadline_sec": 10.0,  # 재시도 포함 전체 시간 제한
+        "attempt_timeout_sec": 4.0,  # 시도 한 번의 시간 제한
+        "max_retries": 2,
+        "hedge": True,
+    },
+    "generator": {
+        "deadline_sec": 45.0,
+        "attempt_timeout_sec": 20.0,
+        "max_retries": 1,
+        "hedge": False,  # 출력이 길어 중복 요청 비용이 큼
+    },
+    "summary": {
+        "deadline_sec": 90.0,  # 백그라운드 요약이라 답장 지연과 무관
+        "attempt_timeout_sec": 40.0,
+        "max_retries": 2,
+        "hedge": False,
+    },
+}
+
+BACKOFF_BASE_SEC = 0.3
+BACKOFF_MAX_SEC = 3.0
+
+# hedging: 최근 지연 시간의 이 백분위보다 늦으면 중복 요청 (표본이 충분할 때만)
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SEC = 0.3
+
+# circuit breaker: 연속 실패 횟수가 임계값에 닿으면 CIRCUIT_RESET_SEC 동안 열림
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SEC = 30.0
+
+# 지연 시간 통계용 최근 호출 수, GUI 로그에 통계를 남기는 주기 (호출 수)
+LATENCY_HISTORY = 500
+LLM_STATS_LOG_EVERY = 50
+
+# 재시도할 HTTP 상태 코드 (그 외 4xx는 요청 자체의 문제이므로 재시도하지 않음)
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class CircuitOpenError(Exception):
+    """circuit breaker가 열려 있어 호출하지 않음"""
+
+
+class DeadlineExceededError(Exception):
+    """재시도를 포함한 호출 deadline 초과"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = "closed"  # closed | open | half_open
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """호출해도 되는지 확인 (열린 뒤 CIRCUIT_RESET_SEC가 지나면 시험 호출 하나만 허용)"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.time() - self._opened_at >= CIRCUIT_RESET_SEC:
+                self._state = "half_open"
+                self._trial_in_flight = False
+            if self._state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                print(f"[llmcall] [{self.name}] circuit 닫힘 (호출 정상화)")
+            self._state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if self._state != "open":
+                    print(f"[llmcall] [{self.name}] circuit 열림 (연속 실패 {self._failures}회)")
+                self._state = "open"
+                self._opened_at = time.time()
+
+    def record_cancel(self):
+        """호출이 취소됨 (시험 호출이었다면 다음 호출이 다시 시험할 수 있도록 반납)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+
+_breakers = {kind: CircuitBreaker(kind) for kind in CALL_POLICIES}
+
+_stats_lock = threading.Lock()
+# {kind: {"latencies": deque, "calls": int, ...}}
+_stats = {}
+
+
+def _kind_stats(kind: str) -> dict:
+    """종류별 통계 dict (_stats_lock을 잡은 상태에서 호출)"""
+    return _stats.setdefault(kind, {
+        "latencies": deque(maxlen=LATENCY_HISTORY),
+        "calls": 0,
+        "successes": 0,
+        "failures": 0,
+        "timeouts": 0,
+        "retries": 0,
+        "hedges": 0,  # 보낸 중복 요청 수
+        "hedge_wins": 0,  # 중복 요청이 먼저 응답한 수
+        "short_circuited": 0,  # circuit이 열려 있어 호출하지 않은 수
+    })
+
+
+def _count(kind: str, key: str):
+    with _stats_lock:
+        _kind_stats(kind)[key] += 1
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def _hedge_delay(kind: str) -> Optional[float]:
+    """중복 요청을 보낼 시점 (최근 p95, 표본이 부족하면 None)"""
+    with _stats_lock:
+        latencies = sorted(_kind_stats(kind)["latencies"])
+    if len(latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY_SEC, _percentile(latencies, HEDGE_PERCENTILE))
+
+
+def _backoff_sec(attempt: int) -> float:
+    """지터를 넣은 지수 백오프 (full jitter)"""
+    return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """일시적인 오류인지 (연결 오류 / 타임아웃 / 429 / 5xx)"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # 상태 코드가 없는 SDK 오류는 연결 / 타임아웃 오류
+        return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+    return status in RETRYABLE_STATUS or status >= 500
+
+
+def _begin(kind: str, title_key: str) -> dict:
+    """호출 시작: circuit 확인 후 정책 반환"""
+    policy = CALL_POLICIES[kind]
+    _count(kind, "calls")
+    if not _breakers[kind].allow():
+        _count(kind, "short_circuited")
+        raise CircuitOpenError(f"{kind} circuit이 열려 있음")
+    return policy
+
+
+def _finish(kind: str, title_key: str, start: float, error: Optional[Exception]):
+    """호출 종료: 통계 / circuit 갱신"""
+    elapsed = time.perf_counter() - start
+    breaker = _breakers[kind]
+    with _stats_lock:
+        stats = _kind_stats(kind)
+        if error is None:
+            stats["successes"] += 1
+            stats["latencies"].append(elapsed)
+        else:
+            stats["failures"] += 1
+            if isinstance(error, (DeadlineExceededError, asyncio.TimeoutError, TimeoutError)):
+                stats["timeouts"] += 1
+        calls = stats["calls"]
+
+    if error is None:
+        breaker.record_success()
+    elif is_retryable(error) or isinstance(error, DeadlineExceededError):
+        # 요청 자체의 문제(400 등)는 서버 장애가 아니므로 circuit에 반영하지 않음
+        breaker.record_failure()
+        print(f"[llmcall] [{kind}] [{title_key}] 호출 실패 ({elapsed:.1f}초): {error}")
+
+    if calls % LLM_STATS_LOG_EVERY == 0:
+        _log_stats(kind)
+
+
+def _log_stats(kind: str):
+    """종류별 꼬리 지연 시간을 GUI 로그에 남김"""
+    stats = get_call_stats().get(kind)
+    if not stats:
+        return
+    governor = ratelimit.get_ratelimit_stats()
+    throttle_sec = governor["lanes"].get(kind, {}).get("throttle_sec", 0.0)
+    from datetime import datetime
+    time_str = datetime.now().strftime("%H:%M:%S")
+    macro.log_message(
+        f"[{time_str}] [LLM] {kind} p50 {stats['p50_sec']:.2f}s / p95 {stats['p95_sec']:.2f}s / "
+        f"p99 {stats['p99_sec']:.2f}s, 실패 {stats['failures']}회, circuit {stats['circuit']}, "
+        f"대기열 {governor['queue_depth']}개 (누적 대기 {throttle_sec:.1f}초)"
+    )
+
+
+def _retry_after_sec(error: Exception) -> Optional[float]:
+    """429 응답의 retry-after 헤더 (없으면 None)"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _on_attempt_error(kind: str, error: Exception, attempt: int):
+    """429면 전역 제한기를 잠시 멈춤 (다른 요청도 같은 한도에 걸리므로)"""
+    if getattr(error, "status_code", None) == 429:
+        ratelimit.GOVERNOR.pause(kind, _retry_after_sec(error) or _backoff_sec(attempt + 1))
+
+
+def _outcome(error: Exception) -> str:
+    """telemetry 기록용 실패 종류"""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (DeadlineExceededError, asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    if getattr(error, "status_code", None) == 429:
+        return "rate_limited"
+    return "error"
+
+
+def _observe_chunk(record: dict, chunk, usage):
+    """스트림 청크에서 첫 토큰 시점과 usage 갱신"""
+    if chunk.choices and chunk.choices[0].delta.content:
+        telemetry.mark_first_token(record)
+    return getattr(chunk, "usage", None) or usage
+
+
+def _governed_stream(stream, ticket: dict, record: dict):
+    """
+    스트림을 다 읽거나 닫을 때 제한기 권한 반납 (마지막 청크의 usage로 토큰 보정)
+    telemetry 기록도 스트림이 끝날 때 남김
+    """
+    usage = None
+    outcome, error = "cancelled", None
+    try:
+        for chunk in stream:
+            usage = _observe_chunk(record, chunk, usage)
+            yield chunk
+        outcome = "ok"
+    except Exception as e:
+        outcome, error = _outcome(e), e
+        raise
+    finally:
+        ratelimit.GOVERNOR.release(ticket, usage)
+        telemetry.finish_record(record, outcome, usage, error)
+
+
+async def _governed_stream_async(stream, ticket: dict, record: dict):
+    """_governed_stream의 asyncio 버전"""
+    usage = None
+    outcome, error = "cancelled", None
+    try:
+        async for chunk in stream:
+            usage = _observe_chunk(record, chunk, usage)
+            yield chunk
+        outcome = "ok"
+    except Exception as e:
+        outcome, error = _outcome(e), e
+        raise
+    finally:
+        ratelimit.GOVERNOR.release(ticket, usage)
+        telemetry.finish_record(record, outcome, usage, error)
+
+
+def _request(client, kwargs: dict, timeout: float, ticket: dict, record: dict):
+    """요청 하나 보내기 (스트림이 아니면 응답을 받은 뒤 바로 권한 반납)"""
+    try:
+        response = client.chat.completions.create(**kwargs, timeout=timeout)
+    except BaseException:
+        ratelimit.GOVERNOR.release(ticket)
+        raise
+    if kwargs.get("stream"):
+        return _governed_stream(response, ticket, record)
+    ratelimit.GOVERNOR.release(ticket, getattr(response, "usage", None))
+    return response
+
+
+async def _request_async(client, kwargs: dict, timeout: float, ticket: dict, record: dict):
+    """_request의 asyncio 버전"""
+    try:
+        response = await client.chat.completions.create(**kwargs, timeout=timeout)
+    except BaseException:
+        ratelimit.GOVERNOR.release(ticket)
+        raise
+    if kwargs.get("stream"):
+        return _governed_stream_async(response, ticket, record)
+    ratelimit.GOVERNOR.release(ticket, getattr(response, "usage", None))
+    return response
+
+
+def _finish_record(record: dict, kwargs: dict, response):
+    """성공한 호출 기록 (스트림은 스트림이 끝날 때 기록)"""
+    if not kwargs.get("stream"):
+        telemetry.finish_record(record, "ok", getattr(response, "usage", None))
+
+
+def _short_circuit(kind: str, title_key: str, record: dict) -> dict:
+    """circuit 확인 (열려 있으면 telemetry에 남기고 CircuitOpenError)"""
+    try:
+        return _begin(kind, title_key)
+    except CircuitOpenError as e:
+        telemetry.finish_record(record, "circuit_open", error=e)
+        raise
+
+
+def create(kind: str, title_key: str, client, **kwargs):
+    """
+    client.chat.completions.create 동기 호출 (deadline / 재시도 / circuit breaker / 속도 제한 적용)
+    동기 경로에서는 hedging을 하지 않음
+
+    Args:
+        kind: 호출 종류 ("scheduler", "generator")
+        title_key: 채팅방 제목 (로그용)
+        client: OpenAI 클라이언트
+        **kwargs: chat.completions.create 인자
+
+    Raises:
+        CircuitOpenError, DeadlineExceededError 또는 마지막 시도의 오류
+    """
+    record = telemetry.start_record(kind, title_key, kwargs)
+    policy = _short_circuit(kind, title_key, record)
+    client = client.with_options(max_retries=0)
+    tokens = ratelimit.estimate_tokens(kwargs)
+    start = time.perf_counter()
+    deadline = start + policy["deadline_sec"]
+    error = None
+    try:
+        for attempt in range(policy["max_retries"] + 1):
+            # 속도 제한 대기도 deadline에 포함
+            ticket = ratelimit.GOVERNOR.acquire(kind, tokens, timeout=max(0.0, deadline - time.perf_counter()))
+            remaining = deadline - time.perf_counter()
+            if ticket is None or remaining <= 0:
+                if ticket is not None:
+                    ratelimit.GOVERNOR.release(ticket)
+                raise DeadlineExceededError(f"{kind} deadline {policy['deadline_sec']}초 초과")
+            record["attempts"] += 1
+            try:
+                response = _request(client, kwargs, min(policy["attempt_timeout_sec"], remaining), ticket, record)
+                _finish_record(record, kwargs, response)
+                return response
+            except Exception as e:
+                _on_attempt_error(kind, e, attempt)
+                if attempt >= policy["max_retries"] or not is_retryable(e):
+                    raise
+                _count(kind, "retries")
+                backoff = min(_backoff_sec(attempt), max(0.0, deadline - time.perf_counter()))
+                print(f"[llmcall] [{kind}] [{title_key}] 재시도 {attempt + 1}/{policy['max_retries']} "
+                      f"({backoff:.2f}초 후): {e}")
+                time.sleep(backoff)
+    except Exception as e:
+        error = e
+        telemetry.finish_record(record, _outcome(e), error=e)
+        raise
+    finally:
+        _finish(kind, title_key, start, error)
+
+
+async def _attempt_async(kind: str, client, kwargs: dict, timeout: float, hedge: bool, ticket: dict, record: dict):
+    """
+    시도 한 번 (ticket은 이미 받은 제한기 권한)
+    hedge이면 p95가 지나도 응답이 없을 때 중복 요청을 하나 더 보냄 (제한기에 여유가 있을 때만)
+    """
+    loop = asyncio.get_running_loop()
+    attempt_start = loop.time()
+    attempt_deadline = attempt_start + timeout
+    hedge_delay = _hedge_delay(kind) if hedge and not kwargs.get("stream") else None
+
+    # [(task, ticket)]
+    requests = [(asyncio.ensure_future(_request_async(client, kwargs, timeout, ticket, record)), ticket)]
+    hedged = None
+    last_error = None
+    try:
+        while True:
+            pending = [task for task, _ in requests if not task.done()]
+            if not pending:
+                raise last_error
+
+            can_hedge = hedged is None and hedge_delay is not None
+            wait_until = min(attempt_deadline, attempt_start + hedge_delay) if can_hedge else attempt_deadline
+            done, _ = await asyncio.wait(
+                pending, timeout=max(0.0, wait_until - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is hedged:
+                        _count(kind, "hedge_wins")
+                    return task.result()
+                last_error = task.exception()
+
+            if done:
+                continue
+            hedge_ticket = None
+            if can_hedge and loop.time() < attempt_deadline:
+                hedge_ticket = ratelimit.GOVERNOR.try_acquire(kind, ratelimit.estimate_tokens(kwargs))
+            if hedge_ticket is not None:
+                _count(kind, "hedges")
+                record["hedged"] = True
+                hedged = asyncio.ensure_future(
+                    _request_async(client, kwargs, attempt_deadline - loop.time(), hedge_ticket, record)
+                )
+                requests.append((hedged, hedge_ticket))
+            elif can_hedge and loop.time() < attempt_deadline:
+                # 제한기에 여유가 없으면 중복 요청을 보내지 않음
+                hedge_delay = None
+            else:
+                raise asyncio.TimeoutError(f"{kind} 시도 timeout {timeout:.1f}초 초과")
+    finally:
+        for task, request_ticket in requests:
+            if not task.done():
+                task.cancel()
+            # 시작 전에 취소된 요청은 _request_async가 반납하지 못하므로 여기서 반납 (중복 반납은 무시됨)
+            if task.cancelled() or not task.done():
+                ratelimit.GOVERNOR.release(request_ticket)
+
+
+async def acreate(kind: str, title_key: str, client, hedge: Optional[bool] = None, **kwargs):
+    """
+    create의 asyncio 버전 (hedging 포함)
+    태스크가 취소되면 진행 중인 요청도 모두 취소됨 (CancelledError 전파, 실패로 집계하지 않음)
+
+    Args:
+        hedge: 중복 요청 여부 (None이면 CALL_POLICIES 설정, 스트리밍 요청은 항상 False)
+    """
+    record = telemetry.start_record(kind, title_key, kwargs)
+    policy = _short_circuit(kind, title_key, record)
+    if hedge is None:
+        hedge = policy["hedge"]
+    client = client.with_options(max_retries=0)
+    tokens = ratelimit.estimate_tokens(kwargs)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    deadline = loop.time() + policy["deadline_sec"]
+    error = None
+    cancelled = False
+    try:
+        for attempt in range(policy["max_retries"] + 1):
+            # 속도 제한 대기도 deadline에 포함
+            try:
+                ticket = await ratelimit.GOVERNOR.acquire_async(kind, tokens, timeout=max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(f"{kind} 속도 제한 대기 중 deadline {policy['deadline_sec']}초 초과")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                ratelimit.GOVERNOR.release(ticket)
+                raise DeadlineExceededError(f"{kind} deadline {policy['deadline_sec']}초 초과")
+            record["attempts"] += 1
+            try:
+                response = await _attempt_async(
+                    kind, client, kwargs, min(policy["attempt_timeout_sec"], remaining), hedge, ticket, record
+                )
+                _finish_record(record, kwargs, response)
+                return response
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _on_attempt_error(kind, e, attempt)
+                if attempt >= policy["max_retries"] or not is_retryable(e):
+                    raise
+                _count(kind, "retries")
+                backoff = min(_backoff_sec(attempt), max(0.0, deadline - loop.time()))
+                print(f"[llmcall] [{kind}] [{title_key}] 재시도 {attempt + 1}/{policy['max_retries']} "
+                      f"({backoff:.2f}초 후): {e!r}")
+                await asyncio.sleep(backoff)
+    except asyncio.CancelledError:
+        # 새 대화 버전으로 취소된 것은 실패가 아님 (circuit 시험 호출이었다면 반납)
+        cancelled = True
+        _breakers[kind].record_cancel()
+        telemetry.finish_record(record, "cancelled")
+        raise
+    except Exception as e:
+        error = e
+        telemetry.finish_record(record, _outcome(e), error=e)
+        raise
+    finally:
+        if not cancelled:
+            _finish(kind, title_key, start, error)
+
+
+def get_call_stats() -> dict:
+    """
+    종류별 호출 통계 반환
+
+    Returns:
+        dict: {kind: {"calls", "successes", "failures", "timeouts", "retries", "hedges", "hedge_wins",
+                      "short_circuited", "p50_sec", "p95_sec", "p99_sec", "circuit"}}
+    """
+    with _stats_lock:
+        snapshot = {
+            kind: {key: (sorted(value) if key == "latencies" else value) for key, value in stats.items()}
+            for kind, stats in _stats.items()
+        }
+    result = {}
+    for kind, stats in snapshot.items():
+        latencies = stats.pop("latencies")
+        stats["p50_sec"] = _percentile(latencies, 0.50)
+        stats["p95_sec"] = _percentile(latencies, 0.95)
+        stats["p99_sec"] = _percentile(latencies, 0.99)
+        stats["circuit"] = _breakers[kind].state if kind in _breakers else "closed"
+        result[kind] = stats
+    return result
@@ -8,11 +8,16 @@ import random
 from datetime import datetime
 
 import cv2
-import pyautogui
 import numpy as np
 from PIL import ImageGrab, Image
 import pyperclip
 
+import actuator
+import uiactor
+import eventbus
+import roomstate
+import tracing
+
 # OCR 라이브러리 (한글 인식용)
 try:
     import easyocr
@@ -147,14 +152,24 @@ DEFAULT_POLL_INTERVAL = 0.5
 # ---------------------
 
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
     OpenAI = None
+    AsyncOpenAI = None
 except Exception:
     OPENAI_AVAILABLE = False
     OpenAI = None
+    AsyncOpenAI = None
+
+# 연결 풀 설정용 (없으면 openai 기본 전송 계층 사용)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
 
 try:
     from dotenv import load_dotenv
@@ -168,22 +183,115 @@ if DOTENV_AVAILABLE:
     if os.path.exists(ENV_PATH):
         load_dotenv(ENV_PATH)
 
+# 연결 풀 / 타임아웃 설정 (모든 스케줄러, 제네레이터 호출이 하나의 클라이언트를 공유)
+# OPENAI_BASE_URL을 설정하면 로컬 stub 서버(stub_server.py)로 요청을 보낼 수 있음
+OPENAI_CONNECT_TIMEOUT_SEC = 5.0
+OPENAI_READ_TIMEOUT_SEC = 60.0
+OPENAI_MAX_CONNECTIONS = 20
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10
+OPENAI_KEEPALIVE_EXPIRY_SEC = 120.0
+OPENAI_MAX_RETRIES = 2
+
+# 프로세스 전체에서 공유하는 OpenAI 클라이언트 (처음 사용할 때 생성)
+_openai_client = None
+_async_openai_client = None
+_openai_client_lock = threading.Lock()
+
+
+def _create_http_client(async_client: bool = False):
+    """keep-alive 연결 풀과 타임아웃이 설정된 httpx 클라이언트 생성 (httpx가 없으면 None)"""
+    if not HTTPX_AVAILABLE:
+        return None
+    limits = httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SEC,
+    )
+    timeout = httpx.Timeout(OPENAI_READ_TIMEOUT_SEC, connect=OPENAI_CONNECT_TIMEOUT_SEC)
+    if async_client:
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+    return httpx.Client(limits=limits, timeout=timeout)
+
 
 def get_openai_client():
-    """OpenAI 클라이언트 생성 (.env 파일 또는 환경 변수에서 API 키 읽기)"""
+    """
+    공유 OpenAI 클라이언트 반환 (.env 파일 또는 환경 변수에서 API 키 읽기)
+    처음 호출될 때 한 번만 생성하고, 이후에는 같은 연결 풀을 재사용하여
+    호출마다 TLS 핸드셰이크가 반복되지 않도록 함.
+    """
+    global _openai_client
     if not OPENAI_AVAILABLE:
         return None
     
-    api_key = os.getenv("OPENAI_API_KEY")
+    if _openai_client is not None:
+        return _openai_client
     
-    if not api_key:
+    with _openai_client_lock:
+        if _openai_client is not None:
+            return _openai_client
+        
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        
+        try:
+            _openai_client = OpenAI(
+                api_key=api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                http_client=_create_http_client(),
+                timeout=OPENAI_READ_TIMEOUT_SEC,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            print(f"[macro] 공유 OpenAI 클라이언트 생성 (base_url: {_openai_client.base_url})")
+            return _openai_client
+        except Exception:
+            return None
+
+
+def get_async_openai_client():
+    """
+    공유 AsyncOpenAI 클라이언트 반환 (pipeline의 이벤트 루프에서만 사용)
+    httpx.AsyncClient는 처음 사용한 이벤트 루프에 묶이므로 하나의 루프에서만 호출해야 함.
+    """
+    global _async_openai_client
+    if not OPENAI_AVAILABLE:
         return None
     
-    try:
-        client = OpenAI(api_key=api_key)
-        return client
-    except Exception:
-        return None
+    if _async_openai_client is not None:
+        return _async_openai_client
+    
+    with _openai_client_lock:
+        if _async_openai_client is not None:
+            return _async_openai_client
+        
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        
+        try:
+            _async_openai_client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                http_client=_create_http_client(async_client=True),
+                timeout=OPENAI_READ_TIMEOUT_SEC,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            print(f"[macro] 공유 AsyncOpenAI 클라이언트 생성 (base_url: {_async_openai_client.base_url})")
+            return _async_openai_client
+        except Exception:
+            return None
+
+
+def reset_openai_client():
+    """공유 OpenAI 클라이언트를 닫고 초기화 (설정 변경 후 재생성용)"""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is not None:
+            try:
+                _openai_client.close()
+            except Exception:
+                pass
+        _openai_client = None
 
 
 # ---------------------
@@ -235,6 +343,14 @@ def remove_date_header(message_context: str) -> str:
     return message_context.strip()
 
 
+def window_message_context(message_context: str, max_lines: int) -> str:
+    """채팅 내용에서 최근 max_lines 줄만 남김 (빈 줄 제외)"""
+    if not message_context:
+        return ""
+    lines = [line for line in message_context.split('\n') if line.strip()]
+    return '\n'.join(lines[-max_lines:])
+
+
 # ---------------------
 # preview 스택 딕셔너리 & 예외 타이틀
 # ---------------------
@@ -320,12 +436,49 @@ def sanitize_dict_key(key: str) -> str:
     return sanitized
 
 
+# 채팅방별 대화 내용 버전 (PREVIEW_DICT 내용이 바뀔 때마다 1씩 증가)
+# pipeline에서 진행 중인 요청이 오래된 대화 기준인지 판단하는 데 사용
+ROOM_VERSIONS = {}  # {title: int}
+
 # 딕셔너리 변경 감지용 콜백
 _dict_change_callback = None
 
 # 로그 콜백 (GUI 하단 로그에 메시지 출력용)
 _log_callback = None
 
+# 채팅방별 내용 변경 구독 ({title_key: [callback(title_key, content)]})
+# 특정 채팅방의 다음 변경만 기다릴 때 사용 (전송 후 감시 등)
+_room_subscribers = {}
+_room_subscribers_lock = threading.Lock()
+
+def subscribe_room_change(title_key: str, callback):
+    """
+    채팅방 내용이 바뀔 때마다 callback(title_key, content) 호출 (save_chatting_content에서, skip_callback과 무관)
+    
+    Returns:
+        구독 해제 함수 (여러 번 호출해도 됨)
+    """
+    with _room_subscribers_lock:
+        _room_subscribers.setdefault(title_key, []).append(callback)
+    
+    def unsubscribe():
+        with _room_subscribers_lock:
+            callbacks = _room_subscribers.get(title_key, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                _room_subscribers.pop(title_key, None)
+    return unsubscribe
+
+def _notify_room_subscribers(title_key: str, content: str):
+    with _room_subscribers_lock:
+        callbacks = list(_room_subscribers.get(title_key, []))
+    for callback in callbacks:
+        try:
+            callback(title_key, content)
+        except Exception as e:
+            print(f"[macro] [ERROR] 채팅방 변경 구독 콜백 호출 중 오류: {e}")
+
 def set_dict_change_callback(callback):
     """딕셔너리 변경 감지 콜백 설정"""
     global _dict_change_callback
@@ -345,12 +498,28 @@ def log_message(message: str):
         except Exception:
             pass
 
+def get_room_version(title_key: str) -> int:
+    """채팅방 대화 내용 버전 반환 (저장된 적 없으면 0)"""
+    return ROOM_VERSIONS.get(title_key, 0)
+
+def transcript_signature(content: str) -> tuple:
+    """
+    대화 내용 비교용 값: (발화자, 내용) 목록
+    줄바꿈(CRLF), 앞뒤 공백, 날짜 헤더, 시각(분 단위 차이)은 무시
+    전송 후 직접 만든 내용(append_sent_messages)과 다음 실제 복사 내용이 같은 대화로 비교되도록 함
+    """
+    messages = parse_chat_messages(content)
+    if not messages:
+        return ("raw", content.replace("\r\n", "\n").strip())
+    return tuple((message["speaker"], message["text"]) for message in messages)
+
+
 def save_chatting_content(title_key: str, content: str, skip_callback: bool = False) -> str:
     """
     chatting_room에서 복사한 내용을 title_key를 key로 하여 PREVIEW_DICT에 저장.
     title_key는 title 영역의 이미지 해시 또는 실제 title 문자열.
     key는 정제되어 초성, 영어, 숫자가 제거됨.
-    딕셔너리가 변경되었을 때만 콜백 호출.
+    딕셔너리가 변경되었을 때만 콜백 호출 (변경 여부는 transcript_signature로 비교).
     
     Args:
         title_key: 채팅방 제목
@@ -374,17 +543,21 @@ def save_chatting_content(title_key: str, content: str, skip_callback: bool = Fa
     # 기존 내용 확인
     old_content = PREVIEW_DICT.get(title_key)
     
-    # 딕셔너리 갱신
+    changed = old_content is None or transcript_signature(old_content) != transcript_signature(content)
+    
+    # 딕셔너리 갱신 (같은 대화여도 실제 복사 내용으로 교체)
     PREVIEW_DICT[title_key] = content
     
     # 딕셔너리 업데이트 로그
-    if old_content != content:
+    if changed:
+        ROOM_VERSIONS[title_key] = ROOM_VERSIONS.get(title_key, 0) + 1
         from datetime import datetime
         time_str = datetime.now().strftime("%H:%M:%S")
         log_message(f"[{time_str}] [딕셔너리 업데이트] {title_key} (길이: {len(content)} 문자)")
+        _notify_room_subscribers(title_key, content)
     
     # 내용이 변경되었을 때만 콜백 호출 (skip_callback이 False일 때만)
-    if old_content != content and not skip_callback:
+    if changed and not skip_callback:
         print(f"[macro] 딕셔너리 내용 변경 감지: {title_key}")
         print(f"[macro]   - 기존 내용 길이: {len(old_content) if old_content else 0}")
         print(f"[macro]   - 새 내용 길이: {len(content)}")
@@ -413,8 +586,6 @@ def double_click_preview_center():
     """
     preview 영역의 정중앙을 더블클릭 (클릭 간격 0.3초)
     """
-    global clicking_in_progress
-    
     preview_region = REGIONS.get("preview")
     if not preview_region:
         return False
@@ -423,58 +594,45 @@ def double_click_preview_center():
     center_x = left + width // 2
     center_y = top + height // 2
     
-    # 클릭 시작 플래그 설정
-    clicking_in_progress = True
-    try:
-        pyautogui.click(center_x, center_y)
-        time.sleep(0.3)
-        pyautogui.click(center_x, center_y)
-        return True
-    finally:
-        # 클릭 완료 플래그 해제
-        clicking_in_progress = False
+    uiactor.transaction("open_room", actuator.double_click, center_x, center_y, interval=0.3)
+    return True
 
 
-def copy_chatting_room_content():
+def copy_chatting_room_content(title_key: str = None):
     """
     chatting_room_center 좌표를 클릭한 후 ctrl-A, ctrl-C로 내용을 복사하여 반환.
     최대한 빠르게 수행.
-    복사 진행 중에는 플래그를 설정하여 감지를 방지.
-    """
-    global copying_in_progress, clicking_in_progress
+    UI actor에서 한 번에 실행되므로 다른 클릭 / 입력이 끼어들지 않고, 그동안 감지도 쉼.
     
+    Args:
+        title_key: 복사하는 채팅방 (trace 기록용, None이면 바깥 span의 채팅방)
+    """
     if not CHATTING_ROOM_CENTER or CHATTING_ROOM_CENTER == (0, 0):
         return None
     
     x, y = CHATTING_ROOM_CENTER
-    
-    # 복사 및 클릭 시작 플래그 설정
-    copying_in_progress = True
-    clicking_in_progress = True
-    
+    with tracing.span("copy", title_key):
+        return uiactor.transaction("copy_room", _copy_chatting_room, x, y)
+
+
+def _copy_chatting_room(x: int, y: int):
+    """copy_chatting_room_content의 실제 동작 (UI actor 스레드에서 실행)"""
+    # chatting_room_center 좌표 클릭 후 ctrl-A (전체 선택), ctrl-C (복사)
+    actuator.run([
+        ("click", x, y),
+        ("sleep", 0.1),  # 클릭 후 약간의 대기
+        ("hotkey", "ctrl", "a"),
+        ("sleep", 0.05),
+        ("hotkey", "ctrl", "c"),
+        ("sleep", 0.1),  # 클립보드 복사 대기
+    ])
+    
+    # 클립보드에서 내용 가져오기
     try:
-        # chatting_room_center 좌표 클릭
-        pyautogui.click(x, y)
-        time.sleep(0.1)  # 클릭 후 약간의 대기
-        
-        # ctrl-A (전체 선택)
-        pyautogui.hotkey('ctrl', 'a')
-        time.sleep(0.05)
-        
-        # ctrl-C (복사)
-        pyautogui.hotkey('ctrl', 'c')
-        time.sleep(0.1)  # 클립보드 복사 대기
-        
-        # 클립보드에서 내용 가져오기
-        try:
-            content = pyperclip.paste()
-            return content
-        except Exception as e:
-            return None
-    finally:
-        # 복사 및 클릭 완료 플래그 해제
-        copying_in_progress = False
-        clicking_in_progress = False
+        content = pyperclip.paste()
+        return content
+    except Exception as e:
+        return None
 
 
 def extract_last_speaker(content: str) -> str:
@@ -512,6 +670,47 @@ def extract_last_speaker(content: str) -> str:
     return None
 
 
+# [발화자] [오전/오후 HH:MM] 내용 패턴
+CHAT_LINE_PATTERN = re.compile(r'^\[([^\]]+)\] \[(오전|오후) (\d{1,2}):(\d{2})\] ?(.*)$')
+
+
+def parse_chat_messages(content: str) -> list:
+    """
+    채팅 내용을 메시지 리스트로 파싱.
+    포맷: [발화자] [오전/오후 HH:MM] 내용 (패턴에 맞지 않는 줄은 앞 메시지의 이어지는 줄로 처리)
+    
+    Args:
+        content: 채팅 내용 문자열
+        
+    Returns:
+        list: [{"speaker": str, "time": str, "text": str}, ...] (오래된 순)
+    """
+    messages = []
+    if not content:
+        return messages
+    
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        
+        # 날짜 헤더 패턴 제외 (예: "2025년 12월 6일 토요일")
+        if re.match(r'\d+년 \d+월 \d+일', line):
+            continue
+        
+        match = CHAT_LINE_PATTERN.match(line)
+        if match:
+            messages.append({
+                "speaker": match.group(1),
+                "time": f"{match.group(2)} {match.group(3)}:{match.group(4)}",
+                "text": match.group(5).strip()
+            })
+        elif messages:
+            messages[-1]["text"] += "\n" + line
+    
+    return messages
+
+
 def extract_last_message_time(content: str) -> str:
     """
     채팅 내용에서 마지막 발화 시간을 추출.
@@ -624,58 +823,136 @@ def compare_message_time(content: str, threshold_minutes: int = 2) -> tuple:
     return (is_delayed, time_diff)
 
 
-def add_to_delay_queue(title: str, time_diff_seconds: float):
+# 큐에 이미 있는 채팅방에 새 메시지가 도착했을 때 적용할 정책
+# - 질문/직접 호출처럼 급한 메시지는 2~5초 후로 당김
+# - 그 외에는 새로 계산한 시간이 더 이르면 그 시간으로 당김 (늦추지는 않음)
+QUEUE_URGENT_DELAY_RANGE = (2.0, 5.0)
+QUEUE_QUESTION_PATTERN = re.compile(r'[?？]\s*$')
+
+
+def is_urgent_preview(preview_text: str) -> bool:
     """
-    지연 큐에 채팅방 추가.
+    preview 텍스트가 바로 답해야 하는 메시지인지 판단.
+    - 물음표로 끝나는 질문
+    - '가을' 직접 호출 (가을아, 가을 언니 등, fastpath.VOCATIVE_PATTERN과 같은 기준)
+    
+    Args:
+        preview_text: preview 영역 OCR 텍스트
+        
+    Returns:
+        bool: 급한 메시지이면 True
+    """
+    if not preview_text:
+        return False
+    
+    text = preview_text.strip()
+    if QUEUE_QUESTION_PATTERN.search(text):
+        return True
+    
+    # fastpath가 macro를 import하므로 여기서 import
+    import fastpath
+    return bool(fastpath.VOCATIVE_PATTERN.search(text))
+
+
+def calculate_queue_delay(time_diff_seconds: float) -> float:
+    """
+    마지막 발화 시간 차이에 따른 큐 지연 시간 계산.
     - 1분 이하: 2초에서 5초 랜덤 지연
     - 1분~3분: 10초 지연
     - 3분 이상: 그만큼의 차이 + 랜덤성 부여한 가감 (감소에 치중)
-    - 이미 큐에 있으면 무시
     
     Args:
-        title: 채팅방 제목
         time_diff_seconds: 시간 차이 (초)
+        
+    Returns:
+        float: 지연 시간 (초)
     """
-    # 이미 큐에 있으면 무시
-    if title in DELAY_QUEUE:
-        print(f"[queue] {title} 이미 큐에 있음, 무시")
-        return
-    
-    current_time = time.time()
     one_minute = 60  # 1분
     three_minutes = 180  # 3분
     
     if time_diff_seconds <= one_minute:
-        # 1분 이하: 2초에서 5초 랜덤 지연
-        random_delay = random.uniform(2.0, 5.0)
-        scheduled_time = current_time + random_delay
-        DELAY_QUEUE[title] = {
-            "scheduled_time": scheduled_time,
-            "status": "pending",
-            "added_time": current_time  # 선입선출을 위한 추가 시간
-        }
-        print(f"[queue] {title} pending 상태로 큐 추가: {random_delay:.1f}초 후 ({time.strftime('%H:%M:%S', time.localtime(scheduled_time))})")
+        return random.uniform(2.0, 5.0)
     elif time_diff_seconds <= three_minutes:
-        # 1분~3분: 10초 지연
-        scheduled_time = current_time + 10.0
-        DELAY_QUEUE[title] = {
-            "scheduled_time": scheduled_time,
-            "status": "pending",
-            "added_time": current_time  # 선입선출을 위한 추가 시간
-        }
-        print(f"[queue] {title} pending 상태로 큐 추가: 10초 후 ({time.strftime('%H:%M:%S', time.localtime(scheduled_time))})")
+        return 10.0
     else:
-        # 3분 이상: 그만큼의 차이 + 랜덤성 부여한 가감 (감소에 치중)
         # 랜덤성: -10% ~ +5% 범위 (감소에 치중)
         random_factor = random.uniform(-0.10, 0.05)
-        adjusted_delay = time_diff_seconds * (1 + random_factor)
-        scheduled_time = current_time + adjusted_delay
-        DELAY_QUEUE[title] = {
-            "scheduled_time": scheduled_time,
-            "status": "pending",
-            "added_time": current_time  # 선입선출을 위한 추가 시간
-        }
-        print(f"[queue] {title} pending 상태로 큐 추가: {adjusted_delay:.1f}초 후 (원본: {time_diff_seconds:.1f}초, 조정: {random_factor*100:.1f}%) ({time.strftime('%H:%M:%S', time.localtime(scheduled_time))})")
+        return time_diff_seconds * (1 + random_factor)
+
+
+def add_to_delay_queue(title: str, time_diff_seconds: float, preview_text: str = None):
+    """
+    지연 큐에 채팅방 추가.
+    - 지연 시간은 calculate_queue_delay 기준
+    - 이미 큐에 있으면 merge_into_delay_queue로 새 메시지를 흡수
+    
+    Args:
+        title: 채팅방 제목
+        time_diff_seconds: 시간 차이 (초)
+        preview_text: preview 영역 OCR 텍스트 (없으면 None)
+    """
+    # 이미 큐에 있으면 새 메시지를 기존 항목에 합침
+    if title in DELAY_QUEUE:
+        merge_into_delay_queue(title, time_diff_seconds, preview_text)
+        return
+    
+    current_time = time.time()
+    
+    if is_urgent_preview(preview_text):
+        delay = random.uniform(*QUEUE_URGENT_DELAY_RANGE)
+    else:
+        delay = calculate_queue_delay(time_diff_seconds)
+    scheduled_time = current_time + delay
+    
+    DELAY_QUEUE[title] = {
+        "scheduled_time": scheduled_time,
+        "status": "pending",
+        "added_time": current_time,  # 선입선출을 위한 추가 시간
+        "merged_count": 0,  # 큐 대기 중 흡수한 새 메시지 수
+        "urgent_count": 0,  # 그 중 급한 메시지로 판단되어 시간을 당긴 횟수
+        "last_merged_time": None
+    }
+    roomstate.transition(title, roomstate.QUEUED, "delay_queue")
+    print(f"[queue] {title} pending 상태로 큐 추가: {delay:.1f}초 후 (시간 차이: {time_diff_seconds:.1f}초) ({time.strftime('%H:%M:%S', time.localtime(scheduled_time))})")
+
+
+def merge_into_delay_queue(title: str, time_diff_seconds: float, preview_text: str = None):
+    """
+    이미 큐에 있는 채팅방에 새 메시지가 도착했을 때 기존 항목에 합침.
+    - pending 상태일 때만 예정 시간을 조정 (당기기만 하고 늦추지는 않음)
+    - 급한 메시지(질문, 직접 호출)는 QUEUE_URGENT_DELAY_RANGE 안으로 당김
+    - waiting / processing 상태는 곧 열리므로 카운터만 갱신
+    
+    Args:
+        title: 채팅방 제목
+        time_diff_seconds: 시간 차이 (초)
+        preview_text: preview 영역 OCR 텍스트 (없으면 None)
+    """
+    queue_item = DELAY_QUEUE.get(title)
+    if queue_item is None:
+        return
+    
+    current_time = time.time()
+    queue_item["merged_count"] = queue_item.get("merged_count", 0) + 1
+    queue_item["last_merged_time"] = current_time
+    
+    if queue_item["status"] != "pending":
+        print(f"[queue] {title} 이미 {queue_item['status']} 상태, 새 메시지 흡수 (누적 {queue_item['merged_count']}개)")
+        return
+    
+    urgent = is_urgent_preview(preview_text)
+    if urgent:
+        queue_item["urgent_count"] = queue_item.get("urgent_count", 0) + 1
+        candidate_time = current_time + random.uniform(*QUEUE_URGENT_DELAY_RANGE)
+    else:
+        candidate_time = current_time + calculate_queue_delay(time_diff_seconds)
+    
+    old_scheduled_time = queue_item["scheduled_time"]
+    if candidate_time < old_scheduled_time:
+        queue_item["scheduled_time"] = candidate_time
+        print(f"[queue] {title} 새 메시지 흡수, 예정 시간 당김: {old_scheduled_time - current_time:.1f}초 -> {candidate_time - current_time:.1f}초 후 (급함: {urgent}, 누적 {queue_item['merged_count']}개)")
+    else:
+        print(f"[queue] {title} 새 메시지 흡수, 예정 시간 유지: {old_scheduled_time - current_time:.1f}초 후 (급함: {urgent}, 누적 {queue_item['merged_count']}개)")
 
 
 def get_queue_status(title: str) -> dict:
@@ -686,7 +963,7 @@ def get_queue_status(title: str) -> dict:
         title: 채팅방 제목
         
     Returns:
-        dict: {"status": str, "remaining_seconds": float} 또는 None
+        dict: {"status": str, "remaining_seconds": float, "merged_count": int, "urgent_count": int} 또는 None
     """
     if title not in DELAY_QUEUE:
         return None
@@ -699,7 +976,9 @@ def get_queue_status(title: str) -> dict:
     
     return {
         "status": queue_item["status"],
-        "remaining_seconds": remaining_seconds
+        "remaining_seconds": remaining_seconds,
+        "merged_count": queue_item.get("merged_count", 0),
+        "urgent_count": queue_item.get("urgent_count", 0)
     }
 
 
@@ -747,6 +1026,29 @@ def remove_from_queue(title: str):
         print(f"[queue] {title} 큐에서 제거됨")
 
 
+def _open_title_region(region: tuple) -> bool:
+    """title 영역 정중앙 더블클릭 후 chatting_room_center 1회 클릭 (UI actor 스레드에서 실행)"""
+    left, top, width, height = region
+    center_x = left + width // 2
+    center_y = top + height // 2
+    
+    # title 정중앙 더블클릭
+    actuator.run([
+        ("click", center_x, center_y),
+        ("sleep", 0.3),  # 더블클릭 간격
+        ("click", center_x, center_y),
+        ("sleep", 0.3),  # 클릭 후 약간 대기
+    ])
+    
+    # chatting_room_center 좌표 클릭
+    if not CHATTING_ROOM_CENTER or CHATTING_ROOM_CENTER == (0, 0):
+        return False
+    
+    x, y = CHATTING_ROOM_CENTER
+    actuator.run([("click", x, y), ("sleep", 0.1)])  # 클릭 후 약간 대기
+    return True
+
+
 def find_and_click_title_in_list(target_title: str) -> bool:
     """
     채팅방 리스트에서 title부터 title2, title3, title4 순으로 OCR로 스캔하여 target_title과 일치하는 영역을 찾아 클릭.
@@ -784,30 +1086,8 @@ def find_and_click_title_in_list(target_title: str) -> bool:
             
             # 인식한 텍스트와 target_title 비교 (부분 일치 허용)
             if target_title in recognized_text or recognized_text in target_title:
-                # 일치하는 영역을 찾았으면 클릭
-                global clicking_in_progress
-                clicking_in_progress = True
-                try:
-                    left, top, width, height = region
-                    center_x = left + width // 2
-                    center_y = top + height // 2
-                    
-                    # title 정중앙 더블클릭
-                    pyautogui.click(center_x, center_y)
-                    time.sleep(0.3)  # 더블클릭 간격
-                    pyautogui.click(center_x, center_y)
-                    time.sleep(0.3)  # 클릭 후 약간 대기
-                    
-                    # chatting_room_center 좌표 클릭
-                    if not CHATTING_ROOM_CENTER or CHATTING_ROOM_CENTER == (0, 0):
-                        return False
-                    
-                    x, y = CHATTING_ROOM_CENTER
-                    pyautogui.click(x, y)
-                    time.sleep(0.1)  # 클릭 후 약간 대기
-                    return True
-                finally:
-                    clicking_in_progress = False
+                # 일치하는 영역을 찾았으면 클릭 (UI actor에서 한 번에 실행)
+                return uiactor.transaction("open_room", _open_title_region, region)
         except Exception as e:
             continue
     
@@ -866,12 +1146,20 @@ def process_delay_queue(on_detect=None):
                 # 처리 시작
                 set_queue_status(title, "processing")
                 current_processing_title = title
+                roomstate.transition(title, roomstate.OPENING)
+                # 큐 대기 시간 (큐에 들어간 뒤 흡수한 메시지는 그 메시지 감지 시점부터)
+                trace = tracing.get_trace(title)
+                queued_at = DELAY_QUEUE[title].get("added_time", current_time)
+                tracing.record("queue", max(queued_at, trace["started"]) if trace else queued_at, time.time(), title)
                 print(f"[queue] {title} 처리 시작 (선입선출)")
                 print(f"[queue] 현재 큐 상태: {len(DELAY_QUEUE)}개 항목, waiting: {len(waiting_titles)}개")
                 
-                # 별도 스레드에서 처리
-                import threading
+                # 채팅방 열기 작업 풀에서 처리
                 def process_in_thread():
+                    with tracing.span("open", title):
+                        open_and_watch()
+                
+                def open_and_watch():
                     global chatting_room_watching
                     nonlocal current_processing_title
                     
@@ -887,11 +1175,12 @@ def process_delay_queue(on_detect=None):
                         time.sleep(0.5)
                         
                         # chatting_room_center 클릭 후 1회의 ctrl-A, ctrl-C로 복사
-                        content = copy_chatting_room_content()
+                        content = copy_chatting_room_content(title)
                         if content is not None:
                             # 딕셔너리에 저장 (key는 save_chatting_content에서 정제됨)
                             # 스케줄러 호출은 딕셔너리 변경 감지에서 처리
                             sanitized_title = save_chatting_content(title, content)
+                            roomstate.transition(sanitized_title, roomstate.WATCHING, "opened")
                             
                             # on_detect 콜백 호출 (처음 채팅방 내용을 복사했을 때)
                             if on_detect:
@@ -900,26 +1189,20 @@ def process_delay_queue(on_detect=None):
                                 except Exception as e:
                                     print(f"[queue] on_detect 콜백 호출 중 오류: {e}")
                             
-                            # chatting_room 감시 시작 (별도 스레드)
+                            # chatting_room 감시 시작 (감시 작업 풀, 정제된 title 사용)
                             chatting_room_watching = True  # 큐 처리 대기
-                            thread_watch = threading.Thread(
-                                target=watch_chatting_room,
-                                args=(sanitized_title, on_detect),  # 정제된 title 사용
-                                kwargs={"poll_interval": 0.1},
-                                daemon=True
-                            )
-                            thread_watch.start()
+                            eventbus.run_in_pool("watch", watch_chatting_room, sanitized_title, on_detect, poll_interval=0.1)
                         else:
                             pass
                     else:
                         # 클릭 실패 시 큐에서 제거
                         remove_from_queue(title)
+                        roomstate.transition(title, roomstate.CLOSED, "open_failed")
                         current_processing_title = None
                     
                     # 큐에서 제거는 finish 액션에서 수행 (성공한 경우)
                 
-                thread = threading.Thread(target=process_in_thread, daemon=True)
-                thread.start()
+                eventbus.run_in_pool("rooms", process_in_thread)
             elif waiting_titles and chatting_room_watching:
                 print(f"[queue] waiting 항목 {len(waiting_titles)}개 있지만 chatting_room 감시 중이라 대기")
             elif not waiting_titles:
@@ -978,14 +1261,12 @@ chatting_room_watch_stopped = False
 # chatting_room 감시 중인지 확인하는 플래그 (큐 처리 대기용)
 chatting_room_watching = False
 
-# 복사 진행 중 플래그 (CTRL-A, CTRL-C 진행 중 감지 방지)
-copying_in_progress = False
-
-# 클릭 진행 중 플래그 (모든 클릭 작업 중 감지 방지)
-clicking_in_progress = False
+# 메시지 전송 중 플래그 (전송 확인이 끝날 때까지 채팅방 변화 감지 방지, 내 메시지로 인한 재복사 방지)
+chatting_room_sending = False
 
 # 지연 큐 (채팅방 클릭 지연 스케줄링)
-# {title: {"scheduled_time": float, "status": str}}
+# {title: {"scheduled_time": float, "status": str, "added_time": float,
+#          "merged_count": int, "urgent_count": int, "last_merged_time": float}}
 # status: "pending", "waiting", "processing"
 DELAY_QUEUE = {}
 
@@ -1003,8 +1284,13 @@ def get_region_image_hash(region):
     # PIL ImageGrab이 pyautogui.screenshot보다 더 빠름
     # bbox는 (left, top, right, bottom) 형식
     img = ImageGrab.grab(bbox=(left, top, left + width, top + height))
-    img_np = np.array(img)
-    
+    return image_hash(np.array(img))
+
+
+def image_hash(img_np):
+    """
+    캡처한 이미지 배열의 변경 감지용 해시 (get_region_image_hash와 같은 방식)
+    """
     # 더 작은 크기로 리사이즈 (16x16) - 변경 감지 목적이므로 충분
     # INTER_NEAREST가 가장 빠른 보간법
     small = cv2.resize(img_np, (16, 16), interpolation=cv2.INTER_NEAREST)
@@ -1028,10 +1314,10 @@ def trigger_region_changed():
     
     최적화: 해시 계산을 최소화하고, 변경이 없을 때는 즉시 반환.
     """
-    global last_title_hash, last_preview_hash, clicking_in_progress
+    global last_title_hash, last_preview_hash
     
     # 클릭 진행 중이면 감지하지 않음
-    if clicking_in_progress:
+    if uiactor.is_busy():
         return False
 
     title_region = REGIONS.get("title")
@@ -1153,10 +1439,10 @@ def trigger_chatting_room_changed():
     변경이 감지되면 True를 반환.
     복사 또는 클릭 진행 중일 때는 감지하지 않음.
     """
-    global last_chatting_room_hash, copying_in_progress, clicking_in_progress
+    global last_chatting_room_hash
     
-    # 복사 또는 클릭 진행 중이면 감지하지 않음
-    if copying_in_progress or clicking_in_progress:
+    # 복사 또는 클릭 진행 중이거나 전송 확인 전이면 감지하지 않음
+    if uiactor.is_busy() or chatting_room_sending:
         return False
     
     if not CHATTING_ROOM or CHATTING_ROOM == (0, 0, 0, 0):
@@ -1215,8 +1501,18 @@ def watch_chatting_room(title_key, on_detect=None, poll_interval=0.1):
                 log_message(f"[{time_str}] [채팅방 변화] {sanitized_title_key} 감지")
                 
                 # chatting_room_center 클릭 후 ctrl-A, ctrl-C로 복사
-                content = copy_chatting_room_content()
+                content = copy_chatting_room_content(sanitized_title_key)
                 if content is not None:
+                    # 대화가 바뀌었고 마지막 발화자가 상대방일 때만 새 trace 시작 (감지 시각부터)
+                    # 내가 보낸 메시지 / 스크롤 같은 픽셀 변화가 진행 중인 답장의 trace를 끊지 않도록
+                    # 딕셔너리 갱신 전에 시작해야 변경 콜백에서 이어지는 단계가 새 trace에 붙음
+                    old_content = PREVIEW_DICT.get(sanitized_title_key)
+                    transcript_changed = (
+                        old_content is None or transcript_signature(old_content) != transcript_signature(content)
+                    )
+                    if transcript_changed and extract_last_speaker(content) != "이가을":
+                        tracing.new_trace(sanitized_title_key, started=last_change_time)
+                    
                     # 딕셔너리 갱신만 (스케줄러 호출은 딕셔너리 변경 감지에서 처리)
                     save_chatting_content(sanitized_title_key, content)
                     
@@ -1235,7 +1531,7 @@ def watch_chatting_room(title_key, on_detect=None, poll_interval=0.1):
                     last_change_time = current_time  # 체크 시간 업데이트 (중복 체크 방지)
                     
                     # chatting_room_center 클릭 후 ctrl-A, ctrl-C로 복사
-                    content = copy_chatting_room_content()
+                    content = copy_chatting_room_content(sanitized_title_key)
                     if content is not None:
                         # 딕셔너리 갱신 (정제된 key 사용)
                         save_chatting_content(sanitized_title_key, content)
@@ -1254,16 +1550,12 @@ def watch_chatting_room(title_key, on_detect=None, poll_interval=0.1):
                             # 마지막 발화자가 '이가을'이 아니면 바로 제네레이터 호출 (스케줄러 거치지 않음)
                             try:
                                 import generator
-                                import threading
-                                
-                                def call_generator():
-                                    generator.generate_chatting_room_update(
-                                        title_key=sanitized_title_key,
-                                        on_scheduler_callback=None  # 스케줄러 거치지 않음
-                                    )
-                                
-                                generator_thread = threading.Thread(target=call_generator, daemon=True)
-                                generator_thread.start()
+                                eventbus.run_in_pool(
+                                    "background",
+                                    generator.generate_chatting_room_update,
+                                    title_key=sanitized_title_key,
+                                    on_scheduler_callback=None  # 스케줄러 거치지 않음
+                                )
                             except Exception as e:
                                 pass
             
@@ -1325,6 +1617,7 @@ def watcher_loop(on_detect=None,
                     if combined_hash != last_trigger_hash:
                         last_trigger_time = now
                         last_trigger_hash = combined_hash
+                        detected_at = time.time()
 
                         print("[watcher] title/preview 변경 감지됨")
                         
@@ -1347,6 +1640,16 @@ def watcher_loop(on_detect=None,
                             sanitized_title = sanitize_dict_key(title_text)
                             print(f"[watcher] OCR 성공: '{title_text}' -> 정제된 title: '{sanitized_title}'")
                             
+                            # 새 메시지마다 trace 시작 (감지 ~ title OCR까지가 detect 단계)
+                            tracing.new_trace(sanitized_title, started=detected_at)
+                            tracing.record("detect", detected_at, time.time(), sanitized_title)
+                            
+                            # 이미 큐에 있는 채팅방이면 preview OCR로 새 메시지가 급한지 판단
+                            preview_text = None
+                            if sanitized_title in DELAY_QUEUE:
+                                preview_text = get_region_image_text(REGIONS.get("preview"))
+                                print(f"[watcher] {sanitized_title} 이미 큐에 있음, preview: '{preview_text}'")
+                            
                             # 정제된 title로 PREVIEW_DICT에서 기존 채팅 내용 찾기
                             if sanitized_title in PREVIEW_DICT:
                                 existing_content = PREVIEW_DICT[sanitized_title]
@@ -1354,13 +1657,13 @@ def watcher_loop(on_detect=None,
                                 # 마지막 발화 시간과 현재 시간 비교
                                 is_delayed, time_diff = compare_message_time(existing_content, threshold_minutes=2)
                                 
-                                # 모든 변경을 큐에 추가 (이미 있으면 무시)
+                                # 모든 변경을 큐에 추가 (이미 있으면 기존 항목에 합침)
                                 print(f"[watcher] {sanitized_title} 마지막 발화 시간과 {time_diff:.1f}초 차이, 큐에 추가")
-                                add_to_delay_queue(sanitized_title, time_diff)
+                                add_to_delay_queue(sanitized_title, time_diff, preview_text)
                             else:
                                 # PREVIEW_DICT에 없으면 새 채팅방이므로 즉시 waiting 상태로 추가
                                 print(f"[watcher] {sanitized_title} 새 채팅방, 즉시 waiting 상태로 큐 추가")
-                                add_to_delay_queue(sanitized_title, 0.0)  # 시간 차이 0으로 추가
+                                add_to_delay_queue(sanitized_title, 0.0, preview_text)  # 시간 차이 0으로 추가
                         else:
                             print(f"[watcher] [WARNING] OCR 실패: title_text가 None입니다. OCR_AVAILABLE={OCR_AVAILABLE}")
                             if not OCR_AVAILABLE:
@@ -9,8 +9,9 @@ from tkinter import ttk
 
 import macro
 import gui  # PreviewStackgui 사용
-import schedular
-import generator
+import pipeline
+import eventbus
+import roomstate
 
 # 키보드 입력 감지용
 try:
@@ -102,135 +103,90 @@ def main():
         print(line)
         append_log_line(line)
 
-    def on_detect(title_key, content):
-        # 마찬가지로 메인 스레드에서 UI 갱신하도록 after 사용
-        root.after(0, lambda tk=title_key, c=content: _log_detection(tk, c))
-        
-        # 제네레이터 호출을 위한 콜백 함수들 정의
-        def on_scheduler_callback(tk, c):
-            # 스케줄러 재호출 콜백
-            print(f"[main] on_scheduler_callback 호출됨 (재호출)")
-            print(f"[main]   - title_key: {tk}")
-            
-            def scheduler_inner():
-                print(f"[main] scheduler_inner 스레드 시작 (재호출)")
-                def on_tag_received_inner(tag):
-                    print(f"[main] on_tag_received_inner 호출됨: tag={tag}")
-                    # 태그가 <WAIT> 또는 <INSTANT>인 경우 무조건 GUI 업데이트
-                    if tag in ["<WAIT>", "<INSTANT>", "<FINISH>"]:
-                        # 메인 스레드에서 GUI 업데이트
-                        def update_gui():
-                            print(f"[main] update_gui 실행됨 (재호출): tag={tag}")
-                            try:
-                                app.update_tag(tag)
-                                print(f"[main] app.update_tag 호출 완료 (재호출)")
-                            except Exception as e:
-                                print(f"[main] [ERROR] GUI 업데이트 중 오류 (재호출): {e}")
-                                import traceback
-                                traceback.print_exc()
-                        root.after(0, update_gui)
-                        # 추가 보장: after_idle도 사용
-                        root.after_idle(update_gui)
-                        print(f"[main] GUI 업데이트 스케줄됨: tag={tag}")
-                    else:
-                        print(f"[main] [WARNING] 알 수 없는 태그 (재호출): {tag}")
-                    # <INSTANT> 태그일 때만 제네레이터 호출
-                    if tag == "<INSTANT>":
-                        call_generator_inner(tk, c)
-                print(f"[main] schedule_chatting_room_update 재호출 예정: title_key={tk}")
-                schedular.schedule_chatting_room_update(
-                    title_key=tk,
-                    on_tag_received=on_tag_received_inner
-                )
-                print(f"[main] schedule_chatting_room_update 재호출 완료")
-            scheduler_thread = threading.Thread(target=scheduler_inner, daemon=True)
-            scheduler_thread.start()
-            print(f"[main] 스케줄러 재호출 스레드 시작됨")
-        
-        def call_generator_inner(tk, c):
-            # 제네레이터 호출 함수
-            generator_thread = threading.Thread(
-                target=lambda: generator.generate_chatting_room_update(
-                    title_key=tk,
-                    on_scheduler_callback=on_scheduler_callback
-                ),
-                daemon=True
-            )
-            generator_thread.start()
-        
-        # 딕셔너리 변경 감지 시 스케줄러 호출
-        def on_dict_change(tk, c):
-            print(f"[main] on_dict_change 호출됨")
-            print(f"[main]   - title_key: {tk}")
-            print(f"[main]   - content 길이: {len(c)} 문자")
-            
-            # 스케줄러 호출 전에 GUI 태그를 instant로 설정
-            def set_instant_tag():
+    # ----------------------------
+    # 스케줄러 태그 수신 시 GUI 갱신 (DecisionMade 이벤트)
+    # ----------------------------
+    def on_tag_received(tag):
+        print(f"[main] on_tag_received 호출됨: tag={tag}")
+        # 태그가 <WAIT> 또는 <INSTANT>인 경우 무조건 GUI 업데이트
+        if tag in ["<WAIT>", "<INSTANT>", "<FINISH>"]:
+            # 메인 스레드에서 GUI 업데이트
+            def update_gui():
+                print(f"[main] update_gui 실행됨: tag={tag}")
                 try:
-                    app.update_tag("<INSTANT>")
-                    print(f"[main] 스케줄러 호출 전 GUI 태그를 <INSTANT>로 설정")
-                except Exception as e:
-                    print(f"[main] [ERROR] GUI 태그 설정 중 오류: {e}")
-            root.after(0, set_instant_tag)
-            
-            def call_scheduler():
-                print(f"[main] call_scheduler 스레드 시작")
-                def on_tag_received(tag):
-                    print(f"[main] on_tag_received 호출됨: tag={tag}")
-                    # 태그가 <WAIT> 또는 <INSTANT>인 경우 무조건 GUI 업데이트
-                    if tag in ["<WAIT>", "<INSTANT>", "<FINISH>"]:
-                        # 메인 스레드에서 GUI 업데이트
-                        def update_gui():
-                            print(f"[main] update_gui 실행됨: tag={tag}")
-                            try:
-                                app.update_tag(tag)
-                                print(f"[main] app.update_tag 호출 완료: tag={tag}")
-                                # <INSTANT> 태그인 경우 추가 확인
-                                if tag == "<INSTANT>":
-                                    # 잠시 후 다시 확인하여 확실히 적용되도록
-                                    def verify_instant():
-                                        current_tag = app.current_tag
-                                        print(f"[main] <INSTANT> 태그 확인: 현재 활성 태그={current_tag}")
-                                        if current_tag != "<INSTANT>":
-                                            print(f"[main] [WARNING] <INSTANT> 태그가 덮어씌워짐! 다시 적용...")
-                                            app.update_tag("<INSTANT>")
-                                    root.after(100, verify_instant)  # 100ms 후 확인
-                            except Exception as e:
-                                print(f"[main] [ERROR] GUI 업데이트 중 오류: {e}")
-                                import traceback
-                                traceback.print_exc()
-                        root.after(0, update_gui)
-                        # 추가 보장: after_idle도 사용
-                        root.after_idle(update_gui)
-                        print(f"[main] GUI 업데이트 스케줄됨: tag={tag}")
-                    else:
-                        print(f"[main] [WARNING] 알 수 없는 태그: {tag}")
-                    
-                    # <INSTANT> 태그일 때만 제네레이터 호출
+                    app.update_tag(tag)
+                    print(f"[main] app.update_tag 호출 완료: tag={tag}")
+                    # <INSTANT> 태그인 경우 추가 확인
                     if tag == "<INSTANT>":
-                        print(f"[main] 스케줄러 태그가 <INSTANT>이므로 제네레이터 호출")
-                        # 제네레이터 호출 전에 GUI 업데이트가 완료되도록 약간의 딜레이
-                        def call_generator_delayed():
-                            time.sleep(0.1)  # GUI 업데이트가 완료되도록 대기
-                            call_generator_inner(tk, c)
-                        generator_delay_thread = threading.Thread(target=call_generator_delayed, daemon=True)
-                        generator_delay_thread.start()
-                
-                print(f"[main] schedule_chatting_room_update 호출 예정: title_key={tk}")
-                schedular.schedule_chatting_room_update(
-                    title_key=tk,
-                    on_tag_received=on_tag_received
-                )
-                print(f"[main] schedule_chatting_room_update 호출 완료")
-            
-            # 별도 스레드에서 schedular 호출 (API 호출이 블로킹될 수 있음)
-            print(f"[main] 스케줄러 호출 스레드 생성 및 시작")
-            scheduler_thread = threading.Thread(target=call_scheduler, daemon=True)
-            scheduler_thread.start()
-            print(f"[main] 스케줄러 호출 스레드 시작됨")
+                        # 잠시 후 다시 확인하여 확실히 적용되도록
+                        def verify_instant():
+                            current_tag = app.current_tag
+                            print(f"[main] <INSTANT> 태그 확인: 현재 활성 태그={current_tag}")
+                            if current_tag != "<INSTANT>":
+                                print(f"[main] [WARNING] <INSTANT> 태그가 덮어씌워짐! 다시 적용...")
+                                app.update_tag("<INSTANT>")
+                        root.after(100, verify_instant)  # 100ms 후 확인
+                except Exception as e:
+                    print(f"[main] [ERROR] GUI 업데이트 중 오류: {e}")
+                    import traceback
+                    traceback.print_exc()
+            root.after(0, update_gui)
+            print(f"[main] GUI 업데이트 스케줄됨: tag={tag}")
+        else:
+            print(f"[main] [WARNING] 알 수 없는 태그: {tag}")
+
+    # ----------------------------
+    # 이벤트 처리 함수 등록 (시작할 때 한 번, eventbus 작업 풀에서 실행됨)
+    # ----------------------------
+    def on_region_changed(event):
+        # 메인 스레드에서 UI 갱신하도록 after 사용
+        root.after(0, lambda: _log_detection(event.title_key, event.content))
+
+    def on_transcript_delta(event):
+        # 딕셔너리 변경 감지 시 파이프라인에 제출
+        # (스케줄러 → <INSTANT>이면 제네레이터 → 전송, 새 버전이 오면 진행 중인 요청 취소)
+        print(f"[main] 대화 변경: {event.title_key} (버전 {event.version}, {len(event.content)} 문자)")
+        
+        # 스케줄러 호출 전에 GUI 태그를 instant로 설정
+        def set_instant_tag():
+            try:
+                app.update_tag("<INSTANT>")
+                print(f"[main] 스케줄러 호출 전 GUI 태그를 <INSTANT>로 설정")
+            except Exception as e:
+                print(f"[main] [ERROR] GUI 태그 설정 중 오류: {e}")
+        root.after(0, set_instant_tag)
         
-        # 딕셔너리 변경 감지 콜백 설정
-        macro.set_dict_change_callback(on_dict_change)
+        pipeline.submit(event.title_key)
+        print(f"[main] 파이프라인에 제출됨: {event.title_key}")
+
+    def on_room_stuck(event):
+        # 한 상태에 너무 오래 머문 채팅방 정리 (전송 중이면 UI 조작이라 로그만 남김)
+        from datetime import datetime
+        time_str = datetime.now().strftime("%H:%M:%S")
+        macro.log_message(f"[{time_str}] [멈춤] {event.title_key} {event.state} 상태로 {event.elapsed:.0f}초")
+        if event.state == roomstate.OPENING:
+            # 채팅방을 열지 못했으면 큐에서 빼서 다음 채팅방 처리
+            macro.remove_from_queue(event.title_key)
+            roomstate.transition(event.title_key, roomstate.CLOSED, "stuck", only_from=(roomstate.OPENING,))
+        elif event.state in (roomstate.DECIDING, roomstate.GENERATING):
+            pipeline.cancel(event.title_key)
+            roomstate.transition(event.title_key, roomstate.WATCHING, "stuck", only_from=(event.state,))
+        elif event.state == roomstate.COOLDOWN:
+            roomstate.transition(event.title_key, roomstate.WATCHING, "stuck", only_from=(roomstate.COOLDOWN,))
+
+    eventbus.subscribe(eventbus.RegionChanged, on_region_changed)
+    eventbus.subscribe(eventbus.TranscriptDelta, on_transcript_delta)
+    eventbus.subscribe(eventbus.DecisionMade, lambda event: on_tag_received(event.tag))
+    eventbus.subscribe(eventbus.RoomStuck, on_room_stuck)
+
+    # 감지 / 딕셔너리 변경은 이벤트로 발행만 함
+    def on_detect(title_key, content):
+        eventbus.publish(eventbus.RegionChanged(title_key, content))
+
+    macro.set_dict_change_callback(
+        lambda tk, c: eventbus.publish(eventbus.TranscriptDelta(tk, c, macro.get_room_version(tk)))
+    )
+    pipeline.start()
 
     # ----------------------------
     # OCR 초기화
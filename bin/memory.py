@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Optional
+
+import numpy as np
+
+import canned
+import summary
+
+# ---------------------
+# 채팅방별 장기 기억
+# ---------------------
+# 제네레이터에는 최근 GENERATOR_CONTEXT_WINDOW_LINES 줄만 그대로 보내고, 그보다 오래된 줄은
+# MEMORY_CHUNK_LINES 줄씩 묶어 해시 n-gram 벡터(canned.vectorize)로 색인해 두었다가
+# 최근 대화와 관련 있는 묶음 MEMORY_TOP_K개만 MESSAGE_CONTEXT 앞에 붙임.
+# 색인은 채팅방마다 .npy(벡터) + .json(묶음 내용, 마지막으로 색인한 줄들의 해시)으로 저장
+# 벡터는 메모리에 올려 사용 (Windows에서는 mmap으로 열린 파일을 os.replace로 교체할 수 없음)
+# 오래된 줄 전체의 흐름은 summary 모듈의 요약으로 MESSAGE_CONTEXT 맨 앞에 붙음
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MEMORY_DIR = os.path.join(BASE_DIR, "memory")
+
+MEMORY_ENABLED = True
+GENERATOR_CONTEXT_WINDOW_LINES = 40  # 제네레이터에 그대로 보내는 최근 줄 수
+MEMORY_CHUNK_LINES = 6
+MEMORY_TOP_K = 3
+MEMORY_MIN_SIMILARITY = 0.25
+MEMORY_QUERY_LINES = 4  # 검색어로 쓰는 최근 줄 수
+
+MEMORY_HEADER = "[이전 대화 중 관련 내용]"
+RECENT_HEADER = "[최근 대화]"
+
+# {title_key: {"vectors": np.ndarray, "chunks": [str], "anchor": 마지막으로 색인한 위치 (summary.line_anchor)}}
+_rooms = {}
+_lock = threading.Lock()
+
+
+def _room_paths(title_key: str) -> tuple:
+    room_hash = hashlib.sha1(title_key.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(MEMORY_DIR, room_hash)
+    return base + ".npy", base + ".json"
+
+
+def _load_room(title_key: str) -> dict:
+    """채팅방 색인 로드 (_lock을 잡은 상태, 메모리에 없으면 파일에서 읽음)"""
+    room = _rooms.get(title_key)
+    if room is not None:
+        return room
+
+    vectors_path, meta_path = _room_paths(title_key)
+    room = {"vectors": np.zeros((0, canned.VECTOR_DIM), dtype=np.float32), "chunks": [], "anchor": None}
+    if os.path.exists(vectors_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            room = {
+                "vectors": np.load(vectors_path),
+                "chunks": meta["chunks"],
+                "anchor": meta.get("anchor"),
+            }
+        except Exception as e:
+            print(f"[memory] [{title_key}] [ERROR] 색인 로드 실패, 새로 만듦: {e}")
+    _rooms[title_key] = room
+    return room
+
+
+def _save_room(title_key: str, room: dict):
+    """채팅방 색인 저장 (_lock을 잡은 상태)"""
+    os.makedirs(MEMORY_DIR, exist_ok=True)
+    vectors_path, meta_path = _room_paths(title_key)
+    # 쓰는 도중 종료되어도 기존 색인이 깨지지 않도록 새 파일에 쓴 뒤 교체
+    with open(vectors_path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(room["vectors"]))
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"title": title_key, "chunks": room["chunks"], "anchor": room["anchor"]}, f, ensure_ascii=False)
+    os.replace(vectors_path + ".tmp", vectors_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def index_older_lines(title_key: str, older_lines: list) -> int:
+    """
+    최근 창 밖으로 밀려난 줄 중 아직 색인하지 않은 줄을 MEMORY_CHUNK_LINES 줄씩 묶어 색인
+    (묶음을 채우지 못한 나머지 줄은 다음에 다시 시도)
+
+    Returns:
+        int: 새로 추가한 묶음 수
+    """
+    with _lock:
+        room = _load_room(title_key)
+        start = summary.resume_index(older_lines, room["anchor"])
+        new_lines = older_lines[start:]
+        chunk_count = len(new_lines) // MEMORY_CHUNK_LINES
+        if chunk_count == 0:
+            return 0
+
+        chunks = [
+            "\n".join(new_lines[i * MEMORY_CHUNK_LINES:(i + 1) * MEMORY_CHUNK_LINES])
+            for i in range(chunk_count)
+        ]
+        room["vectors"] = np.concatenate([room["vectors"], np.stack([canned.vectorize(chunk) for chunk in chunks])])
+        room["chunks"].extend(chunks)
+        room["anchor"] = summary.line_anchor(older_lines[:start + chunk_count * MEMORY_CHUNK_LINES])
+        try:
+            _save_room(title_key, room)
+        except Exception as e:
+            print(f"[memory] [{title_key}] [ERROR] 색인 저장 실패: {e}")
+
+    print(f"[memory] [{title_key}] 묶음 {chunk_count}개 색인 (전체 {len(room['chunks'])}개)")
+    return chunk_count
+
+
+def retrieve(title_key: str, query: str, top_k: Optional[int] = None) -> list:
+    """
+    검색어와 관련 있는 묶음을 시간 순서대로 반환 (유사도 MEMORY_MIN_SIMILARITY 이상만)
+    top_k가 None이면 MEMORY_TOP_K
+    """
+    with _lock:
+        room = _load_room(title_key)
+        vectors, chunks = room["vectors"], list(room["chunks"])
+    if not chunks or not query.strip():
+        return []
+
+    similarities = np.asarray(vectors @ canned.vectorize(query))
+    best = np.argsort(-similarities)[:top_k or MEMORY_TOP_K]
+    return [chunks[i] for i in sorted(best) if similarities[i] >= MEMORY_MIN_SIMILARITY]
+
+
+def split_window(message_context: str, window_lines: Optional[int] = None) -> tuple:
+    """
+    채팅 내용을 (오래된 줄 리스트, 최근 창 줄 리스트)로 나눔 (빈 줄 제외)
+    window_lines가 None이면 GENERATOR_CONTEXT_WINDOW_LINES
+    """
+    if window_lines is None:
+        window_lines = GENERATOR_CONTEXT_WINDOW_LINES
+    lines = [line for line in (message_context or "").split("\n") if line.strip()]
+    if len(lines) <= window_lines:
+        return [], lines
+    return lines[:-window_lines], lines[-window_lines:]
+
+
+def build_context(title_key: str, message_context: str) -> str:
+    """
+    제네레이터용 MESSAGE_CONTEXT 구성: 이전 대화 요약 + 관련 있는 이전 대화 묶음 + 최근 창
+
+    Args:
+        title_key: 채팅방 제목
+        message_context: 채팅 내용 전체 (날짜 줄 제거된 상태)
+
+    Returns:
+        창이 전체를 담으면 원래 내용 그대로, 아니면 요약 / 이전 대화 묶음 / 최근 창을 합친 내용
+    """
+    if not MEMORY_ENABLED:
+        return message_context
+
+    older, recent = split_window(message_context)
+    if not older:
+        return message_context
+
+    try:
+        index_older_lines(title_key, older)
+        snippets = retrieve(title_key, "\n".join(recent[-MEMORY_QUERY_LINES:]))
+    except Exception as e:
+        print(f"[memory] [{title_key}] [ERROR] 기억 검색 중 오류: {e}")
+        snippets = []
+
+    # 요약은 백그라운드에서 갱신되고, 여기서는 지금까지의 요약만 사용
+    summary.schedule_update(title_key, older)
+    summary_text = summary.get_summary(title_key)
+
+    recent_text = "\n".join(recent)
+    if not snippets and not summary_text:
+        return recent_text
+    print(f"[memory] [{title_key}] 요약 {len(summary_text)}자, 관련 묶음 {len(snippets)}개 사용 (오래된 줄 {len(older)}줄 중)")
+    sections = []
+    if summary_text:
+        sections.append(f"{summary.SUMMARY_HEADER}\n{summary_text}")
+    if snippets:
+        sections.append(f"{MEMORY_HEADER}\n" + "\n...\n".join(snippets))
+    sections.append(f"{RECENT_HEADER}\n{recent_text}")
+    return "\n\n".join(sections)
+
+
+def get_memory_stats() -> dict:
+    """메모리에 로드된 채팅방별 묶음 수 반환"""
+    with _lock:
+        return {title_key: len(room["chunks"]) for title_key, room in _rooms.items()}
@@ -0,0 +1,413 @@
+import asyncio
+import queue
+import threading
+from typing import Optional
+
+import macro
+import schedular
+import generator
+import fastpath
+import singleflight
+import roomdiff
+import eventbus
+import roomstate
+
+# ---------------------
+# 채팅방별 asyncio 결정 파이프라인
+# ---------------------
+# 대화 내용이 바뀔 때마다 스레드를 새로 만드는 대신, 하나의 이벤트 루프에서
+# 채팅방마다 최대 하나의 태스크(스케줄러 → 제네레이터 → 전송)를 실행.
+# 새 대화 버전이 들어오면 진행 중인 스케줄러/제네레이터 요청을 취소하고 새로 시작하여
+# 오래된 대화에 대한 답장을 보내거나 토큰을 낭비하지 않도록 함.
+# 전송 단계(UI 조작)는 취소하지 않고, 끝난 뒤 최신 버전으로 다시 실행.
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+# {title_key: asyncio.Task}
+_room_tasks = {}
+# {title_key: "deciding" | "generating" | "sending"}
+_room_phases = {}
+# 전송 중에 새 버전이 들어와서 전송 후 다시 실행해야 하는 채팅방
+_rerun_rooms = set()
+# 파이프라인 단계 → 채팅방 상태 (결정 단계는 태스크 시작 시 기록)
+_PHASE_STATES = {
+    "preparing": roomstate.GENERATING,
+    "generating": roomstate.GENERATING,
+    "sending": roomstate.SENDING,
+}
+
+# ---------------------
+# 추측 생성 (스케줄러와 제네레이터 동시 호출)
+# ---------------------
+# LLM 스케줄러가 <INSTANT>를 자주 반환하는 관계에서는 스케줄러 호출과 동시에
+# 제네레이터 초안을 만들어 두고, <INSTANT>면 바로 전송 / <WAIT>면 버림
+SPECULATIVE_ENABLED = True
+SPECULATIVE_MIN_INSTANT_RATE = 0.7  # 관계별 <INSTANT> 비율이 이 값 이상일 때만
+SPECULATIVE_MIN_SAMPLES = 10  # 비율을 믿을 수 있는 최소 결정 수
+
+# {relationship: {"decisions": int, "instant": int}} (LLM 스케줄러 결정만 집계)
+_relationship_stats = {}
+
+_speculative_stats = {
+    "started": 0,  # 시작한 초안 수
+    "used": 0,  # <INSTANT>로 전송에 사용된 초안 수
+    "discarded": 0,  # <WAIT> 등으로 버린 초안 수
+    "cancelled": 0,  # 완료 전에 취소된 초안 수 (토큰 일부만 사용)
+    "wasted_prompt_tokens": 0,  # 버린 초안의 입력 토큰
+    "wasted_completion_tokens": 0,  # 버린 초안의 출력 토큰
+}
+
+_stats = {
+    "submitted": 0,  # 제출된 대화 버전 수
+    "superseded": 0,  # 새 버전 때문에 취소된 태스크 수
+    "cancelled_calls": 0,  # 그 중 LLM 요청이 진행 중이던 경우 (스케줄러 / 제네레이터)
+    "stale_dropped": 0,  # 생성은 끝났지만 대화가 바뀌어 버린 답장 수
+    "deferred": 0,  # 전송 중이라 전송 후로 미룬 횟수
+    "completed": 0,  # 끝까지 실행된 태스크 수
+}
+
+
+def start():
+    """이벤트 루프 스레드 시작 (이미 실행 중이면 무시)"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is not None:
+            return _loop
+        _loop = asyncio.new_event_loop()
+        _loop_thread = threading.Thread(target=_loop.run_forever, daemon=True)
+        _loop_thread.start()
+        print("[pipeline] 결정 파이프라인 이벤트 루프 시작")
+        return _loop
+
+
+def submit(title_key: str):
+    """
+    채팅방의 새 대화 버전을 파이프라인에 제출 (어느 스레드에서든 호출 가능)
+    진행 중인 결정/생성은 취소되고 최신 버전으로 다시 시작됨
+    """
+    loop = start()
+    loop.call_soon_threadsafe(_submit_in_loop, title_key)
+
+
+def _submit_in_loop(title_key: str):
+    """이벤트 루프 안에서 실행: 기존 태스크 취소 또는 전송 후 재실행 예약"""
+    _stats["submitted"] += 1
+    task = _room_tasks.get(title_key)
+
+    if task is not None and not task.done():
+        phase = _room_phases.get(title_key)
+        if phase == "sending":
+            # 전송(UI 조작)은 중간에 끊지 않고, 끝난 뒤 최신 버전으로 다시 실행
+            _rerun_rooms.add(title_key)
+            _stats["deferred"] += 1
+            print(f"[pipeline] [{title_key}] 전송 중 새 버전 도착, 전송 후 다시 실행")
+            return
+
+        task.cancel()
+        _stats["superseded"] += 1
+        if phase in ("deciding", "generating"):
+            _stats["cancelled_calls"] += 1
+        print(f"[pipeline] [{title_key}] 새 버전 도착, 진행 중인 작업 취소 (단계: {phase})")
+
+    version = macro.get_room_version(title_key)
+    _room_tasks[title_key] = asyncio.ensure_future(_run_room(title_key, version))
+    roomstate.transition(title_key, roomstate.DECIDING, f"version {version}")
+
+
+def cancel(title_key: str):
+    """
+    채팅방의 진행 중인 결정/생성 취소 (어느 스레드에서든 호출 가능, 멈춘 상태 처리용)
+    전송 단계는 UI 조작 중이므로 취소하지 않음
+    """
+    loop = start()
+    loop.call_soon_threadsafe(_cancel_in_loop, title_key)
+
+
+def _cancel_in_loop(title_key: str):
+    task = _room_tasks.get(title_key)
+    if task is None or task.done() or _room_phases.get(title_key) == "sending":
+        return
+    task.cancel()
+    _room_tasks.pop(title_key, None)
+    _room_phases.pop(title_key, None)
+    _rerun_rooms.discard(title_key)
+    print(f"[pipeline] [{title_key}] 진행 중인 작업 취소 (멈춤)")
+
+
+def _owns_room(title_key: str) -> bool:
+    """현재 태스크가 채팅방의 최신 태스크인지 확인 (취소된 이전 태스크는 False)"""
+    return _room_tasks.get(title_key) is asyncio.current_task()
+
+
+def _set_phase(title_key: str, phase: str):
+    """현재 태스크가 채팅방을 소유하고 있을 때만 단계 기록"""
+    if _owns_room(title_key):
+        _room_phases[title_key] = phase
+        if phase in _PHASE_STATES:
+            roomstate.transition(title_key, _PHASE_STATES[phase], phase)
+
+
+def _is_stale(title_key: str, version: int) -> bool:
+    """태스크를 시작한 뒤 대화 내용이 바뀌었는지 확인"""
+    return macro.get_room_version(title_key) != version
+
+
+def _record_decision(relationship: str, tag: Optional[str]):
+    """관계별 LLM 스케줄러 결정 집계 (추측 생성 여부 판단용)"""
+    if tag not in ("<INSTANT>", "<WAIT>"):
+        return
+    stats = _relationship_stats.setdefault(relationship, {"decisions": 0, "instant": 0})
+    stats["decisions"] += 1
+    if tag == "<INSTANT>":
+        stats["instant"] += 1
+
+
+def should_speculate(relationship: str) -> bool:
+    """관계별 <INSTANT> 비율이 임계값 이상이면 추측 생성"""
+    if not SPECULATIVE_ENABLED:
+        return False
+    stats = _relationship_stats.get(relationship)
+    if not stats or stats["decisions"] < SPECULATIVE_MIN_SAMPLES:
+        return False
+    return stats["instant"] / stats["decisions"] >= SPECULATIVE_MIN_INSTANT_RATE
+
+
+def _start_draft(title_key: str) -> Optional[dict]:
+    """제네레이터 초안 생성 시작 (스케줄러 호출과 동시에 진행)"""
+    context = generator.prepare_generation_context(title_key)
+    if context is None:
+        return None
+    message_context, relationship = context
+
+    usage = {}
+    task = asyncio.ensure_future(generator.call_generator_api_async(
+        title_key=title_key,
+        message_context=message_context,
+        relationship=relationship,
+        usage=usage
+    ))
+    _speculative_stats["started"] += 1
+    print(f"[pipeline] [{title_key}] 추측 생성 시작 ({relationship})")
+    return {"task": task, "usage": usage}
+
+
+def _discard_draft(title_key: str, draft: Optional[dict]):
+    """사용하지 않는 초안 정리 (진행 중이면 취소, 완료됐으면 낭비 토큰 기록)"""
+    if draft is None or draft.get("discarded"):
+        return
+    draft["discarded"] = True
+    task = draft["task"]
+    if not task.done():
+        task.cancel()
+        _speculative_stats["cancelled"] += 1
+        print(f"[pipeline] [{title_key}] 추측 생성 취소")
+        return
+    _speculative_stats["discarded"] += 1
+    _speculative_stats["wasted_prompt_tokens"] += draft["usage"].get("prompt_tokens", 0)
+    _speculative_stats["wasted_completion_tokens"] += draft["usage"].get("completion_tokens", 0)
+    print(f"[pipeline] [{title_key}] 추측 생성 초안 폐기 (출력 {draft['usage'].get('completion_tokens', 0)}토큰 낭비)")
+
+
+async def _decide(title_key: str) -> tuple:
+    """
+    스케줄러 단계: 로컬 분류기 → (애매하면) LLM
+    
+    Returns:
+        tuple: (tag 또는 None, 추측 생성 초안 또는 None)
+    """
+    context = schedular.prepare_decision_context(title_key)
+    if context is None:
+        return None, None
+    message_context, relationship = context
+
+    fast_result = fastpath.classify(message_context, relationship)
+    if fast_result["confident"]:
+        # 일부는 백그라운드에서 LLM으로 검증 (일치율 기록)
+        schedular.record_fastpath_decision(title_key, message_context, relationship, fast_result)
+        return fast_result["tag"], None
+
+    _set_phase(title_key, "deciding")
+    draft = _start_draft(title_key) if should_speculate(relationship) else None
+    try:
+        call_scheduler = (
+            schedular.call_scheduler_api_batched if schedular.SCHEDULER_BATCH_ENABLED
+            else schedular.call_scheduler_api_async
+        )
+        tag = await call_scheduler(
+            title_key=title_key,
+            message_context=message_context,
+            relationship=relationship
+        )
+    except BaseException:
+        _discard_draft(title_key, draft)
+        raise
+    if tag is None:
+        # 호출 실패 / circuit open: 실제 결정이 아니므로 일치율 / 결정 통계에 넣지 않음
+        print(f"[pipeline] [{title_key}] 스케줄러 결정 실패, {schedular.SCHEDULER_FALLBACK_TAG}로 처리")
+        return schedular.SCHEDULER_FALLBACK_TAG, draft
+    fastpath.record_agreement(fast_result, tag)
+    _record_decision(relationship, tag)
+    return tag, draft
+
+
+async def _run_room(title_key: str, version: int):
+    """채팅방 하나에 대해 결정 → 생성 → 전송 실행"""
+    draft = None
+    try:
+        tag, draft = await _decide(title_key)
+        if tag is None:
+            return
+        eventbus.publish(eventbus.DecisionMade(title_key, tag))
+        if tag != "<INSTANT>":
+            return
+
+        # 다른 경로(stale 감시 등)에서 같은 채팅방의 생성/전송이 진행 중이면
+        # 끝난 뒤 최신 대화로 다시 제출
+        if not singleflight.GENERATIONS.try_acquire(title_key, follow_up=lambda: submit(title_key)):
+            return
+        try:
+            # 초안은 _generate_and_send에서 사용하거나 정리함
+            handed_over, draft = draft, None
+            await _generate_and_send(title_key, version, handed_over)
+        finally:
+            singleflight.GENERATIONS.release(title_key)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"[pipeline] [{title_key}] [ERROR] 처리 중 오류: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        _discard_draft(title_key, draft)
+        if _owns_room(title_key):
+            # 답장을 보내지 않고 끝났으면 감시 상태로 (전송했으면 generator가 이미 바꿈)
+            roomstate.transition(
+                title_key, roomstate.WATCHING, "no_reply", only_from=(roomstate.DECIDING, roomstate.GENERATING)
+            )
+            _room_phases.pop(title_key, None)
+            del _room_tasks[title_key]
+            if title_key in _rerun_rooms:
+                _rerun_rooms.discard(title_key)
+                _submit_in_loop(title_key)
+
+
+async def _generate_and_send(title_key: str, version: int, draft: Optional[dict] = None):
+    """
+    생성 단계 → 전송 단계 (GENERATIONS 실행 권한을 가진 상태에서 호출)
+    추측 생성 초안이 있으면 새로 생성하지 않고 초안을 전송
+    사용하지 않은 초안은 어느 경로로 끝나든 여기서 정리 (취소 또는 낭비 토큰 기록)
+    """
+    try:
+        context = generator.prepare_generation_context(title_key)
+        if context is None:
+            return
+        message_context, relationship = context
+
+        # 전송 시작 전 chatting_room 내용 저장 (UI 조작이므로 별도 스레드에서)
+        _set_phase(title_key, "preparing")
+        before_content = await asyncio.to_thread(roomdiff.copy_before_send, title_key)
+        if before_content is None:
+            return
+
+        _set_phase(title_key, "generating")
+        # 짧은 맞장구는 로컬 답장 사용 (추측 생성 초안보다 우선)
+        response_text = generator.lookup_canned_reply(title_key, message_context, relationship)
+        if response_text and draft is not None:
+            _discard_draft(title_key, draft)
+            draft = None
+        if not response_text and draft is not None:
+            # 초안이 실패했으면 아래에서 일반 생성으로 진행
+            response_text = await draft["task"]
+            draft = None
+            if response_text:
+                _speculative_stats["used"] += 1
+                print(f"[pipeline] [{title_key}] 추측 생성 초안 사용")
+
+        if not response_text and generator.GENERATOR_STREAMING_ENABLED:
+            await _stream_and_send(title_key, version, message_context, relationship, before_content)
+            return
+        if not response_text:
+            response_text = await generator.call_generator_api_async(
+                title_key=title_key,
+                message_context=message_context,
+                relationship=relationship
+            )
+        if not response_text:
+            return
+
+        if _is_stale(title_key, version):
+            _stats["stale_dropped"] += 1
+            print(f"[pipeline] [{title_key}] 생성 중 대화가 바뀌어 답장 폐기")
+            return
+
+        _set_phase(title_key, "sending")
+        await asyncio.to_thread(
+            generator.send_generated_reply,
+            title_key,
+            response_text,
+            before_content,
+            lambda tk, c: submit(tk)
+        )
+        _stats["completed"] += 1
+    finally:
+        _discard_draft(title_key, draft)
+
+
+def _drain_queue(segments: queue.Queue):
+    """전송 스레드에서 사용: None이 들어올 때까지 구간을 하나씩 꺼냄"""
+    while True:
+        segment = segments.get()
+        if segment is None:
+            return
+        yield segment
+
+
+async def _stream_and_send(title_key: str, version: int, message_context: str, relationship: str, before_content: str):
+    """
+    스트리밍 생성: 첫 구간이 완성되면 전송 스레드를 시작하고,
+    이후 구간은 생성되는 대로 전송 스레드에 넘김
+    """
+    segments = queue.Queue()
+    sender = None
+    try:
+        async for segment in generator.stream_generator_segments_async(
+            title_key=title_key,
+            message_context=message_context,
+            relationship=relationship
+        ):
+            if sender is None:
+                if _is_stale(title_key, version):
+                    _stats["stale_dropped"] += 1
+                    print(f"[pipeline] [{title_key}] 생성 중 대화가 바뀌어 답장 폐기")
+                    return
+                # 첫 구간부터는 전송 단계 (더 이상 취소하지 않음)
+                _set_phase(title_key, "sending")
+                print(f"[pipeline] [{title_key}] 첫 구간 완성, 전송 시작")
+                sender = asyncio.ensure_future(asyncio.to_thread(
+                    generator.send_generated_segments,
+                    title_key,
+                    _drain_queue(segments),
+                    before_content,
+                    lambda tk, c: submit(tk)
+                ))
+            segments.put(segment)
+    finally:
+        segments.put(None)
+
+    if sender is not None:
+        await sender
+        _stats["completed"] += 1
+
+
+def get_pipeline_stats() -> dict:
+    """파이프라인 통계 반환 (취소된 LLM 요청 수, 추측 생성 낭비 토큰 포함)"""
+    stats = dict(_stats)
+    stats["active_rooms"] = len(_room_tasks)
+    stats["speculative"] = dict(_speculative_stats)
+    stats["instant_rate"] = {
+        relationship: item["instant"] / item["decisions"]
+        for relationship, item in _relationship_stats.items() if item["decisions"]
+    }
+    return stats
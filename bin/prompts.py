@@ -0,0 +1,154 @@
+import os
+import hashlib
+import threading
+from typing import Optional
+
+# ---------------------
+# 프롬프트 로드 캐시 + 캐시 친화적인 메시지 구성
+# ---------------------
+# - 프롬프트 파일은 한 번만 읽고, 파일 수정 시간(mtime)이 바뀌면 다시 읽음
+# - 메시지는 변하지 않는 부분(시스템 프롬프트, 관계, 대화 앞부분)을 앞에,
+#   매번 바뀌는 TIME을 맨 뒤에 두어 OpenAI 프롬프트 캐싱이 적용되도록 함
+
+# prompt_cache_key를 보내 같은 채팅방 요청이 같은 캐시로 라우팅되도록 함
+PROMPT_CACHE_KEY_ENABLED = True
+
+# {path: (mtime, text)}
+_prompt_cache = {}
+_prompt_cache_lock = threading.Lock()
+
+# 호출 종류별 프롬프트 크기 / 캐시 토큰 누적 통계
+# {kind: {"calls": int, "prompt_chars": int, "prompt_tokens": int, "cached_tokens": int, "completion_tokens": int}}
+_usage_stats = {}
+_usage_stats_lock = threading.Lock()
+
+
+def load_prompt(path: str) -> str:
+    """
+    프롬프트 파일을 읽어옴 (mtime이 바뀌지 않았으면 캐시 사용)
+    파일이 없거나 읽을 수 없으면 빈 문자열 반환
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return ""
+
+    with _prompt_cache_lock:
+        cached = _prompt_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except Exception:
+        return ""
+
+    with _prompt_cache_lock:
+        reloaded = path in _prompt_cache
+        _prompt_cache[path] = (mtime, text)
+    print(f"[prompts] 프롬프트 {'다시 ' if reloaded else ''}로드: {os.path.basename(path)} ({len(text)} 문자)")
+    return text
+
+
+def build_user_message(
+    relationship: str,
+    message_context: str,
+    current_time: str,
+    instruction: Optional[str] = None
+) -> str:
+    """
+    user 메시지 구성 (변하지 않는 필드 먼저, TIME은 마지막)
+
+    Args:
+        relationship: 관계 유형
+        message_context: 채팅 내용
+        current_time: 현재 시각 문자열 (매번 바뀜)
+        instruction: 마지막에 붙일 지시문 (없으면 생략)
+    """
+    user_message = f"""RELATIONSHIP: {relationship}
+
+MESSAGE_CONTEXT:
+{message_context}
+
+TIME: {current_time}"""
+    if instruction:
+        user_message += f"\n\n{instruction}"
+    return user_message
+
+
+def build_messages(system_prompt: str, user_message: str) -> list:
+    """시스템 프롬프트(고정) + user 메시지 순서로 messages 구성"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def cache_request_options(kind: str, title_key: str) -> dict:
+    """
+    프롬프트 캐싱용 추가 요청 옵션 반환 (chat.completions.create에 ** 로 전달)
+
+    Args:
+        kind: 호출 종류 ("scheduler", "generator" 등)
+        title_key: 채팅방 제목
+    """
+    if not PROMPT_CACHE_KEY_ENABLED:
+        return {}
+    room_hash = hashlib.sha1(title_key.encode("utf-8")).hexdigest()[:12]
+    return {"extra_body": {"prompt_cache_key": f"{kind}-{room_hash}"}}
+
+
+def report_usage(kind: str, title_key: str, messages: list, response) -> dict:
+    """
+    응답의 토큰 사용량(캐시 토큰 포함)을 기록하고 출력
+
+    Args:
+        kind: 호출 종류 ("scheduler", "generator" 등)
+        title_key: 채팅방 제목
+        messages: 요청에 보낸 messages
+        response: OpenAI 응답 객체
+
+    Returns:
+        dict: {"prompt_chars", "prompt_tokens", "cached_tokens", "completion_tokens"}
+    """
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+
+    with _usage_stats_lock:
+        stats = _usage_stats.setdefault(kind, {
+            "calls": 0,
+            "prompt_chars": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0
+        })
+        stats["calls"] += 1
+        stats["prompt_chars"] += prompt_chars
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["completion_tokens"] += completion_tokens
+
+    cached_rate = cached_tokens / prompt_tokens * 100 if prompt_tokens else 0.0
+    print(f"[prompts] [{kind}] [{title_key}] 프롬프트 {prompt_chars}자 / {prompt_tokens}토큰 "
+          f"(캐시 {cached_tokens}토큰, {cached_rate:.0f}%), 출력 {completion_tokens}토큰")
+
+    return {
+        "prompt_chars": prompt_chars,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens
+    }
+
+
+def get_usage_stats() -> dict:
+    """호출 종류별 프롬프트 크기 / 캐시 토큰 누적 통계 반환 (cached_rate 포함)"""
+    with _usage_stats_lock:
+        result = {kind: dict(stats) for kind, stats in _usage_stats.items()}
+    for stats in result.values():
+        stats["cached_rate"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+    return result
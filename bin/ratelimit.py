@@ -0,0 +1,249 @@
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from typing import Optional
+
+# ---------------------
+# OpenAI 호출 전역 속도 제한기
+# ---------------------
+# 스케줄러 / 제네레이터의 모든 요청이 하나의 제한기를 거침 (llmcall에서 사용)
+# - 분당 요청 수(RPM) / 분당 토큰 수(TPM) 토큰 버킷 + 동시 요청 수 제한
+# - 우선순위 레인: 대기 중인 요청은 레인 순서대로 (제네레이터 전송이 스케줄러 재확인보다 먼저)
+# - 429를 받으면 잠시 전체 요청을 멈춤
+# 여러 채팅방이 한꺼번에 깨어나도 429 폭주 없이 계정 한도 근처로 처리되도록 함
+
+LLM_RPM_LIMIT = 500
+LLM_TPM_LIMIT = 200_000
+LLM_MAX_CONCURRENCY = 8
+
+# 숫자가 작을수록 먼저 처리
+LANE_PRIORITY = {
+    "generator": 0,
+    "scheduler": 1,
+    "summary": 2,  # 백그라운드 요약은 가장 나중에
+}
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """요청 인자로 토큰 수 추정 (프롬프트 문자 수 + 최대 출력 토큰, 한글 기준 보수적으로)"""
+    prompt_chars = sum(len(m.get("content") or "") for m in kwargs.get("messages", []))
+    return prompt_chars + (kwargs.get("max_completion_tokens") or 0)
+
+
+class RateGovernor:
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._request_tokens = float(rpm)
+        self._token_tokens = float(tpm)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        # [(priority, seq, waiter)] 대기 중인 요청
+        self._waiters = []
+        self._seq = itertools.count()
+        self._stats = {}
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    # ---- 토큰 버킷 ----
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._request_tokens = min(self.rpm, self._request_tokens + elapsed * self.rpm / 60.0)
+        self._token_tokens = min(self.tpm, self._token_tokens + elapsed * self.tpm / 60.0)
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """지금 요청 하나(tokens)를 보낼 수 있을 때까지 남은 시간 (0이면 바로 가능)"""
+        if self._active >= self.max_concurrency:
+            return float("inf")  # release에서 깨움
+        tokens = min(tokens, self.tpm)
+        wait = max(0.0, self._paused_until - now)
+        if self._request_tokens < 1:
+            wait = max(wait, (1 - self._request_tokens) * 60.0 / self.rpm)
+        if self._token_tokens < tokens:
+            wait = max(wait, (tokens - self._token_tokens) * 60.0 / self.tpm)
+        return wait
+
+    def _take(self, lane: str, tokens: int) -> dict:
+        self._request_tokens -= 1
+        self._token_tokens -= min(tokens, self.tpm)
+        self._active += 1
+        self._lane_stats(lane)["granted"] += 1
+        return {"lane": lane, "tokens": tokens}
+
+    def _lane_stats(self, lane: str) -> dict:
+        return self._stats.setdefault(lane, {
+            "granted": 0,
+            "throttled": 0,  # 바로 보내지 못하고 대기한 요청 수
+            "throttle_sec": 0.0,  # 누적 대기 시간
+            "max_throttle_sec": 0.0,
+            "rate_limited": 0,  # 429를 받은 횟수
+        })
+
+    # ---- 대기열 ----
+
+    def _grant_waiters(self) -> float:
+        """대기열 앞에서부터 보낼 수 있는 요청을 보냄 (_cond를 잡은 상태). 다음에 확인할 때까지 시간 반환"""
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            _, _, waiter = self._waiters[0]
+            if waiter["cancelled"]:
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._wait_time(waiter["tokens"], now)
+            if wait > 0:
+                # 우선순위가 높은 요청이 막혀 있으면 뒤의 요청도 보내지 않음
+                return wait
+            heapq.heappop(self._waiters)
+            waiter["ticket"] = self._take(waiter["lane"], waiter["tokens"])
+            throttle_sec = now - waiter["enqueued"]
+            stats = self._lane_stats(waiter["lane"])
+            stats["throttle_sec"] += throttle_sec
+            stats["max_throttle_sec"] = max(stats["max_throttle_sec"], throttle_sec)
+            waiter["wake"]()
+        return float("inf")
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                wait = self._grant_waiters()
+                self._cond.wait(None if wait == float("inf") else wait)
+
+    def _enqueue(self, lane: str, tokens: int, wake) -> dict:
+        """대기열에 추가 (_cond를 잡은 상태)"""
+        waiter = {"lane": lane, "tokens": tokens, "wake": wake, "cancelled": False,
+                  "ticket": None, "enqueued": time.monotonic()}
+        self._lane_stats(lane)["throttled"] += 1
+        heapq.heappush(self._waiters, (LANE_PRIORITY.get(lane, len(LANE_PRIORITY)), next(self._seq), waiter))
+        self._cond.notify_all()
+        return waiter
+
+    def try_acquire(self, lane: str, tokens: int) -> Optional[dict]:
+        """대기 없이 바로 보낼 수 있을 때만 획득 (대기 중인 요청이 있으면 실패)"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._waiters or self._wait_time(tokens, now) > 0:
+                return None
+            return self._take(lane, tokens)
+
+    def acquire(self, lane: str, tokens: int, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        요청 하나를 보낼 권한 획득 (블로킹)
+
+        Args:
+            lane: 레인 ("generator", "scheduler")
+            tokens: 추정 토큰 수
+            timeout: 최대 대기 시간 (None이면 무제한)
+
+        Returns:
+            dict: 요청이 끝나면 release에 넘길 ticket (timeout이면 None)
+        """
+        ticket = self.try_acquire(lane, tokens)
+        if ticket is not None:
+            return ticket
+
+        event = threading.Event()
+        with self._cond:
+            waiter = self._enqueue(lane, tokens, event.set)
+        if event.wait(timeout):
+            return waiter["ticket"]
+        with self._cond:
+            if waiter["ticket"] is None:
+                waiter["cancelled"] = True
+                return None
+        return waiter["ticket"]
+
+    async def acquire_async(self, lane: str, tokens: int, timeout: Optional[float] = None) -> Optional[dict]:
+        """acquire의 asyncio 버전 (대기 중 취소되면 대기열에서 빠짐)"""
+        ticket = self.try_acquire(lane, tokens)
+        if ticket is not None:
+            return ticket
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        with self._cond:
+            waiter = self._enqueue(lane, tokens, wake)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            with self._cond:
+                if waiter["ticket"] is None:
+                    waiter["cancelled"] = True
+                    ticket = None
+                else:
+                    ticket = waiter["ticket"]
+            # 취소/timeout과 동시에 권한을 받았으면 반납
+            if ticket is not None:
+                self.release(ticket)
+            raise
+        return waiter["ticket"]
+
+    def release(self, ticket: dict, usage=None):
+        """
+        요청 종료 (동시 요청 수 반납, 실제 사용량으로 토큰 버킷 보정). 여러 번 호출해도 한 번만 반납
+
+        Args:
+            ticket: acquire가 반환한 ticket
+            usage: 응답의 usage (없으면 추정값 그대로 둠)
+        """
+        with self._cond:
+            if ticket.get("released"):
+                return
+            ticket["released"] = True
+            self._active -= 1
+            if usage is not None:
+                actual = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+                estimated = min(ticket["tokens"], self.tpm)
+                self._token_tokens = min(self.tpm, self._token_tokens + estimated - actual)
+            self._cond.notify_all()
+
+    def pause(self, lane: str, seconds: float):
+        """429를 받았을 때 전체 요청을 seconds 동안 멈춤"""
+        with self._cond:
+            self._lane_stats(lane)["rate_limited"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+        print(f"[ratelimit] [{lane}] 429 응답, {seconds:.1f}초 동안 요청 중지")
+
+    def get_stats(self) -> dict:
+        """
+        레인별 대기 / 처리 통계와 현재 대기열 깊이 반환
+
+        Returns:
+            dict: {"queue_depth", "queue_depth_by_lane", "active", "request_tokens", "token_tokens", "lanes"}
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            depth_by_lane = {}
+            for _, _, waiter in self._waiters:
+                if not waiter["cancelled"]:
+                    depth_by_lane[waiter["lane"]] = depth_by_lane.get(waiter["lane"], 0) + 1
+            return {
+                "queue_depth": sum(depth_by_lane.values()),
+                "queue_depth_by_lane": depth_by_lane,
+                "active": self._active,
+                "request_tokens": self._request_tokens,
+                "token_tokens": self._token_tokens,
+                "lanes": {lane: dict(stats) for lane, stats in self._stats.items()},
+            }
+
+
+# 스케줄러 / 제네레이터 공용 제한기
+GOVERNOR = RateGovernor(LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_MAX_CONCURRENCY)
+
+
+def get_ratelimit_stats() -> dict:
+    """전역 제한기 통계 반환"""
+    return GOVERNOR.get_stats()
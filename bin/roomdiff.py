@@ -0,0 +1,184 @@
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import ImageGrab
+
+import macro
+import uiactor
+
+# ---------------------
+# 전송 확인용 채팅방 픽셀 비교
+# ---------------------
+# 전송 후 채팅방 전체를 다시 복사(클릭 + ctrl-A + ctrl-C)하지 않고, 화면 한 번 캡처로 확인
+# - 전송 전 내용을 복사할 때(copy_before_send) 같은 UI 작업 안에서 채팅방 아래쪽을 먼저 캡처해 기준으로 저장
+# - 전송 후 다시 캡처해서 위로 밀린 만큼(스크롤) 맞춘 뒤 타일 단위로 비교
+# - 상대방 쪽(왼쪽) 열에 새로 생긴 내용이 없고, 새로 드러난 내 쪽(오른쪽) 말풍선 수가 보낸 메시지 수 이하면
+#   내 메시지만 추가된 것으로 보고 복사 생략. 그 외에는 전체 복사로 확인
+# 카카오톡 배치 가정: 내 말풍선은 오른쪽 정렬, 상대방 말풍선 / 프로필은 왼쪽 정렬
+
+VERIFY_BY_PIXELS = True
+VERIFY_BOTTOM_FRACTION = 0.6  # 비교할 채팅방 아래쪽 비율
+ROW_DOWNSCALE = 2  # 세로 해상도 축소 비율 (스크롤 추정 단위)
+TILE_COLS = 8
+TILE_ROW_PX = 8  # 타일 한 칸의 세로 크기 (축소 후 행 수)
+FOREIGN_COLS = 2  # 왼쪽에서 이 수만큼의 열은 상대방 말풍선만 나타나는 영역
+TILE_DIFF_THRESHOLD = 8.0  # 스크롤을 맞춘 뒤 타일 평균 밝기 차이가 이 이상이면 변경
+INK_THRESHOLD = 10.0  # 배경 밝기와 이 이상 차이나면 내용이 있는 행
+MIN_OVERLAP_ROWS = 16  # 스크롤 추정 시 최소 겹치는 행 수
+
+# {title_key: {"content": str, "snapshot": dict}} 전송 전 내용과 그때 화면
+_baselines = {}
+_baselines_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"verified": 0, "fallback": 0, "no_baseline": 0}
+
+
+def capture_room() -> Optional[dict]:
+    """
+    채팅방 화면 한 번 캡처
+
+    Returns:
+        dict: {"strip": 아래쪽 영역의 (행, TILE_COLS) 밝기 배열, "hash": 채팅방 전체 해시
+               (macro.trigger_chatting_room_changed와 같은 값)} 또는 None
+    """
+    if not macro.CHATTING_ROOM or macro.CHATTING_ROOM == (0, 0, 0, 0):
+        return None
+    left, top, width, height = macro.CHATTING_ROOM
+    img_np = np.array(ImageGrab.grab(bbox=(left, top, left + width, top + height)))
+    gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY) if len(img_np.shape) == 3 else img_np
+
+    bottom = gray[int(gray.shape[0] * (1 - VERIFY_BOTTOM_FRACTION)):]
+    rows = max(MIN_OVERLAP_ROWS * 2, bottom.shape[0] // ROW_DOWNSCALE)
+    strip = cv2.resize(bottom, (TILE_COLS, rows), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return {"strip": strip, "hash": macro.image_hash(img_np)}
+
+
+def _capture_then_copy(title_key: str) -> tuple:
+    snapshot = capture_room()
+    return macro.copy_chatting_room_content(title_key), snapshot
+
+
+def copy_before_send(title_key: str) -> Optional[str]:
+    """
+    전송 전 chatting_room 내용 복사 (macro.copy_chatting_room_content 대신 사용)
+    복사 직전 화면을 같은 UI 작업 안에서 캡처해 전송 확인 기준으로 저장
+    """
+    content, snapshot = uiactor.transaction("copy_room", _capture_then_copy, title_key)
+    if content is not None and snapshot is not None:
+        with _baselines_lock:
+            _baselines[title_key] = {"content": content, "snapshot": snapshot}
+    return content
+
+
+def pop_baseline(title_key: str, before_content: str) -> Optional[dict]:
+    """before_content를 복사할 때 저장한 화면 기준 (다른 내용 기준이면 None)"""
+    with _baselines_lock:
+        baseline = _baselines.pop(title_key, None)
+    if baseline is None or baseline["content"] != before_content:
+        return None
+    return baseline["snapshot"]
+
+
+def estimate_scroll(before: np.ndarray, after: np.ndarray) -> tuple:
+    """
+    전송 후 내용이 위로 밀린 행 수 추정
+
+    Returns:
+        (밀린 행 수, 겹치는 부분 평균 밝기 차이)
+    """
+    rows = before.shape[0]
+    best_shift, best_error = 0, float(np.abs(after - before).mean())
+    for shift in range(1, rows - MIN_OVERLAP_ROWS + 1):
+        error = float(np.abs(after[:rows - shift] - before[shift:]).mean())
+        if error < best_error:
+            best_shift, best_error = shift, error
+    return best_shift, best_error
+
+
+def _count_runs(mask: np.ndarray) -> int:
+    """True가 연속된 구간 수"""
+    padded = np.concatenate([[False], mask, [False]])
+    return int(np.count_nonzero(padded[1:] & ~padded[:-1]))
+
+
+def classify(before: dict, after: dict, sent_count: int) -> dict:
+    """
+    전송 전후 화면 비교
+
+    Args:
+        before / after: capture_room 결과
+        sent_count: 보낸 메시지 수
+
+    Returns:
+        dict: {"verified": 내 메시지만 추가되었으면 True, "reason", "scroll_rows", "own_bubbles"}
+    """
+    old, new = before["strip"], after["strip"]
+    rows = old.shape[0]
+    shift, _ = estimate_scroll(old, new)
+    result = {"verified": False, "reason": None, "scroll_rows": shift, "own_bubbles": 0}
+    if shift == 0:
+        result["reason"] = "no_scroll"  # 보낸 메시지가 화면에 없음 (또는 한 화면 이상 밀림)
+        return result
+
+    # 겹치는 부분: 상대방 쪽 열이 바뀌었으면 상대방 메시지가 끼어듦
+    # (내 쪽 열은 읽음 표시가 사라지는 등 바뀔 수 있어 보지 않음)
+    residual = np.abs(new[:rows - shift, :FOREIGN_COLS] - old[shift:, :FOREIGN_COLS])
+    tile_rows = max(1, residual.shape[0] // TILE_ROW_PX)
+    tiles = residual[:tile_rows * TILE_ROW_PX].reshape(tile_rows, TILE_ROW_PX, FOREIGN_COLS).mean(axis=1)
+    if (tiles >= TILE_DIFF_THRESHOLD).any():
+        result["reason"] = "foreign_overlap"
+        return result
+
+    # 새로 드러난 부분: 상대방 쪽에 내용이 있으면 상대방 메시지, 내 쪽 말풍선 수는 보낸 수 이하
+    background = float(np.median(new))
+    revealed = np.abs(new[rows - shift:] - background) >= INK_THRESHOLD
+    if revealed[:, :FOREIGN_COLS].any():
+        result["reason"] = "foreign_revealed"
+        return result
+    result["own_bubbles"] = _count_runs(revealed[:, FOREIGN_COLS:].any(axis=1))
+    if not 1 <= result["own_bubbles"] <= sent_count:
+        result["reason"] = "bubble_count"
+        return result
+
+    result["verified"] = True
+    return result
+
+
+def verify_sent(title_key: str, before_content: str, sent_count: int) -> Optional[dict]:
+    """
+    전송 후 화면 한 번 캡처로 내 메시지만 추가되었는지 확인
+
+    Returns:
+        dict: 확인되었으면 {"hash": 전송 후 채팅방 해시, ...classify 결과}, 전체 복사가 필요하면 None
+    """
+    baseline = pop_baseline(title_key, before_content)
+    if not VERIFY_BY_PIXELS or baseline is None or sent_count == 0:
+        with _stats_lock:
+            _stats["no_baseline"] += 1
+        return None
+
+    after = capture_room()
+    result = classify(baseline, after, sent_count) if after is not None else None
+    with _stats_lock:
+        _stats["verified" if result and result["verified"] else "fallback"] += 1
+    if result is None or not result["verified"]:
+        print(f"[roomdiff] [{title_key}] 화면 비교로 확인 불가, 전체 복사: "
+              f"{result['reason'] if result else 'capture_failed'}")
+        return None
+
+    print(f"[roomdiff] [{title_key}] 화면 비교로 전송 확인 (스크롤 {result['scroll_rows']}행, "
+          f"말풍선 {result['own_bubbles']}개 / 전송 {sent_count}개)")
+    result["hash"] = after["hash"]
+    return result
+
+
+def get_roomdiff_stats() -> dict:
+    """전송 확인 통계 반환 (화면 비교로 끝낸 비율 포함)"""
+    with _stats_lock:
+        stats = dict(_stats)
+    checked = stats["verified"] + stats["fallback"]
+    stats["verified_rate"] = stats["verified"] / checked if checked else 0.0
+    return stats
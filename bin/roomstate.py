@@ -0,0 +1,217 @@
+import time
+import bisect
+import threading
+from collections import deque
+from typing import Optional
+
+import eventbus
+
+# ---------------------
+# 채팅방별 상태 기계
+# ---------------------
+# DELAY_QUEUE 상태 문자열 / chatting_room_watching / 파이프라인 단계 / GUI 태그에 흩어져 있던
+# 채팅방 진행 상태를 하나로 기록
+#   QUEUED → OPENING → WATCHING → DECIDING → GENERATING → SENDING → COOLDOWN → CLOSED
+# - 상태가 바뀔 때마다 시각을 남기고, 이전 상태에 머문 시간을 상태별 히스토그램에 더함
+#   (답장까지 걸린 시간이 어느 단계에서 쓰이는지 확인용, get_roomstate_stats())
+# - STATE_TIMEOUT_SEC보다 오래 같은 상태에 머물면 RoomStuck 이벤트 발행 (처리는 main에서 등록)
+# 기록용이므로 예상하지 않은 전이도 막지 않고 그대로 반영 (횟수만 집계)
+
+QUEUED = "QUEUED"  # 지연 큐에서 열릴 차례를 기다림
+OPENING = "OPENING"  # 채팅방 목록에서 클릭 후 첫 복사 중
+WATCHING = "WATCHING"  # 채팅방 감시 중 (결정할 새 대화 없음)
+DECIDING = "DECIDING"  # 스케줄러 결정 중
+GENERATING = "GENERATING"  # 전송 전 복사 + 제네레이터 생성 중
+SENDING = "SENDING"  # 메시지 입력 / 전송 / 확인 중
+COOLDOWN = "COOLDOWN"  # 전송 후 감시 (상대방 답장 또는 finish 대기)
+CLOSED = "CLOSED"  # finish 또는 열기 실패로 처리 끝
+
+STATES = (QUEUED, OPENING, WATCHING, DECIDING, GENERATING, SENDING, COOLDOWN, CLOSED)
+
+# 정상 흐름에서 나오는 전이 (그 외 전이는 "unexpected"로 집계)
+ALLOWED_TRANSITIONS = {
+    None: {QUEUED, OPENING, WATCHING, DECIDING},
+    QUEUED: {OPENING, CLOSED},
+    OPENING: {WATCHING, CLOSED},
+    WATCHING: {DECIDING, GENERATING, CLOSED},
+    DECIDING: {WATCHING, GENERATING, DECIDING, CLOSED},
+    GENERATING: {WATCHING, SENDING, DECIDING, CLOSED},
+    SENDING: {WATCHING, COOLDOWN, CLOSED},
+    COOLDOWN: {WATCHING, DECIDING, GENERATING, CLOSED},
+    CLOSED: {QUEUED, OPENING},
+}
+
+# 상태별 최대 체류 시간 (초). 넘으면 멈춘 것으로 보고 RoomStuck 발행 (없는 상태는 제한 없음)
+# QUEUED는 큐 지연이 길 수 있고, WATCHING은 대화가 없으면 계속 머무므로 제한하지 않음
+STATE_TIMEOUT_SEC = {
+    OPENING: 30.0,
+    DECIDING: 60.0,  # 스케줄러 deadline(재시도 포함) + 배치 대기
+    GENERATING: 120.0,  # 전송 전 복사 + 제네레이터 deadline
+    SENDING: 120.0,  # 긴 답장의 사람 같은 입력 시간 포함
+    COOLDOWN: 30.0,  # 전송 후 감시(POST_SEND_WATCH_SEC) + finish
+}
+
+# 히스토그램 구간 상한 (초), 마지막 구간은 그 이상 전부
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# 채팅방별로 남겨 둘 최근 전이 수
+HISTORY_PER_ROOM = 50
+
+
+class RoomStateMachine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {title_key: {"state", "since" (monotonic), "seq"}}
+        self._rooms = {}
+        # {title_key: deque[(time.time, from_state, to_state, 이전 상태 체류 시간, reason)]}
+        self._history = {}
+        self._seq = 0
+        # {state: {"count", "total_sec", "max_sec", "buckets": [구간별 횟수]}}
+        self._durations = {}
+        self._stats = {"transitions": 0, "unexpected": 0, "stuck": {}}
+
+    def _record_duration(self, state: str, elapsed: float):
+        """이전 상태 체류 시간을 히스토그램에 추가 (_lock을 잡은 상태)"""
+        item = self._durations.setdefault(state, {
+            "count": 0, "total_sec": 0.0, "max_sec": 0.0, "buckets": [0] * (len(HISTOGRAM_BUCKETS) + 1),
+        })
+        item["count"] += 1
+        item["total_sec"] += elapsed
+        item["max_sec"] = max(item["max_sec"], elapsed)
+        item["buckets"][bisect.bisect_left(HISTOGRAM_BUCKETS, elapsed)] += 1
+
+    def transition(self, title_key: str, state: str, reason: str = "", only_from: Optional[tuple] = None) -> bool:
+        """
+        채팅방 상태 변경
+        
+        Args:
+            title_key: 채팅방 제목 (정제된 key)
+            state: 새 상태 (STATES 중 하나)
+            reason: 전이 이유 (기록용)
+            only_from: 주어지면 현재 상태가 이 중 하나일 때만 변경
+        
+        Returns:
+            bool: 상태가 바뀌었으면 True
+        """
+        if not title_key:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            current = self._rooms.get(title_key)
+            previous = current["state"] if current else None
+            if only_from is not None and previous not in only_from:
+                return False
+            # 같은 상태 재진입은 DECIDING만 기록 (새 대화 버전으로 결정을 다시 시작)
+            if previous == state and state != DECIDING:
+                return False
+
+            elapsed = now - current["since"] if current else 0.0
+            if current:
+                self._record_duration(previous, elapsed)
+            self._seq += 1
+            seq = self._seq
+            self._rooms[title_key] = {"state": state, "since": now, "seq": seq}
+            history = self._history.setdefault(title_key, deque(maxlen=HISTORY_PER_ROOM))
+            history.append((time.time(), previous, state, elapsed, reason))
+            self._stats["transitions"] += 1
+            unexpected = state not in ALLOWED_TRANSITIONS.get(previous, ())
+            if unexpected:
+                self._stats["unexpected"] += 1
+
+        suffix = f" ({reason})" if reason else ""
+        if unexpected:
+            print(f"[roomstate] [{title_key}] [WARNING] 예상하지 않은 전이 {previous} → {state}{suffix}")
+        else:
+            print(f"[roomstate] [{title_key}] {previous} → {state}, {elapsed:.2f}초{suffix}")
+
+        timeout = STATE_TIMEOUT_SEC.get(state)
+        if timeout is not None:
+            eventbus.call_later(timeout, "background", self._check_stuck, title_key, seq)
+        return True
+
+    def _check_stuck(self, title_key: str, seq: int):
+        """타이머 만료: 그 사이 상태가 바뀌지 않았으면 RoomStuck 발행"""
+        with self._lock:
+            current = self._rooms.get(title_key)
+            if current is None or current["seq"] != seq:
+                return
+            state = current["state"]
+            elapsed = time.monotonic() - current["since"]
+            self._stats["stuck"][state] = self._stats["stuck"].get(state, 0) + 1
+        print(f"[roomstate] [{title_key}] [WARNING] {state} 상태로 {elapsed:.1f}초 멈춤")
+        eventbus.publish(eventbus.RoomStuck(title_key, state, elapsed))
+
+    def state(self, title_key: str) -> Optional[str]:
+        with self._lock:
+            current = self._rooms.get(title_key)
+            return current["state"] if current else None
+
+    def history(self, title_key: str) -> list:
+        """
+        채팅방의 최근 전이 기록
+        
+        Returns:
+            list: [{"at", "from", "to", "elapsed_sec", "reason"}]
+        """
+        with self._lock:
+            history = list(self._history.get(title_key, ()))
+        return [
+            {"at": at, "from": previous, "to": state, "elapsed_sec": elapsed, "reason": reason}
+            for at, previous, state, elapsed, reason in history
+        ]
+
+    def get_stats(self) -> dict:
+        """
+        상태별 체류 시간 히스토그램과 현재 상태 반환
+        
+        Returns:
+            dict: {"rooms": {title_key: {"state", "elapsed_sec"}}, "phases": {state: {"count", "avg_sec",
+                   "max_sec", "histogram": {"<=상한": 횟수, ">마지막 상한": 횟수}}},
+                   "transitions", "unexpected", "stuck": {state: 횟수}}
+        """
+        now = time.monotonic()
+        with self._lock:
+            rooms = {
+                title_key: {"state": current["state"], "elapsed_sec": now - current["since"]}
+                for title_key, current in self._rooms.items()
+            }
+            phases = {}
+            for state, item in self._durations.items():
+                labels = [f"<={bound:g}s" for bound in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]:g}s"]
+                phases[state] = {
+                    "count": item["count"],
+                    "avg_sec": item["total_sec"] / item["count"] if item["count"] else 0.0,
+                    "max_sec": item["max_sec"],
+                    "histogram": dict(zip(labels, item["buckets"])),
+                }
+            return {
+                "rooms": rooms,
+                "phases": phases,
+                "transitions": self._stats["transitions"],
+                "unexpected": self._stats["unexpected"],
+                "stuck": dict(self._stats["stuck"]),
+            }
+
+
+# 모든 채팅방 상태를 기록하는 상태 기계
+MACHINE = RoomStateMachine()
+
+
+def transition(title_key: str, state: str, reason: str = "", only_from: Optional[tuple] = None) -> bool:
+    """MACHINE.transition 단축 함수"""
+    return MACHINE.transition(title_key, state, reason, only_from)
+
+
+def get_state(title_key: str) -> Optional[str]:
+    """채팅방 현재 상태 (기록이 없으면 None)"""
+    return MACHINE.state(title_key)
+
+
+def get_history(title_key: str) -> list:
+    """MACHINE.history 단축 함수"""
+    return MACHINE.history(title_key)
+
+
+def get_roomstate_stats() -> dict:
+    """상태 기계 통계 반환"""
+    return MACHINE.get_stats()
@@ -1,21 +1,83 @@
 import os
+import re
+import json
 import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
 from typing import Optional, Callable
 
 import macro
+import actuator
+import uiactor
+import eventbus
+import roomstate
+import tracing
+import prompts
+import llmcall
+import fastpath
+import singleflight
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(BASE_DIR, "macro_config.json")
 PROMPT_PATH = os.path.join(BASE_DIR, "..", "프롬프트", "schedular.txt")
 
+# 스케줄러에 보낼 최근 대화 줄 수 (결정 캐시 key도 이 범위로 계산)
+SCHEDULER_CONTEXT_WINDOW_LINES = 30
+
+# 호출 실패 / circuit open 시 on_response 콜백에 넘기는 기본 태그
+# (반환값은 None이라 실제 LLM 결정과 구분되고, 일치율 / 결정 통계에는 들어가지 않음)
+SCHEDULER_FALLBACK_TAG = "<WAIT>"
+
+# ---------------------
+# 제약된 결정 모드
+# ---------------------
+# 자유 텍스트 대신 태그 enum만 허용하는 structured output으로 요청하고
+# 추론을 최소로 설정해, 태그 하나를 가능한 적은 출력 토큰으로 받음
+SCHEDULER_CONSTRAINED_DECISION = True
+SCHEDULER_REASONING_EFFORT = "minimal"  # None이면 모델 기본값
+SCHEDULER_CONSTRAINED_MAX_TOKENS = 20
+
+# 제약된 결정 모드에서 허용하는 태그 (<, > 없이 보내고 파싱 시 다시 붙임)
+DECISION_TAGS = ["INSTANT", "WAIT"]
+DECISION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "scheduler_decision",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"tag": {"type": "string", "enum": DECISION_TAGS}},
+            "required": ["tag"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# 호출별 출력 토큰 / 지연 시간 기록 (최근 DECISION_CALL_HISTORY개)
+DECISION_CALL_HISTORY = 200
+_decision_calls = deque(maxlen=DECISION_CALL_HISTORY)
+_decision_calls_lock = threading.Lock()
+
+# ---------------------
+# 스케줄러 결정 캐시
+# ---------------------
+
+# 같은 대화 상태에 대해 on_dict_change / on_scheduler_callback / stale 경로가
+# 연달아 호출되어도 API를 한 번만 호출하도록 결정을 캐시
+DECISION_CACHE_TTL_SEC = 60.0
+DECISION_CACHE_MAX_SIZE = 256
+
+# {(title_key, relationship, context_hash): (tag, stored_time)}
+_decision_cache = OrderedDict()
+_decision_cache_lock = threading.Lock()
+_decision_cache_stats = {"hits": 0, "misses": 0}
+
 
 def load_prompt(path: str = PROMPT_PATH) -> str:
-    """프롬프트 파일을 읽어옴"""
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
-        return ""
+    """프롬프트 파일을 읽어옴 (prompts 캐시 사용, 파일이 바뀌면 다시 읽음)"""
+    return prompts.load_prompt(path)
 
 
 def parse_response(response_text: str) -> str:
@@ -23,7 +85,16 @@ def parse_response(response_text: str) -> str:
     OpenAI 응답에서 태그 추출
     <INSTANT>, <WAIT>, <FINISH> 중 하나를 반환
     """
-    response_text = response_text.strip()
+    response_text = (response_text or "").strip()
+    
+    # 제약된 결정 모드 응답: {"tag": "INSTANT"}
+    if response_text.startswith("{"):
+        try:
+            tag = json.loads(response_text).get("tag")
+        except (ValueError, AttributeError):
+            tag = None
+        if tag in DECISION_TAGS:
+            return f"<{tag}>"
     
     # 태그 패턴 매칭
     if "<INSTANT>" in response_text:
@@ -36,6 +107,232 @@ def parse_response(response_text: str) -> str:
         return "<WAIT>"
 
 
+def _decision_cache_key(title_key: str, relationship: str, message_context: str) -> tuple:
+    """(채팅방, 관계, 대화 내용 해시)로 캐시 key 생성"""
+    context_hash = hashlib.sha1(message_context.encode("utf-8")).hexdigest()
+    return (title_key, relationship, context_hash)
+
+
+def get_cached_decision(cache_key: tuple) -> Optional[str]:
+    """캐시에서 TTL 이내의 결정을 찾아 반환 (없으면 None)"""
+    with _decision_cache_lock:
+        entry = _decision_cache.get(cache_key)
+        if entry is not None:
+            tag, stored_time = entry
+            if time.time() - stored_time <= DECISION_CACHE_TTL_SEC:
+                _decision_cache.move_to_end(cache_key)
+                _decision_cache_stats["hits"] += 1
+                return tag
+            del _decision_cache[cache_key]
+        _decision_cache_stats["misses"] += 1
+        return None
+
+
+def store_decision(cache_key: tuple, tag: str):
+    """결정을 캐시에 저장 (최대 크기를 넘으면 오래된 항목부터 제거)"""
+    with _decision_cache_lock:
+        _decision_cache[cache_key] = (tag, time.time())
+        _decision_cache.move_to_end(cache_key)
+        while len(_decision_cache) > DECISION_CACHE_MAX_SIZE:
+            _decision_cache.popitem(last=False)
+
+
+def get_decision_cache_stats() -> dict:
+    """
+    결정 캐시 통계 반환
+    
+    Returns:
+        dict: {"hits": int, "misses": int, "hit_rate": float, "size": int}
+    """
+    with _decision_cache_lock:
+        hits = _decision_cache_stats["hits"]
+        misses = _decision_cache_stats["misses"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(_decision_cache)
+        }
+
+
+def _notify_response(title_key: str, tag: str, on_response: Optional[Callable[[str], None]]):
+    """on_response 콜백 호출 (오류는 출력만 하고 무시)"""
+    if on_response:
+        try:
+            print(f"[scheduler] [{title_key}] 콜백 호출 시작: tag={tag}")
+            on_response(tag)
+            print(f"[scheduler] [{title_key}] 콜백 호출 완료: {tag}")
+        except Exception as e:
+            print(f"[scheduler] [{title_key}] [ERROR] 콜백 호출 중 오류 발생: {e}")
+            import traceback
+            traceback.print_exc()
+    else:
+        print(f"[scheduler] [{title_key}] [WARNING] on_response 콜백이 None입니다")
+
+
+def _lookup_decision(
+    title_key: str,
+    message_context: str,
+    relationship: str,
+    on_response: Optional[Callable[[str], None]]
+) -> tuple:
+    """
+    결정 캐시 확인. 적중하면 콜백까지 호출.
+    
+    Returns:
+        tuple: (cache_key, cached_tag 또는 None)
+    """
+    cache_key = _decision_cache_key(title_key, relationship, message_context)
+    cached_tag = get_cached_decision(cache_key)
+    if cached_tag is not None:
+        stats = get_decision_cache_stats()
+        print(f"[scheduler] [{title_key}] 결정 캐시 적중: {cached_tag} (적중률 {stats['hit_rate']*100:.1f}%)")
+        from datetime import datetime
+        time_str = datetime.now().strftime("%H:%M:%S")
+        macro.log_message(f"[{time_str}] [스케줄러] {title_key}: {cached_tag} (캐시, 적중률 {stats['hit_rate']*100:.0f}%)")
+        _notify_response(title_key, cached_tag, on_response)
+    return cache_key, cached_tag
+
+
+def _build_scheduler_messages(title_key: str, message_context: str, relationship: str) -> Optional[list]:
+    """스케줄러 요청 messages 구성 (프롬프트를 로드할 수 없으면 None)"""
+    prompt = load_prompt()
+    if not prompt:
+        print(f"[scheduler] [ERROR] 프롬프트를 로드할 수 없음")
+        return None
+    print(f"[scheduler]   - 프롬프트 로드 성공, 길이: {len(prompt)} 문자")
+    
+    current_time = macro.format_korean_time()
+    print(f"[scheduler]   - 현재 시간: {current_time}")
+    
+    # 프롬프트에 입력 정보 추가 (캐시 가능한 앞부분 유지를 위해 TIME은 마지막)
+    user_message = prompts.build_user_message(relationship, message_context, current_time)
+    
+    # user_message 로그 출력
+    print("[scheduler] user_message:")
+    print("=" * 80)
+    print(user_message)
+    print("=" * 80)
+    
+    return prompts.build_messages(prompt, user_message)
+
+
+def _scheduler_request_kwargs(title_key: str, messages: list) -> dict:
+    """chat.completions.create에 전달할 스케줄러 요청 인자"""
+    kwargs = {
+        "model": "gpt-5-mini",  # 또는 "gpt-4", "gpt-3.5-turbo" 등
+        "messages": messages,
+        "max_completion_tokens": 50,
+        **prompts.cache_request_options("scheduler", title_key)
+    }
+    if SCHEDULER_CONSTRAINED_DECISION:
+        kwargs["response_format"] = DECISION_RESPONSE_FORMAT
+        kwargs["max_completion_tokens"] = SCHEDULER_CONSTRAINED_MAX_TOKENS
+        if SCHEDULER_REASONING_EFFORT:
+            # openai 1.x 초기 버전은 reasoning_effort 인자를 모르므로 extra_body로 전달
+            kwargs.setdefault("extra_body", {})["reasoning_effort"] = SCHEDULER_REASONING_EFFORT
+    return kwargs
+
+
+def record_decision_call(title_key: str, usage: dict, response, latency_sec: float):
+    """
+    스케줄러 호출 한 번의 출력 토큰 수와 지연 시간 기록
+    
+    Args:
+        title_key: 채팅방 제목
+        usage: prompts.report_usage 결과
+        response: OpenAI 응답 객체 (추론 토큰 수 확인용)
+        latency_sec: 요청 시작부터 응답까지 걸린 시간
+    """
+    details = getattr(getattr(response, "usage", None), "completion_tokens_details", None)
+    reasoning_tokens = getattr(details, "reasoning_tokens", 0) or 0
+    with _decision_calls_lock:
+        _decision_calls.append({
+            "completion_tokens": usage["completion_tokens"],
+            "reasoning_tokens": reasoning_tokens,
+            "latency_sec": latency_sec,
+            "constrained": SCHEDULER_CONSTRAINED_DECISION
+        })
+    print(f"[scheduler] [{title_key}] 결정 호출: 출력 {usage['completion_tokens']}토큰 "
+          f"(추론 {reasoning_tokens}토큰), {latency_sec*1000:.0f}ms")
+
+
+def get_decision_call_stats() -> dict:
+    """
+    최근 스케줄러 호출의 출력 토큰 / 지연 시간 통계 반환
+    
+    Returns:
+        dict: {"calls", "avg_completion_tokens", "avg_reasoning_tokens", "avg_latency_sec", "p95_latency_sec"}
+    """
+    with _decision_calls_lock:
+        calls = list(_decision_calls)
+    if not calls:
+        return {"calls": 0, "avg_completion_tokens": 0.0, "avg_reasoning_tokens": 0.0,
+                "avg_latency_sec": 0.0, "p95_latency_sec": 0.0}
+    latencies = sorted(call["latency_sec"] for call in calls)
+    return {
+        "calls": len(calls),
+        "avg_completion_tokens": sum(call["completion_tokens"] for call in calls) / len(calls),
+        "avg_reasoning_tokens": sum(call["reasoning_tokens"] for call in calls) / len(calls),
+        "avg_latency_sec": sum(latencies) / len(latencies),
+        "p95_latency_sec": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    }
+
+
+def _handle_scheduler_response(
+    title_key: str,
+    cache_key: tuple,
+    messages: list,
+    response,
+    on_response: Optional[Callable[[str], None]],
+    latency_sec: float = 0.0
+) -> Optional[str]:
+    """API 응답에서 태그를 파싱하고 캐시 저장, 로그, 콜백 처리"""
+    if not response or not response.choices:
+        print(f"[scheduler] [ERROR] 응답이 없거나 choices가 비어있음")
+        return None
+    
+    usage = prompts.report_usage("scheduler", title_key, messages, response)
+    record_decision_call(title_key, usage, response, latency_sec)
+    
+    response_text = response.choices[0].message.content
+    print(f"[scheduler]   - 원본 응답 텍스트: {response_text}")
+    
+    tag = parse_response(response_text)
+    print(f"[scheduler] [{title_key}] 파싱된 태그: {tag}")
+    store_decision(cache_key, tag)
+    
+    # 스케줄러 태그 반환 로그 (<WAIT>, <INSTANT>만)
+    if tag in ["<WAIT>", "<INSTANT>"]:
+        from datetime import datetime
+        time_str = datetime.now().strftime("%H:%M:%S")
+        macro.log_message(f"[{time_str}] [스케줄러] {title_key}: {tag}")
+    
+    # 콜백 호출 (무조건 실행)
+    _notify_response(title_key, tag, on_response)
+    return tag
+
+
+def _handle_scheduler_error(title_key: str, error: Exception, on_response: Optional[Callable[[str], None]]) -> None:
+    """
+    API 호출 예외 처리 (예외 발생 시에도 SCHEDULER_FALLBACK_TAG로 콜백 호출 시도)
+    재시도 후에도 실패했거나 circuit이 열려 있으면 None 반환 (호출한 쪽에서 기본 태그로 처리)
+    """
+    if isinstance(error, llmcall.CircuitOpenError):
+        print(f"[scheduler] [{title_key}] circuit이 열려 있어 {SCHEDULER_FALLBACK_TAG}로 대체")
+    else:
+        print(f"[scheduler] [{title_key}] API 호출 중 오류 발생: {error}")
+    if on_response:
+        try:
+            on_response(SCHEDULER_FALLBACK_TAG)
+            print(f"[scheduler] [{title_key}] 예외 발생 후 기본 태그 콜백 호출")
+        except Exception as callback_error:
+            print(f"[scheduler] [{title_key}] 예외 후 콜백 호출 중 오류: {callback_error}")
+    return None
+
+
+@tracing.traced("schedule")
 def call_scheduler_api(
     title_key: str,
     message_context: str,
@@ -52,7 +349,8 @@ def call_scheduler_api(
         on_response: 응답을 받았을 때 호출할 콜백 함수 (태그 문자열)
     
     Returns:
-        태그 문자열 (<INSTANT>, <WAIT>, <FINISH> 중 하나)
+        태그 문자열 (<INSTANT>, <WAIT>, <FINISH> 중 하나), 호출 실패 시 None
+        (on_response에는 실패 시에도 SCHEDULER_FALLBACK_TAG 전달)
     """
     print(f"[scheduler] call_scheduler_api 시작")
     print(f"[scheduler]   - title_key: {title_key}")
@@ -60,6 +358,11 @@ def call_scheduler_api(
     print(f"[scheduler]   - message_context 길이: {len(message_context)} 문자")
     print(f"[scheduler]   - on_response 콜백 존재: {on_response is not None}")
     
+    # 같은 대화 상태에 대한 결정이 캐시에 있으면 API 호출 없이 반환
+    cache_key, cached_tag = _lookup_decision(title_key, message_context, relationship, on_response)
+    if cached_tag is not None:
+        return cached_tag
+    
     if not macro.OPENAI_AVAILABLE:
         print(f"[scheduler] [ERROR] OPENAI_AVAILABLE = False")
         return None
@@ -70,81 +373,289 @@ def call_scheduler_api(
         return None
     print(f"[scheduler]   - OpenAI 클라이언트 획득 성공")
     
+    messages = _build_scheduler_messages(title_key, message_context, relationship)
+    if messages is None:
+        return None
+    
+    try:
+        print(f"[scheduler] OpenAI API 호출 시작 (model: gpt-5-mini)")
+        start = time.perf_counter()
+        response = llmcall.create("scheduler", title_key, client, **_scheduler_request_kwargs(title_key, messages))
+        latency_sec = time.perf_counter() - start
+        print(f"[scheduler] OpenAI API 호출 완료")
+        return _handle_scheduler_response(title_key, cache_key, messages, response, on_response, latency_sec)
+    except Exception as e:
+        return _handle_scheduler_error(title_key, e, on_response)
+
+
+@tracing.traced("schedule")
+async def call_scheduler_api_async(
+    title_key: str,
+    message_context: str,
+    relationship: str = "FRIEND",
+    on_response: Optional[Callable[[str], None]] = None
+) -> Optional[str]:
+    """
+    call_scheduler_api의 asyncio 버전 (pipeline에서 사용)
+    태스크가 취소되면 진행 중인 HTTP 요청도 함께 중단됨 (CancelledError 전파)
+    
+    Returns:
+        태그 문자열 (<INSTANT>, <WAIT> 중 하나) 또는 None
+    """
+    print(f"[scheduler] call_scheduler_api_async 시작: {title_key} ({relationship})")
+    
+    cache_key, cached_tag = _lookup_decision(title_key, message_context, relationship, on_response)
+    if cached_tag is not None:
+        return cached_tag
+    return await _request_decision_async(title_key, message_context, relationship, cache_key, on_response)
+
+
+async def _request_decision_async(
+    title_key: str,
+    message_context: str,
+    relationship: str,
+    cache_key: tuple,
+    on_response: Optional[Callable[[str], None]] = None
+) -> Optional[str]:
+    """단일 결정 요청 (결정 캐시는 호출한 쪽에서 이미 확인함)"""
+    client = macro.get_async_openai_client()
+    if not client:
+        print(f"[scheduler] [ERROR] AsyncOpenAI 클라이언트를 가져올 수 없음")
+        return None
+    
+    messages = _build_scheduler_messages(title_key, message_context, relationship)
+    if messages is None:
+        return None
+    
+    try:
+        start = time.perf_counter()
+        response = await llmcall.acreate("scheduler", title_key, client, **_scheduler_request_kwargs(title_key, messages))
+        latency_sec = time.perf_counter() - start
+        return _handle_scheduler_response(title_key, cache_key, messages, response, on_response, latency_sec)
+    except Exception as e:
+        return _handle_scheduler_error(title_key, e, on_response)
+
+
+# ---------------------
+# 여러 채팅방 배치 결정
+# ---------------------
+# 짧은 시간 안에 여러 채팅방이 결정 대기 상태가 되면 (아침에 단톡방이 한꺼번에
+# 깨어날 때 등) 시스템 프롬프트를 한 번만 보내는 요청 하나로 방마다 태그를 받음.
+# 응답에서 태그를 찾지 못한 채팅방은 단일 요청으로 다시 결정.
+# 다른 채팅방이 결정 대기 / 요청 중이 아니면 기다리지 않고 바로 단일 요청 (혼자일 때 지연 없음)
+SCHEDULER_BATCH_ENABLED = True
+SCHEDULER_BATCH_WINDOW_SEC = 0.2  # 첫 채팅방이 들어온 뒤 다른 채팅방을 기다리는 시간
+SCHEDULER_BATCH_MAX_ROOMS = 8
+SCHEDULER_BATCH_MAX_TOKENS_PER_ROOM = 10
+
+BATCH_INSTRUCTION = (
+    "위에 ROOM별로 주어진 채팅방 각각에 대해 독립적으로 판단하여, "
+    "방마다 <INSTANT> 또는 <WAIT> 중 하나를 \"ROOM id: 태그\" 형식으로 한 줄씩 출력하세요."
+)
+BATCH_LINE_PATTERN = re.compile(r'(r\d+)\s*:\s*<?(INSTANT|WAIT)>?')
+
+# [(title_key, message_context, relationship, cache_key, future)] 배치 대기 중인 채팅방
+_batch_pending = []
+_batch_timer = None
+# 진행 중인 결정 요청 수 (단일 + 배치 대기, 이벤트 루프 안에서만 변경)
+_batch_inflight = 0
+_batch_stats = {
+    "batches": 0,  # 보낸 배치 요청 수
+    "batched_rooms": 0,  # 배치 요청으로 결정된 채팅방 수
+    "fallbacks": 0,  # 배치 응답에서 태그를 찾지 못해 단일 요청으로 결정한 채팅방 수
+    "immediate": 0,  # 다른 채팅방이 없어 기다리지 않고 바로 단일 요청한 수
+}
+
+
+def _batch_room_id(index: int) -> str:
+    return f"r{index + 1}"
+
+
+def _build_batch_messages(rooms: list) -> Optional[list]:
+    """배치 요청 messages 구성 (채팅방마다 ROOM 구역, TIME과 지시문은 마지막)"""
     prompt = load_prompt()
     if not prompt:
         print(f"[scheduler] [ERROR] 프롬프트를 로드할 수 없음")
         return None
-    print(f"[scheduler]   - 프롬프트 로드 성공, 길이: {len(prompt)} 문자")
-    
-    current_time = macro.format_korean_time()
-    print(f"[scheduler]   - 현재 시간: {current_time}")
-    
-    # 프롬프트에 입력 정보 추가
-    user_message = f"""TIME: {current_time}
+
+    sections = []
+    for index, (title_key, message_context, relationship, _, _) in enumerate(rooms):
+        sections.append(f"""ROOM {_batch_room_id(index)}:
 RELATIONSHIP: {relationship}
 
 MESSAGE_CONTEXT:
-{message_context}"""
+{message_context}""")
+    user_message = "\n\n".join(sections)
+    user_message += f"\n\nTIME: {macro.format_korean_time()}\n\n{BATCH_INSTRUCTION}"
+    return prompts.build_messages(prompt, user_message)
+
+
+def _batch_request_kwargs(room_count: int, messages: list) -> dict:
+    """배치 요청 인자 (제약된 결정 모드이면 방 id마다 태그 enum 필드를 가진 스키마)"""
+    kwargs = {
+        "model": "gpt-5-mini",
+        "messages": messages,
+        "max_completion_tokens": SCHEDULER_BATCH_MAX_TOKENS_PER_ROOM * room_count + 20,
+    }
+    if SCHEDULER_CONSTRAINED_DECISION:
+        room_ids = [_batch_room_id(index) for index in range(room_count)]
+        kwargs["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "scheduler_batch_decision",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {room_id: {"type": "string", "enum": DECISION_TAGS} for room_id in room_ids},
+                    "required": room_ids,
+                    "additionalProperties": False
+                }
+            }
+        }
+        if SCHEDULER_REASONING_EFFORT:
+            kwargs.setdefault("extra_body", {})["reasoning_effort"] = SCHEDULER_REASONING_EFFORT
+    return kwargs
+
+
+def parse_batch_response(response_text: str) -> dict:
+    """
+    배치 응답에서 방 id별 태그 추출 (찾지 못한 방은 결과에 없음)
     
-    # user_message 로그 출력
-    print("[scheduler] user_message:")
-    print("=" * 80)
-    print(user_message)
-    print("=" * 80)
+    Returns:
+        dict: {room_id: "<INSTANT>" | "<WAIT>"}
+    """
+    response_text = (response_text or "").strip()
+    if response_text.startswith("{"):
+        try:
+            data = json.loads(response_text)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            return {room_id: f"<{tag}>" for room_id, tag in data.items() if tag in DECISION_TAGS}
+    return {room_id: f"<{tag}>" for room_id, tag in BATCH_LINE_PATTERN.findall(response_text)}
+
+
+@tracing.traced("schedule")
+async def call_scheduler_api_batched(
+    title_key: str,
+    message_context: str,
+    relationship: str = "FRIEND"
+) -> Optional[str]:
+    """
+    배치 결정 요청 (pipeline에서 사용, 이벤트 루프 안에서만 호출)
+    다른 채팅방이 결정 대기 / 요청 중이면 SCHEDULER_BATCH_WINDOW_SEC 동안 들어온 채팅방과 묶어서 한 번에 요청.
+    혼자면 기다리지 않고 바로 단일 요청 (call_scheduler_api_async와 같음).
     
+    Returns:
+        태그 문자열 (<INSTANT>, <WAIT> 중 하나) 또는 None
+    """
+    global _batch_timer, _batch_inflight
+
+    cache_key, cached_tag = _lookup_decision(title_key, message_context, relationship, None)
+    if cached_tag is not None:
+        return cached_tag
+
+    _batch_inflight += 1
     try:
-        print(f"[scheduler] OpenAI API 호출 시작 (model: gpt-5-mini)")
-        response = client.chat.completions.create(
-            model="gpt-5-mini",  # 또는 "gpt-4", "gpt-3.5-turbo" 등
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_completion_tokens=50
-        )
-        print(f"[scheduler] OpenAI API 호출 완료")
-        
-        if not response or not response.choices:
-            print(f"[scheduler] [ERROR] 응답이 없거나 choices가 비어있음")
-            return None
-        
-        response_text = response.choices[0].message.content
-        print(f"[scheduler]   - 원본 응답 텍스트: {response_text}")
-        
-        tag = parse_response(response_text)
-        print(f"[scheduler] [{title_key}] 파싱된 태그: {tag}")
-        
-        # 스케줄러 태그 반환 로그 (<WAIT>, <INSTANT>만)
-        if tag in ["<WAIT>", "<INSTANT>"]:
-            from datetime import datetime
-            time_str = datetime.now().strftime("%H:%M:%S")
-            macro.log_message(f"[{time_str}] [스케줄러] {title_key}: {tag}")
-        
-        # 콜백 호출 (무조건 실행)
-        if on_response:
-            try:
-                print(f"[scheduler] [{title_key}] 콜백 호출 시작: tag={tag}")
-                on_response(tag)
-                print(f"[scheduler] [{title_key}] 콜백 호출 완료: {tag}")
-            except Exception as e:
-                print(f"[scheduler] [{title_key}] [ERROR] 콜백 호출 중 오류 발생: {e}")
-                import traceback
-                traceback.print_exc()
-        else:
-            print(f"[scheduler] [{title_key}] [WARNING] on_response 콜백이 None입니다")
-        
-        return tag
-        
+        if not _batch_pending and _batch_inflight == 1:
+            _batch_stats["immediate"] += 1
+            return await _request_decision_async(title_key, message_context, relationship, cache_key)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _batch_pending.append((title_key, message_context, relationship, cache_key, future))
+        if len(_batch_pending) >= SCHEDULER_BATCH_MAX_ROOMS:
+            _flush_batch()
+        elif _batch_timer is None:
+            _batch_timer = loop.call_later(SCHEDULER_BATCH_WINDOW_SEC, _flush_batch)
+
+        # (tag 또는 None, 배치 요청에 포함되었는지)
+        tag, batched = await future
+        if tag is not None:
+            return tag
+
+        if batched:
+            # 배치 응답에서 이 채팅방의 태그를 찾지 못함 → 단일 요청
+            _batch_stats["fallbacks"] += 1
+            print(f"[scheduler] [{title_key}] 배치 응답에 태그 없음, 단일 요청으로 결정")
+        return await _request_decision_async(title_key, message_context, relationship, cache_key)
+    finally:
+        _batch_inflight -= 1
+
+
+def _flush_batch():
+    """대기 중인 채팅방을 모아 배치 요청 시작 (취소된 채팅방은 제외)"""
+    global _batch_timer
+    if _batch_timer is not None:
+        _batch_timer.cancel()
+        _batch_timer = None
+
+    rooms = [room for room in _batch_pending if not room[4].done()]
+    _batch_pending.clear()
+    if len(rooms) == 1:
+        # 혼자면 배치 형식 대신 단일 요청 (방 하나에 대해 프롬프트 형식을 바꿀 필요 없음)
+        rooms[0][4].set_result((None, False))
+    elif rooms:
+        asyncio.ensure_future(_run_batch(rooms))
+
+
+async def _run_batch(rooms: list):
+    """배치 요청 실행 후 채팅방별 future에 (태그, True) 전달 (실패한 방은 태그 None)"""
+    results = {}
+    try:
+        results = await _request_batch(rooms)
     except Exception as e:
-        print(f"[scheduler] [{title_key}] API 호출 중 오류 발생: {e}")
-        # 예외 발생 시에도 콜백 호출 시도 (태그는 None 또는 기본값)
-        if on_response:
-            try:
-                on_response("<WAIT>")
-                print(f"[scheduler] [{title_key}] 예외 발생 후 기본 태그 콜백 호출")
-            except Exception as callback_error:
-                print(f"[scheduler] [{title_key}] 예외 후 콜백 호출 중 오류: {callback_error}")
-        return None
+        print(f"[scheduler] 배치 요청 중 오류 발생: {e}")
+    finally:
+        for index, (title_key, _, _, cache_key, future) in enumerate(rooms):
+            if future.done():
+                continue
+            tag = results.get(_batch_room_id(index))
+            if tag is not None:
+                store_decision(cache_key, tag)
+            future.set_result((tag, True))
+
+
+async def _request_batch(rooms: list) -> dict:
+    """배치 요청 한 번 보내고 {room_id: tag} 반환"""
+    client = macro.get_async_openai_client()
+    if not client:
+        print(f"[scheduler] [ERROR] AsyncOpenAI 클라이언트를 가져올 수 없음")
+        return {}
+
+    messages = _build_batch_messages(rooms)
+    if messages is None:
+        return {}
+
+    batch_key = f"batch({len(rooms)})"
+    print(f"[scheduler] 배치 결정 요청: {[room[0] for room in rooms]}")
+    start = time.perf_counter()
+    response = await llmcall.acreate("scheduler", batch_key, client, **_batch_request_kwargs(len(rooms), messages))
+    latency_sec = time.perf_counter() - start
+    if not response or not response.choices:
+        return {}
+
+    usage = prompts.report_usage("scheduler_batch", batch_key, messages, response)
+    record_decision_call(batch_key, usage, response, latency_sec)
+    response_text = response.choices[0].message.content
+    print(f"[scheduler]   - 배치 원본 응답 텍스트: {response_text}")
+
+    results = parse_batch_response(response_text)
+    _batch_stats["batches"] += 1
+    _batch_stats["batched_rooms"] += len(results)
+
+    from datetime import datetime
+    time_str = datetime.now().strftime("%H:%M:%S")
+    for index, (title_key, _, _, _, _) in enumerate(rooms):
+        tag = results.get(_batch_room_id(index))
+        if tag is not None:
+            macro.log_message(f"[{time_str}] [스케줄러] {title_key}: {tag} (배치 {len(rooms)}개)")
+    return results
+
+
+def get_batch_stats() -> dict:
+    """배치 결정 통계 반환"""
+    return dict(_batch_stats)
 
 
 def process_finish_action(title_key: str = None):
@@ -164,12 +675,10 @@ def process_finish_action(title_key: str = None):
     if not finish_coord or len(finish_coord) != 2:
         return
     
-    import pyautogui
     x, y = finish_coord
     
     # finish 좌표 클릭
-    pyautogui.click(x, y)
-    time.sleep(0.5)
+    uiactor.transaction("finish", actuator.run, [("click", x, y), ("sleep", 0.5)])
     
     # 채팅방 감시 종료
     macro.chatting_room_watch_stopped = True
@@ -178,29 +687,21 @@ def process_finish_action(title_key: str = None):
     # 큐에서 해당 채팅방 제거
     if title_key:
         macro.remove_from_queue(title_key)
+        roomstate.transition(title_key, roomstate.CLOSED, "finish")
+        eventbus.publish(eventbus.RoomFinished(title_key))
 
 
-def schedule_chatting_room_update(
-    title_key: str,
-    on_tag_received: Optional[Callable[[str], None]] = None
-):
+def prepare_decision_context(title_key: str) -> Optional[tuple]:
     """
-    chatting_room이 업데이트될 때마다 호출되는 함수
-    PREVIEW_DICT에서 해당 title_key의 내용을 가져와서 API 호출
+    PREVIEW_DICT에서 스케줄러 입력을 준비 (날짜 줄 제거, 최근 대화만 남김)
     
-    Args:
-        title_key: 채팅방 제목
-        on_tag_received: 태그를 받았을 때 호출할 콜백 (태그 문자열)
+    Returns:
+        tuple: (message_context, relationship) 또는 None (내용이 없을 때)
     """
-    print(f"[scheduler] schedule_chatting_room_update 호출됨")
-    print(f"[scheduler]   - title_key: {title_key}")
-    print(f"[scheduler]   - on_tag_received 콜백 존재: {on_tag_received is not None}")
-    print(f"[scheduler]   - PREVIEW_DICT에 title_key 존재: {title_key in macro.PREVIEW_DICT}")
-    
     if title_key not in macro.PREVIEW_DICT:
         print(f"[scheduler] [ERROR] title_key가 PREVIEW_DICT에 없음: {title_key}")
         print(f"[scheduler]   - PREVIEW_DICT의 키 목록: {list(macro.PREVIEW_DICT.keys())[:5]}...")
-        return
+        return None
     
     message_context = macro.PREVIEW_DICT[title_key]
     print(f"[scheduler]   - message_context 길이: {len(message_context)} 문자")
@@ -212,47 +713,114 @@ def schedule_chatting_room_update(
     message_context_after = len(message_context)
     print(f"[scheduler]   - 날짜 줄 제거 후 길이: {message_context_before} -> {message_context_after} 문자")
     
+    # 최근 대화만 남김 (결정 캐시 key도 이 범위로 계산됨)
+    message_context = macro.window_message_context(message_context, SCHEDULER_CONTEXT_WINDOW_LINES)
+    
     # 관계 유형 결정
     relationship = macro.get_chat_relationship_tag(title_key)
     print(f"[scheduler]   - relationship: {relationship}")
     
+    return message_context, relationship
+
+
+def schedule_chatting_room_update(
+    title_key: str,
+    on_tag_received: Optional[Callable[[str], None]] = None
+):
+    """
+    chatting_room이 업데이트될 때마다 호출되는 함수
+    PREVIEW_DICT에서 해당 title_key의 내용을 가져와서 API 호출
+    같은 채팅방의 결정이 이미 진행 중이면 후속 요청 하나로 합쳐서 끝난 뒤 실행
+    
+    Args:
+        title_key: 채팅방 제목
+        on_tag_received: 태그를 받았을 때 호출할 콜백 (태그 문자열)
+    """
+    singleflight.DECISIONS.run(title_key, _schedule_chatting_room_update, title_key, on_tag_received)
+
+
+def _schedule_chatting_room_update(
+    title_key: str,
+    on_tag_received: Optional[Callable[[str], None]] = None
+):
+    """schedule_chatting_room_update 본체 (채팅방당 하나씩만 실행됨)"""
+    print(f"[scheduler] schedule_chatting_room_update 호출됨")
+    print(f"[scheduler]   - title_key: {title_key}")
+    print(f"[scheduler]   - on_tag_received 콜백 존재: {on_tag_received is not None}")
+    print(f"[scheduler]   - PREVIEW_DICT에 title_key 존재: {title_key in macro.PREVIEW_DICT}")
+    
+    context = prepare_decision_context(title_key)
+    if context is None:
+        return
+    message_context, relationship = context
+    
+    # 로컬 분류기: 명확한 경우(질문, 직접 호출, 연속 발화 등)는 API 호출 없이 결정
+    fast_result = fastpath.classify(message_context, relationship)
+    print(f"[scheduler]   - fastpath: {fast_result['tag']} (신뢰도 {fast_result['confidence']:.2f}, {fast_result['elapsed_us']:.0f}us)")
+    if fast_result["confident"]:
+        _handle_fastpath_decision(title_key, message_context, relationship, fast_result, on_tag_received)
+        return
+    
     # API 호출
     print(f"[scheduler] call_scheduler_api 호출 시작...")
     received_tag = [None]  # 콜백에서 받은 태그를 저장하기 위한 리스트
     
-    def ensure_callback(tag_value):
-        """콜백이 확실히 호출되도록 보장하는 래퍼"""
-        print(f"[scheduler] ensure_callback 호출됨: tag={tag_value}")
+    def record_tag(tag_value):
         received_tag[0] = tag_value
-        _handle_tag_response(tag_value, on_tag_received)
     
     tag = call_scheduler_api(
         title_key=title_key,
         message_context=message_context,
         relationship=relationship,
-        on_response=ensure_callback
+        on_response=record_tag
     )
     print(f"[scheduler] call_scheduler_api 호출 완료, 반환된 tag: {tag}")
-    print(f"[scheduler] 콜백에서 받은 tag: {received_tag[0]}")
-    
-    # 태그가 있으면 무조건 콜백 호출 (이중 보장)
-    final_tag = tag or received_tag[0]
-    if final_tag and final_tag in ["<WAIT>", "<INSTANT>", "<FINISH>"]:
-        print(f"[scheduler] 최종 태그 확인: {final_tag}, 콜백 재호출 보장")
-        if on_tag_received:
-            try:
-                on_tag_received(final_tag)
-                print(f"[scheduler] 최종 태그 콜백 호출 완료: {final_tag}")
-            except Exception as e:
-                print(f"[scheduler] [ERROR] 최종 태그 콜백 호출 중 오류: {e}")
-                import traceback
-                traceback.print_exc()
+    fastpath.record_agreement(fast_result, tag)
+    
+    # 태그 콜백은 응답당 한 번만 호출 (API 예외 시에는 SCHEDULER_FALLBACK_TAG)
+    if received_tag[0] is not None:
+        _handle_tag_response(received_tag[0], on_tag_received)
     
     if tag == "<FINISH>":
         print(f"[scheduler] <FINISH> 태그 감지, process_finish_action 호출")
         process_finish_action(title_key)
 
 
+def _handle_fastpath_decision(
+    title_key: str,
+    message_context: str,
+    relationship: str,
+    fast_result: dict,
+    on_tag_received: Optional[Callable[[str], None]]
+):
+    """로컬 분류기가 확신한 결정 처리 (일부는 백그라운드에서 LLM으로 검증)"""
+    record_fastpath_decision(title_key, message_context, relationship, fast_result)
+    _handle_tag_response(fast_result["tag"], on_tag_received)
+
+
+def record_fastpath_decision(title_key: str, message_context: str, relationship: str, fast_result: dict):
+    """
+    로컬 결정 기록 (schedule_chatting_room_update / pipeline 공용)
+    FASTPATH_SHADOW_RATE 확률로 백그라운드에서 LLM에도 물어 일치율 기록
+    """
+    tag = fast_result["tag"]
+    print(f"[scheduler] [{title_key}] fastpath 결정: {tag}")
+    
+    from datetime import datetime
+    time_str = datetime.now().strftime("%H:%M:%S")
+    macro.log_message(f"[{time_str}] [스케줄러] {title_key}: {tag} (로컬)")
+    
+    if fastpath.should_shadow_check():
+        def shadow_check():
+            llm_tag = call_scheduler_api(
+                title_key=title_key,
+                message_context=message_context,
+                relationship=relationship
+            )
+            fastpath.record_agreement(fast_result, llm_tag)
+        eventbus.run_in_pool("background", shadow_check)
+
+
 def _handle_tag_response(tag: str, on_tag_received: Optional[Callable[[str], None]]):
     """태그 응답 처리"""
     print(f"[scheduler] _handle_tag_response 호출됨")
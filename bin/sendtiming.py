@@ -0,0 +1,167 @@
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+# ---------------------
+# 메시지 전송 타이밍 모델
+# ---------------------
+# 전송 중 대기 시간을 두 종류로 나누어 따로 조정
+# - 기계적 대기 (MECHANICAL_SETTLE_SEC): 클릭 / 단축키 / 클립보드가 화면에 반영되기까지 필요한 최소 시간
+# - 사람 같은 대기 (TimingModel): 입력하는 시간, 메시지 사이 간격
+# 기본 "human" 모델은 관계별 타이핑 속도로 메시지 길이에 비례해 계산하고,
+# "fast" 모델은 사람 같은 대기 없이 기계적 대기만 사용 (테스트용)
+# 단계별 실제 소요 시간은 get_send_stats()로 확인
+
+# 단계별 기계적 대기 (단계 동작 직후)
+MECHANICAL_SETTLE_SEC = {
+    "focus_input": 0.15,  # 채팅입력칸 클릭 후
+    "select_all": 0.05,
+    "clipboard": 0.05,
+    "paste": 0.1,
+    "send_click": 0.0,
+    "verify": 0.3,  # 마지막 전송 후 변경 확인 복사 전 (전송한 메시지가 화면에 그려지는 시간)
+}
+
+# 사용할 타이밍 모델 ("human" / "fast")
+SEND_TIMING_MODEL = "human"
+
+# 관계별 타이핑 프로필
+# think_sec: 입력 시작 전 기본 시간, chars_per_sec: 입력 속도, max_typing_sec: 입력 시간 상한
+# gap_sec: 나눠 보내는 메시지 사이 간격, jitter: 무작위로 더하거나 빼는 비율
+TYPING_PROFILES = {
+    "FAMILY": {"think_sec": 0.4, "chars_per_sec": 8.0, "max_typing_sec": 3.0, "gap_sec": 0.5, "jitter": 0.2},
+    "FRIEND": {"think_sec": 0.3, "chars_per_sec": 10.0, "max_typing_sec": 2.5, "gap_sec": 0.4, "jitter": 0.2},
+    "STRANGER": {"think_sec": 0.6, "chars_per_sec": 7.0, "max_typing_sec": 3.5, "gap_sec": 0.7, "jitter": 0.2},
+    "GROUP_MIXED": {"think_sec": 0.4, "chars_per_sec": 9.0, "max_typing_sec": 2.5, "gap_sec": 0.5, "jitter": 0.2},
+}
+DEFAULT_TYPING_PROFILE = "FRIEND"
+
+
+class TimingModel:
+    """전송 단계별 대기 시간 계산 (상속해서 TIMING_MODELS에 등록하면 교체 가능)"""
+
+    def mechanical_sec(self, step: str) -> float:
+        """단계 동작 직후 기계적 대기"""
+        return MECHANICAL_SETTLE_SEC.get(step, 0.0)
+
+    def typing_sec(self, message: str, relationship: Optional[str]) -> float:
+        """붙여넣기 후 전송 버튼을 누르기까지 사람 같은 대기"""
+        return 0.0
+
+    def gap_sec(self, message: str, relationship: Optional[str]) -> float:
+        """두 번째 메시지부터 입력 시작 전 사람 같은 대기"""
+        return 0.0
+
+
+class HumanTimingModel(TimingModel):
+    """관계별 타이핑 속도로 메시지 길이에 비례하는 대기"""
+
+    def _profile(self, relationship: Optional[str]) -> dict:
+        return TYPING_PROFILES.get(relationship, TYPING_PROFILES[DEFAULT_TYPING_PROFILE])
+
+    def _jittered(self, seconds: float, profile: dict) -> float:
+        return max(0.0, seconds * (1 + random.uniform(-profile["jitter"], profile["jitter"])))
+
+    def typing_sec(self, message: str, relationship: Optional[str]) -> float:
+        profile = self._profile(relationship)
+        typing = min(profile["max_typing_sec"], len(message) / profile["chars_per_sec"])
+        return self._jittered(profile["think_sec"] + typing, profile)
+
+    def gap_sec(self, message: str, relationship: Optional[str]) -> float:
+        profile = self._profile(relationship)
+        return self._jittered(profile["gap_sec"], profile)
+
+
+class FastTimingModel(TimingModel):
+    """사람 같은 대기 없이 기계적 대기만 (테스트용)"""
+
+
+TIMING_MODELS = {
+    "human": HumanTimingModel(),
+    "fast": FastTimingModel(),
+}
+
+_stats_lock = threading.Lock()
+# {step: {"kind": "mechanical" | "deliberate", "count", "total_sec", "max_sec"}}
+_step_stats = {}
+
+
+def get_timing_model() -> TimingModel:
+    """SEND_TIMING_MODEL에 해당하는 모델 (없으면 "human")"""
+    return TIMING_MODELS.get(SEND_TIMING_MODEL, TIMING_MODELS["human"])
+
+
+def set_timing_model(name: str):
+    """사용할 타이밍 모델 변경 ("fast"면 사람 같은 대기 없음)"""
+    global SEND_TIMING_MODEL
+    if name not in TIMING_MODELS:
+        raise ValueError(f"알 수 없는 타이밍 모델: {name} (가능: {', '.join(TIMING_MODELS)})")
+    SEND_TIMING_MODEL = name
+    print(f"[sendtiming] 타이밍 모델: {name}")
+
+
+def _record(step: str, kind: str, elapsed: float):
+    with _stats_lock:
+        stats = _step_stats.setdefault(step, {"kind": kind, "count": 0, "total_sec": 0.0, "max_sec": 0.0})
+        stats["count"] += 1
+        stats["total_sec"] += elapsed
+        stats["max_sec"] = max(stats["max_sec"], elapsed)
+
+
+@contextmanager
+def step(name: str):
+    """
+    기계적 단계 하나 측정: 블록 안의 동작 + 동작 직후 기계적 대기
+
+    사용 예:
+        with sendtiming.step("paste"):
+            actuator.hotkey('ctrl', 'v')
+    """
+    start = time.perf_counter()
+    yield
+    settle = get_timing_model().mechanical_sec(name)
+    if settle > 0:
+        time.sleep(settle)
+    _record(name, "mechanical", time.perf_counter() - start)
+
+
+def settle(name: str):
+    """동작 없이 기계적 대기만 하는 단계"""
+    with step(name):
+        pass
+
+
+def pause(name: str, seconds: float):
+    """사람 같은 대기 (측정 포함)"""
+    start = time.perf_counter()
+    if seconds > 0:
+        time.sleep(seconds)
+    _record(name, "deliberate", time.perf_counter() - start)
+
+
+def get_send_stats() -> dict:
+    """
+    전송 단계별 소요 시간 통계 반환
+
+    Returns:
+        dict: {"model", "steps": {step: {"kind", "count", "avg_sec", "max_sec"}},
+               "mechanical_sec", "deliberate_sec"} (합계는 단계별 평균의 합)
+    """
+    with _stats_lock:
+        steps = {
+            name: {
+                "kind": stats["kind"],
+                "count": stats["count"],
+                "avg_sec": stats["total_sec"] / stats["count"],
+                "max_sec": stats["max_sec"],
+            }
+            for name, stats in _step_stats.items()
+        }
+    return {
+        "model": SEND_TIMING_MODEL,
+        "steps": steps,
+        "mechanical_sec": sum(s["avg_sec"] for s in steps.values() if s["kind"] == "mechanical"),
+        "deliberate_sec": sum(s["avg_sec"] for s in steps.values() if s["kind"] == "deliberate"),
+    }
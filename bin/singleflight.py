@@ -0,0 +1,114 @@
+import threading
+from typing import Optional, Callable
+
+import eventbus
+
+# ---------------------
+# 채팅방별 single-flight 실행기
+# ---------------------
+# 같은 채팅방에 대해 결정(스케줄러) / 생성(제네레이터+전송)이 동시에 두 개 이상
+# 실행되지 않도록 보장. 실행 중에 들어온 요청은 후속 요청 하나로 합쳐져서
+# (가장 마지막 요청만 남김) 현재 실행이 끝난 뒤 한 번만 실행됨.
+# 후속 요청은 반납한 스레드(asyncio 루프일 수 있음)가 아니라 background 작업 풀에서 실행됨.
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = set()
+        # {key: callable} 실행이 끝난 뒤 실행할 후속 요청 (마지막 요청만 유지)
+        self._follow_ups = {}
+        self._stats = {
+            "started": 0,  # 실제로 시작된 실행 수
+            "suppressed": 0,  # 실행 중이라 바로 실행하지 않은 중복 요청 수
+            "coalesced": 0,  # 그 중 이미 대기 중인 후속 요청에 합쳐진 수
+            "follow_ups": 0,  # 실행된 후속 요청 수
+        }
+
+    def try_acquire(self, key: str, follow_up: Optional[Callable[[], None]] = None) -> bool:
+        """
+        key에 대한 실행 권한 획득 시도 (블로킹하지 않음)
+
+        Args:
+            key: 채팅방 제목
+            follow_up: 이미 실행 중일 때, 실행이 끝난 뒤 호출할 후속 요청
+
+        Returns:
+            bool: 획득했으면 True (반드시 release 호출), 이미 실행 중이면 False
+        """
+        with self._lock:
+            if key not in self._inflight:
+                self._inflight.add(key)
+                self._stats["started"] += 1
+                return True
+
+            self._stats["suppressed"] += 1
+            if follow_up is not None:
+                if key in self._follow_ups:
+                    self._stats["coalesced"] += 1
+                self._follow_ups[key] = follow_up
+
+        print(f"[singleflight] [{self.name}] [{key}] 이미 실행 중, 중복 요청 합침")
+        return False
+
+    def release(self, key: str):
+        """실행 권한 반납 후, 대기 중인 후속 요청이 있으면 background 작업 풀에 넘김 (여기서 바로 실행하지 않음)"""
+        with self._lock:
+            self._inflight.discard(key)
+            follow_up = self._follow_ups.pop(key, None)
+            if follow_up is not None:
+                self._stats["follow_ups"] += 1
+
+        if follow_up is not None:
+            print(f"[singleflight] [{self.name}] [{key}] 후속 요청 실행")
+            eventbus.run_in_pool("background", self._run_follow_up, key, follow_up)
+
+    def _run_follow_up(self, key: str, follow_up: Callable[[], None]):
+        """후속 요청 실행 (background 작업 풀 스레드)"""
+        try:
+            follow_up()
+        except Exception as e:
+            print(f"[singleflight] [{self.name}] [{key}] [ERROR] 후속 요청 실행 중 오류: {e}")
+
+    def is_busy(self, key: str) -> bool:
+        """key에 대한 실행이 진행 중인지 확인"""
+        with self._lock:
+            return key in self._inflight
+
+    def run(self, key: str, fn: Callable, *args, **kwargs) -> bool:
+        """
+        현재 스레드에서 fn 실행 (이미 실행 중이면 후속 요청으로 등록하고 바로 반환)
+
+        Returns:
+            bool: 이번 호출에서 실행했으면 True
+        """
+        follow_up = lambda: self.run(key, fn, *args, **kwargs)
+        if not self.try_acquire(key, follow_up):
+            return False
+        try:
+            fn(*args, **kwargs)
+        finally:
+            self.release(key)
+        return True
+
+    def get_stats(self) -> dict:
+        """실행 / 중복 억제 통계 반환"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["inflight"] = len(self._inflight)
+            stats["pending_follow_ups"] = len(self._follow_ups)
+        return stats
+
+
+# 채팅방별 결정(스케줄러)과 생성(제네레이터 + 전송) 실행기
+DECISIONS = SingleFlight("decision")
+GENERATIONS = SingleFlight("generation")
+
+
+def get_singleflight_stats() -> dict:
+    """결정 / 생성 실행기 통계 반환"""
+    return {
+        "decision": DECISIONS.get_stats(),
+        "generation": GENERATIONS.get_stats(),
+    }
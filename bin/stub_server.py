@@ -0,0 +1,273 @@
+"""
+OpenAI 호환 로컬 stub 서버
+- 오프라인 테스트 및 부하 벤치마크용 (실제 모델 호출 없음)
+- /v1/chat/completions (stream 포함), /v1/models 지원
+- HTTP/1.1 keep-alive로 동작하여 공유 클라이언트의 연결 재사용을 확인할 수 있음
+
+사용법:
+    python stub_server.py serve --port 8765 --latency 200
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python main.py
+
+    python stub_server.py bench --port 8765 --requests 50
+"""
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 제네레이터 요청에 돌려줄 고정 응답
+STUB_GENERATOR_REPLY = "응응<split>알겠어"
+STUB_SUMMARY_REPLY = "상대는 주말에 같이 영화 보기로 함. 이가을이 표 예매하기로 약속함."
+
+
+def _last_user_content(messages: list) -> str:
+    """요청 messages에서 마지막 user 메시지 내용 반환"""
+    for message in reversed(messages or []):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+
+def build_reply(body: dict) -> str:
+    """
+    요청 내용에 따라 응답 텍스트 생성
+    - 시스템 프롬프트가 스케줄러이면: 마지막 메시지가 질문일 때 <INSTANT>, 아니면 <WAIT>
+      (response_format이 json_schema이면 {"tag": "INSTANT"} 형식)
+    - 그 외(제네레이터): 고정 응답
+    """
+    messages = body.get("messages", [])
+    system = messages[0].get("content", "") if messages else ""
+    user = _last_user_content(messages)
+
+    if "요약기" in system:
+        return STUB_SUMMARY_REPLY
+
+    if "스케줄러" in system and "ROOM r" in user:
+        return _build_batch_reply(body, user)
+
+    if "스케줄러" in system:
+        lines = [line for line in user.splitlines() if line.strip().startswith("[")]
+        last_line = lines[-1].strip() if lines else ""
+        tag = "INSTANT" if last_line.endswith("?") else "WAIT"
+        if (body.get("response_format") or {}).get("type") == "json_schema":
+            return json.dumps({"tag": tag})
+        return f"<{tag}>"
+
+    return STUB_GENERATOR_REPLY
+
+
+def _build_batch_reply(body: dict, user: str) -> str:
+    """배치 스케줄러 요청: ROOM 구역마다 마지막 메시지가 질문이면 INSTANT"""
+    tags = {}
+    for section in re.split(r'^ROOM (r\d+):$', user, flags=re.MULTILINE)[1:]:
+        if re.fullmatch(r'r\d+', section):
+            room_id = section
+            continue
+        lines = [line for line in section.splitlines() if line.strip().startswith("[")]
+        tags[room_id] = "INSTANT" if lines and lines[-1].strip().endswith("?") else "WAIT"
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        return json.dumps(tags)
+    return "\n".join(f"{room_id}: <{tag}>" for room_id, tag in tags.items())
+
+
+def _usage(body: dict, reply: str) -> dict:
+    """대략적인 토큰 수 (문자 수 기준 추정)"""
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    prompt_tokens = max(1, prompt_chars // 2)
+    completion_tokens = max(1, len(reply) // 2)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    latency_sec = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except Exception:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        time.sleep(self.latency_sec)
+        reply = build_reply(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+
+        if body.get("stream"):
+            self._stream_reply(completion_id, created, model, reply, body)
+            return
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(body, reply),
+        })
+
+    def _stream_reply(self, completion_id, created, model, reply, body):
+        """SSE 형식으로 몇 글자씩 나눠서 전송"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        step = 3
+        for i in range(0, len(reply), step):
+            write_chunk(json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": reply[i:i + step]}, "finish_reason": None}],
+            }, ensure_ascii=False))
+            time.sleep(self.latency_sec / 10)
+
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        if (body.get("stream_options") or {}).get("include_usage"):
+            final["usage"] = _usage(body, reply)
+        write_chunk(json.dumps(final, ensure_ascii=False))
+        write_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, latency_ms: float = 0.0):
+    """stub 서버 실행 (블로킹)"""
+    StubHandler.latency_sec = latency_ms / 1000.0
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    print(f"[stub] OpenAI 호환 stub 서버 시작: http://{host}:{port}/v1 (지연 {latency_ms:.0f}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def start_in_background(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, latency_ms: float = 0.0):
+    """stub 서버를 데몬 스레드에서 실행하고 서버 객체 반환 (테스트용)"""
+    StubHandler.latency_sec = latency_ms / 1000.0
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, requests: int = 50):
+    """
+    공유 클라이언트와 호출마다 새로 만드는 클라이언트의 호출 지연 비교
+    stub 서버가 먼저 실행되어 있어야 함
+    """
+    import os
+    os.environ["OPENAI_BASE_URL"] = f"http://{host}:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import macro
+    from openai import OpenAI
+
+    messages = [
+        {"role": "system", "content": "stub"},
+        {"role": "user", "content": "[최지원] [오후 4:33] 뭐해?"},
+    ]
+
+    def run(get_client):
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client = get_client()
+            client.chat.completions.create(model="stub", messages=messages, max_completion_tokens=10)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    macro.reset_openai_client()
+    shared = run(macro.get_openai_client)
+    fresh = run(lambda: OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ["OPENAI_BASE_URL"]))
+
+    for name, latencies in (("공유 클라이언트", shared), ("매번 새 클라이언트", fresh)):
+        print(f"[stub] {name}: 평균 {sum(latencies) / len(latencies):.1f}ms, "
+              f"p50 {_percentile(latencies, 50):.1f}ms, p95 {_percentile(latencies, 95):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 호환 로컬 stub 서버")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="stub 서버 실행")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--latency", type=float, default=0.0, help="응답 지연 (ms)")
+
+    bench_parser = sub.add_parser("bench", help="공유 클라이언트 벤치마크")
+    bench_parser.add_argument("--host", default=DEFAULT_HOST)
+    bench_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    bench_parser.add_argument("--requests", type=int, default=50)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.host, args.port, args.latency)
+    else:
+        bench(args.host, args.port, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import os
+import json
+import queue
+import hashlib
+import threading
+from typing import Optional
+
+import macro
+import prompts
+import llmcall
+
+# ---------------------
+# 채팅방별 이전 대화 요약
+# ---------------------
+# 제네레이터의 최근 창(memory.GENERATOR_CONTEXT_WINDOW_LINES) 밖으로 밀려난 줄이
+# SUMMARY_MIN_NEW_LINES 줄 이상 쌓이면 백그라운드 스레드에서 "이전 요약 + 새 줄"로 요약을 갱신.
+# 답장 경로에서는 저장된 요약을 읽기만 하므로 기다리지 않음.
+# 요약은 채팅방 색인과 같은 곳(memory 폴더)에 저장되어 다시 시작해도 이어서 갱신됨
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SUMMARY_DIR = os.path.join(BASE_DIR, "memory")
+PROMPT_PATH = os.path.join(BASE_DIR, "..", "프롬프트", "summary.txt")
+
+SUMMARY_ENABLED = True
+SUMMARY_MIN_NEW_LINES = 20  # 새로 밀려난 줄이 이 이상일 때만 요약 갱신
+SUMMARY_MAX_INPUT_LINES = 200  # 한 번에 요약할 최대 줄 수 (처음 요약할 때 오래된 줄이 아주 많은 경우)
+SUMMARY_MAX_TOKENS = 1200  # 추론 토큰 + 요약(프롬프트 제한 500자, 한국어는 글자당 1토큰 안팎)
+SUMMARY_REASONING_EFFORT = "minimal"  # None이면 모델 기본값
+
+SUMMARY_HEADER = "[이전 대화 요약]"
+
+# 마지막으로 처리한 위치를 찾을 때 함께 비교하는 줄 수 (같은 분에 같은 내용의 줄이 반복되는 경우 구분)
+ANCHOR_LINES = 5
+
+# {title_key: {"summary": str, "anchor": 마지막으로 요약한 위치 (line_anchor), "lines": int}}
+_states = {}
+_states_lock = threading.Lock()
+
+# 요약 대기 중인 채팅방 ({title_key: 오래된 줄 리스트}, 같은 채팅방은 마지막 요청만 유지)
+_pending = {}
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+_stats = {"updates": 0, "failures": 0, "truncated": 0, "summarized_lines": 0}
+
+
+def _state_path(title_key: str) -> str:
+    room_hash = hashlib.sha1(title_key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SUMMARY_DIR, room_hash + ".summary.json")
+
+
+def _line_hash(line: str) -> str:
+    return hashlib.sha1(line.encode("utf-8")).hexdigest()[:16]
+
+
+def line_anchor(lines: list) -> dict:
+    """
+    처리한 위치 기록 (다음에 resume_index로 이어서 처리할 위치를 찾음)
+    {"lines": 마지막 ANCHOR_LINES 줄의 해시, "position": 처리한 줄 수}
+    """
+    return {"lines": [_line_hash(line) for line in lines[-ANCHOR_LINES:]], "position": len(lines)}
+
+
+def resume_index(lines: list, anchor: Optional[dict]) -> int:
+    """
+    anchor 다음 줄의 위치 (lines[index:]가 아직 처리하지 않은 줄)
+    줄 내용만이 아니라 앞 줄까지 이어서 비교하고, 같은 내용이 여러 곳에 있으면
+    (같은 분의 "[친구] [오후 1:00] ㅋㅋ" 반복 등) 기록한 위치에서 가장 가까운 곳을 고름
+    (복사 범위 앞부분이 밀려나면 줄 위치는 앞으로만 당겨지므로 기록한 위치 이하 중 가장 뒤)
+    anchor 전체가 없으면 뒤쪽 줄만으로 다시 찾고, 끝내 없으면 0 (전체)
+    """
+    if not anchor:
+        return 0
+    hashes = [_line_hash(line) for line in lines]
+    anchor_lines, position = anchor.get("lines", []), anchor.get("position")
+    for size in range(min(len(anchor_lines), len(hashes)), 0, -1):
+        tail = anchor_lines[-size:]
+        ends = [end for end in range(size, len(hashes) + 1) if hashes[end - size:end] == tail]
+        if not ends:
+            continue
+        if position is None:
+            return ends[-1]
+        before = [end for end in ends if end <= position]
+        return before[-1] if before else ends[0]
+    return 0
+
+
+def _load_state(title_key: str) -> dict:
+    """채팅방 요약 상태 (메모리에 없으면 파일에서 읽음)"""
+    with _states_lock:
+        state = _states.get(title_key)
+    if state is not None:
+        return state
+
+    state = {"summary": "", "anchor": None, "lines": 0}
+    path = _state_path(title_key)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state.update(json.load(f))
+            # 이전 형식 (마지막 줄 해시 하나)
+            last_line = state.pop("last_line", None)
+            if last_line and not state["anchor"]:
+                state["anchor"] = {"lines": [last_line], "position": None}
+        except Exception as e:
+            print(f"[summary] [{title_key}] [ERROR] 요약 로드 실패: {e}")
+    with _states_lock:
+        return _states.setdefault(title_key, state)
+
+
+def _save_state(title_key: str, state: dict):
+    os.makedirs(SUMMARY_DIR, exist_ok=True)
+    path = _state_path(title_key)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"title": title_key, **state}, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _new_lines(state: dict, older_lines: list) -> list:
+    """마지막으로 요약한 줄 이후의 줄 (찾지 못하면 전체)"""
+    return older_lines[resume_index(older_lines, state["anchor"]):]
+
+
+def get_summary(title_key: str) -> str:
+    """저장된 요약 반환 (없으면 빈 문자열)"""
+    if not SUMMARY_ENABLED:
+        return ""
+    return _load_state(title_key)["summary"]
+
+
+def schedule_update(title_key: str, older_lines: list) -> bool:
+    """
+    새로 밀려난 줄이 충분하면 백그라운드 요약 갱신 예약 (기다리지 않음)
+
+    Args:
+        title_key: 채팅방 제목
+        older_lines: 최근 창 밖의 줄 리스트
+
+    Returns:
+        bool: 갱신을 예약했으면 True
+    """
+    if not SUMMARY_ENABLED:
+        return False
+    state = _load_state(title_key)
+    if len(_new_lines(state, older_lines)) < SUMMARY_MIN_NEW_LINES:
+        return False
+
+    with _worker_lock:
+        already_queued = title_key in _pending
+        _pending[title_key] = list(older_lines)
+        _ensure_worker()
+    if not already_queued:
+        _queue.put(title_key)
+    return True
+
+
+def _ensure_worker():
+    """요약 스레드 시작 (_worker_lock을 잡은 상태)"""
+    global _worker
+    if _worker is None:
+        _worker = threading.Thread(target=_worker_loop, daemon=True)
+        _worker.start()
+
+
+def _worker_loop():
+    while True:
+        title_key = _queue.get()
+        with _worker_lock:
+            older_lines = _pending.pop(title_key, None)
+        if older_lines is None:
+            continue
+        try:
+            update_summary(title_key, older_lines)
+        except Exception as e:
+            _stats["failures"] += 1
+            print(f"[summary] [{title_key}] [ERROR] 요약 갱신 중 오류: {e}")
+
+
+def _build_summary_messages(previous: str, new_lines: list) -> Optional[list]:
+    prompt = prompts.load_prompt(PROMPT_PATH)
+    if not prompt:
+        print(f"[summary] [ERROR] 프롬프트를 로드할 수 없음")
+        return None
+    user_message = f"이전 요약:\n{previous or '(없음)'}\n\n새 대화:\n" + "\n".join(new_lines)
+    return prompts.build_messages(prompt, user_message)
+
+
+def update_summary(title_key: str, older_lines: list) -> Optional[str]:
+    """
+    이전 요약 + 새로 밀려난 줄로 요약 갱신 (요약 스레드에서 호출, 동기 API 호출)
+
+    Returns:
+        갱신된 요약 또는 None (갱신할 줄이 없거나 실패)
+    """
+    state = _load_state(title_key)
+    new_lines = _new_lines(state, older_lines)[-SUMMARY_MAX_INPUT_LINES:]
+    if not new_lines:
+        return None
+
+    client = macro.get_openai_client()
+    messages = _build_summary_messages(state["summary"], new_lines)
+    if not client or messages is None:
+        return None
+
+    kwargs = {
+        "model": "gpt-5-mini",
+        "messages": messages,
+        "max_completion_tokens": SUMMARY_MAX_TOKENS,
+        **prompts.cache_request_options("summary", title_key)
+    }
+    if SUMMARY_REASONING_EFFORT:
+        kwargs.setdefault("extra_body", {})["reasoning_effort"] = SUMMARY_REASONING_EFFORT
+    try:
+        response = llmcall.create("summary", title_key, client, **kwargs)
+    except Exception as e:
+        _stats["failures"] += 1
+        print(f"[summary] [{title_key}] 요약 API 호출 실패: {e}")
+        return None
+    if not response or not response.choices or not response.choices[0].message.content:
+        _stats["failures"] += 1
+        return None
+
+    prompts.report_usage("summary", title_key, messages, response)
+    if response.choices[0].finish_reason == "length":
+        # 토큰 한도에서 잘린 요약은 버리고 이전 요약 유지 (다음 갱신 때 같은 줄부터 다시 요약)
+        _stats["truncated"] += 1
+        print(f"[summary] [{title_key}] [WARNING] 요약이 토큰 한도에서 잘림, 이전 요약 유지")
+        return None
+    summary_text = response.choices[0].message.content.strip()
+    with _states_lock:
+        state["summary"] = summary_text
+        state["anchor"] = line_anchor(older_lines)
+        state["lines"] += len(new_lines)
+        snapshot = dict(state)
+    _stats["updates"] += 1
+    _stats["summarized_lines"] += len(new_lines)
+    try:
+        _save_state(title_key, snapshot)
+    except Exception as e:
+        print(f"[summary] [{title_key}] [ERROR] 요약 저장 실패: {e}")
+
+    print(f"[summary] [{title_key}] 요약 갱신: 새 줄 {len(new_lines)}줄 → {len(summary_text)}자")
+    return summary_text
+
+
+def get_summary_stats() -> dict:
+    """요약 갱신 통계 반환 (대기 중인 채팅방 수 포함)"""
+    stats = dict(_stats)
+    with _worker_lock:
+        stats["pending"] = len(_pending)
+    return stats
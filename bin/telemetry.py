@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+import macro
+
+# ---------------------
+# LLM 호출별 측정값 기록
+# ---------------------
+# llmcall을 거치는 모든 호출(스케줄러 / 제네레이터)에 대해
+# 소요 시간, 첫 토큰까지 시간, 입력/출력/캐시 토큰, 추정 비용, 모델, 채팅방, 결과를
+# 로컬 JSONL 파일(크기 기준으로 순환)에 한 줄씩 남기고, 주기적으로 GUI 로그에 요약
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.path.join(BASE_DIR, "metrics")
+METRICS_PATH = os.path.join(METRICS_DIR, "llm_calls.jsonl")
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+METRICS_BACKUP_COUNT = 3
+
+# GUI 로그에 요약을 남기는 주기 (호출 수), 요약에 사용할 최근 호출 수
+TELEMETRY_LOG_EVERY = 20
+TELEMETRY_HISTORY = 500
+
+# 모델별 100만 토큰당 단가 (USD, 입력 / 캐시 입력 / 출력). 목록에 없으면 비용 0으로 기록
+MODEL_PRICES = {
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-4.1-mini": (0.80, 0.20, 3.20),  # fine-tuning 모델(ft:gpt-4.1-mini...)도 이 단가 사용
+}
+
+_logger = None
+_logger_lock = threading.Lock()
+
+_records_lock = threading.Lock()
+_records = deque(maxlen=TELEMETRY_HISTORY)
+_record_count = 0
+
+
+def _get_logger() -> logging.Logger:
+    """측정값 파일 logger (처음 기록할 때 생성)"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            handler = RotatingFileHandler(
+                METRICS_PATH, maxBytes=METRICS_MAX_BYTES, backupCount=METRICS_BACKUP_COUNT, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("turing.telemetry")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+def _model_price(model: str) -> Optional[tuple]:
+    if model.startswith("ft:"):
+        model = model.split(":")[1]
+    for name, price in MODEL_PRICES.items():
+        if model.startswith(name):
+            return price
+    return None
+
+
+def estimate_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    """토큰 수로 추정 비용(USD) 계산"""
+    price = _model_price(model or "")
+    if price is None:
+        return 0.0
+    input_price, cached_price, output_price = price
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+def start_record(kind: str, title_key: str, kwargs: dict) -> dict:
+    """
+    호출 시작 시 기록 생성 (llmcall에서 사용)
+
+    Args:
+        kind: 호출 종류 ("scheduler", "generator")
+        title_key: 채팅방 제목
+        kwargs: chat.completions.create 인자
+    """
+    return {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "kind": kind,
+        "room": title_key,
+        "model": kwargs.get("model"),
+        "stream": bool(kwargs.get("stream")),
+        "attempts": 0,
+        "hedged": False,
+        "_start": time.perf_counter(),
+        "_first_token": None,
+    }
+
+
+def mark_first_token(record: dict):
+    """스트리밍에서 첫 내용 조각을 받은 시점 기록"""
+    if record["_first_token"] is None:
+        record["_first_token"] = time.perf_counter()
+
+
+def finish_record(record: dict, outcome: str, usage=None, error: Optional[Exception] = None):
+    """
+    호출 종료 시 기록 완성 후 파일에 남김
+
+    Args:
+        record: start_record 결과
+        outcome: "ok" | "timeout" | "circuit_open" | "rate_limited" | "error" | "cancelled"
+        usage: 응답의 usage (없으면 토큰 0)
+        error: 실패 원인
+    """
+    global _record_count
+    end = time.perf_counter()
+    start = record.pop("_start")
+    first_token = record.pop("_first_token")
+    if first_token is None and outcome == "ok":
+        first_token = end  # 스트리밍이 아니면 응답 전체가 한 번에 도착
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    record.update({
+        "wall_sec": round(end - start, 4),
+        "ttft_sec": round(first_token - start, 4) if first_token is not None else None,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": round(estimate_cost(record["model"], prompt_tokens, cached_tokens, completion_tokens), 6),
+        "outcome": outcome,
+        "error": f"{type(error).__name__}: {error}" if error is not None else None,
+    })
+
+    try:
+        _get_logger().info(json.dumps(record, ensure_ascii=False))
+    except Exception as e:
+        print(f"[telemetry] [ERROR] 측정값 기록 실패: {e}")
+
+    with _records_lock:
+        _records.append(record)
+        _record_count += 1
+        count = _record_count
+    if count % TELEMETRY_LOG_EVERY == 0:
+        _log_summary()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def get_telemetry_summary() -> dict:
+    """
+    최근 호출의 종류별 요약 반환
+
+    Returns:
+        dict: {kind: {"calls", "ok_rate", "p50_sec", "p95_sec", "ttft_p95_sec",
+                      "avg_prompt_tokens", "avg_completion_tokens", "cached_rate", "cost_usd"}}
+    """
+    with _records_lock:
+        records = list(_records)
+
+    summary = {}
+    for kind in sorted({record["kind"] for record in records}):
+        items = [record for record in records if record["kind"] == kind]
+        ok = [record for record in items if record["outcome"] == "ok"]
+        walls = sorted(record["wall_sec"] for record in ok)
+        ttfts = sorted(record["ttft_sec"] for record in ok if record["ttft_sec"] is not None)
+        prompt_tokens = sum(record["prompt_tokens"] for record in ok)
+        summary[kind] = {
+            "calls": len(items),
+            "ok_rate": len(ok) / len(items),
+            "p50_sec": _percentile(walls, 0.50),
+            "p95_sec": _percentile(walls, 0.95),
+            "ttft_p95_sec": _percentile(ttfts, 0.95),
+            "avg_prompt_tokens": prompt_tokens / len(ok) if ok else 0.0,
+            "avg_completion_tokens": sum(record["completion_tokens"] for record in ok) / len(ok) if ok else 0.0,
+            "cached_rate": sum(record["cached_tokens"] for record in ok) / prompt_tokens if prompt_tokens else 0.0,
+            "cost_usd": sum(record["cost_usd"] for record in items),
+        }
+    return summary
+
+
+def _log_summary():
+    """종류별 요약을 GUI 로그에 한 줄씩 남김"""
+    time_str = datetime.now().strftime("%H:%M:%S")
+    for kind, stats in get_telemetry_summary().items():
+        macro.log_message(
+            f"[{time_str}] [측정] {kind} 최근 {stats['calls']}회: p50 {stats['p50_sec']:.2f}s / "
+            f"p95 {stats['p95_sec']:.2f}s (첫 토큰 p95 {stats['ttft_p95_sec']:.2f}s), "
+            f"토큰 {stats['avg_prompt_tokens']:.0f}→{stats['avg_completion_tokens']:.0f} "
+            f"(캐시 {stats['cached_rate']*100:.0f}%), 성공 {stats['ok_rate']*100:.0f}%, ${stats['cost_usd']:.4f}"
+        )
@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import functools
+import inspect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+# ---------------------
+# 픽셀 변경 → 메시지 전송 지연 시간 추적 (trace / span)
+# ---------------------
+# 새 메시지가 감지될 때마다(watcher_loop / watch_chatting_room) 채팅방에 trace ID를 새로 붙이고,
+# 이후 단계(감지, 큐 대기, 채팅방 열기, 복사, 스케줄러, 제네레이터, 전송)를 span으로 남김
+# - span은 채팅방의 현재 trace에 붙음 (title_key를 모르면 바깥 span의 채팅방 사용)
+# - 같은 단계 안에서 다시 열린 span은 기록하지 않음 (배치 → 단일 스케줄러 요청 등 중복 집계 방지)
+# - 답장 전송이 끝나면 감지부터 전송까지 전체 시간을 "total"로 남김
+# 로컬 JSONL 파일(크기 기준 순환)에 한 줄씩 기록, 단계별 p50 / p95 / p99는
+#   python tracing.py [--path 파일] [--room 채팅방]
+
+TRACING_ENABLED = True
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.path.join(BASE_DIR, "metrics")
+TRACE_PATH = os.path.join(METRICS_DIR, "traces.jsonl")
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+
+# 요약 출력 순서 (목록에 없는 단계는 뒤에 이름순)
+STAGE_ORDER = ("detect", "queue", "open", "copy", "schedule", "generate", "send", "send_message", "total")
+
+_logger = None
+_logger_lock = threading.Lock()
+
+# {title_key: {"trace_id", "started"}} 채팅방별 현재 trace (가장 최근에 감지된 메시지)
+_active = {}
+_active_lock = threading.Lock()
+
+# 현재 열려 있는 span {"trace_id", "title_key", "stage"} (스레드 / asyncio 태스크별)
+_current_span = contextvars.ContextVar("tracing_span", default=None)
+
+
+def _get_logger() -> logging.Logger:
+    """trace 파일 logger (처음 기록할 때 생성)"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            handler = RotatingFileHandler(
+                TRACE_PATH, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUP_COUNT, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("turing.tracing")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+def new_trace(title_key: str, started: Optional[float] = None) -> str:
+    """
+    새 메시지 감지: 채팅방에 새 trace 시작 (이전 trace는 대체됨)
+
+    Args:
+        title_key: 채팅방 제목 (정제된 key)
+        started: 감지 시각 (time.time(), None이면 지금)
+
+    Returns:
+        trace ID
+    """
+    trace_id = uuid.uuid4().hex[:16]
+    with _active_lock:
+        _active[title_key] = {"trace_id": trace_id, "started": started or time.time()}
+    return trace_id
+
+
+def get_trace(title_key: str) -> Optional[dict]:
+    """채팅방의 현재 trace {"trace_id", "started"} (없으면 None)"""
+    with _active_lock:
+        trace = _active.get(title_key)
+        return dict(trace) if trace else None
+
+
+def _resolve(title_key: Optional[str]) -> tuple:
+    """(title_key, trace_id): title_key가 없으면 바깥 span의 채팅방 사용"""
+    parent = _current_span.get()
+    if title_key is None and parent is not None:
+        return parent["title_key"], parent["trace_id"]
+    trace = get_trace(title_key) if title_key else None
+    return title_key, trace["trace_id"] if trace else None
+
+
+def _write(record: dict):
+    try:
+        _get_logger().info(json.dumps(record, ensure_ascii=False))
+    except Exception as e:
+        print(f"[tracing] [ERROR] trace 기록 실패: {e}")
+
+
+def record(stage: str, start: float, end: float, title_key: Optional[str] = None, status: str = "ok", **attrs):
+    """
+    시작 / 끝 시각을 직접 잰 구간 기록 (큐 대기처럼 여러 스레드에 걸친 구간, 스트리밍 생성 등)
+
+    Args:
+        stage: 단계 이름
+        start / end: time.time() 시각
+        title_key: 채팅방 제목 (None이면 바깥 span의 채팅방)
+    """
+    if not TRACING_ENABLED:
+        return
+    title_key, trace_id = _resolve(title_key)
+    parent = _current_span.get()
+    _write({
+        "trace_id": trace_id,
+        "room": title_key,
+        "stage": stage,
+        "parent": parent["stage"] if parent else None,
+        "start": round(start, 4),
+        "duration_ms": round((end - start) * 1000, 2),
+        "status": status,
+        **attrs,
+    })
+
+
+@contextmanager
+def span(stage: str, title_key: Optional[str] = None, **attrs):
+    """
+    with 블록 실행 시간을 span으로 기록 (안쪽에서 연 span은 이 span의 채팅방 / trace를 이어받음)
+    예외가 나면 status "error", asyncio 취소면 "cancelled"로 기록하고 예외는 그대로 전달
+    """
+    parent = _current_span.get()
+    if not TRACING_ENABLED or (parent is not None and parent["stage"] == stage):
+        yield
+        return
+
+    resolved_title, trace_id = _resolve(title_key)
+    token = _current_span.set({"trace_id": trace_id, "title_key": resolved_title, "stage": stage})
+    start = time.time()
+    status = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        end = time.time()
+        _current_span.reset(token)
+        record(stage, start, end, resolved_title, status, **attrs)
+
+
+def traced(stage: str):
+    """
+    함수 전체를 span으로 기록하는 decorator (일반 함수 / async 함수)
+    채팅방은 함수의 title_key 인자, 없으면 바깥 span에서 가져옴
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        def title_of(args, kwargs) -> Optional[str]:
+            try:
+                return signature.bind_partial(*args, **kwargs).arguments.get("title_key")
+            except TypeError:
+                return None
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage, title_of(args, kwargs)):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, title_of(args, kwargs)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def end_trace(title_key: str, outcome: str = "sent"):
+    """답장 전송 완료: 감지부터 지금까지를 "total"로 기록하고 채팅방 trace 종료"""
+    with _active_lock:
+        trace = _active.pop(title_key, None)
+    if trace is None or not TRACING_ENABLED:
+        return
+    end = time.time()
+    _write({
+        "trace_id": trace["trace_id"],
+        "room": title_key,
+        "stage": "total",
+        "parent": None,
+        "start": round(trace["started"], 4),
+        "duration_ms": round((end - trace["started"]) * 1000, 2),
+        "status": outcome,
+    })
+
+
+# ---------------------
+# 요약 (단계별 p50 / p95 / p99)
+# ---------------------
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def load_spans(path: str = TRACE_PATH) -> list:
+    """trace 파일과 순환된 이전 파일(path.1 ...)의 span 목록 (오래된 것부터)"""
+    paths = [f"{path}.{i}" for i in range(TRACE_BACKUP_COUNT, 0, -1)] + [path]
+    spans = []
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+
+def summarize(spans: list, room: Optional[str] = None) -> dict:
+    """
+    단계별 지연 시간 분포
+
+    Returns:
+        dict: {stage: {"count", "errors", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+    """
+    durations = {}
+    errors = {}
+    for item in spans:
+        if room is not None and item.get("room") != room:
+            continue
+        stage = item.get("stage")
+        durations.setdefault(stage, []).append(item.get("duration_ms", 0.0))
+        if item.get("status") in ("error", "cancelled"):
+            errors[stage] = errors.get(stage, 0) + 1
+
+    summary = {}
+    order = {stage: i for i, stage in enumerate(STAGE_ORDER)}
+    for stage in sorted(durations, key=lambda s: (order.get(s, len(order)), s)):
+        values = sorted(durations[stage])
+        summary[stage] = {
+            "count": len(values),
+            "errors": errors.get(stage, 0),
+            "p50_ms": _percentile(values, 0.50),
+            "p95_ms": _percentile(values, 0.95),
+            "p99_ms": _percentile(values, 0.99),
+            "max_ms": values[-1],
+        }
+    return summary
+
+
+def print_summary(summary: dict):
+    print(f"{'stage':<14}{'count':>7}{'errors':>8}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+    for stage, stats in summary.items():
+        print(
+            f"{stage:<14}{stats['count']:>7}{stats['errors']:>8}{stats['p50_ms']:>11.1f}"
+            f"{stats['p95_ms']:>11.1f}{stats['p99_ms']:>11.1f}{stats['max_ms']:>11.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="trace 파일 단계별 지연 시간 요약")
+    parser.add_argument("--path", default=TRACE_PATH, help="trace JSONL 파일")
+    parser.add_argument("--room", default=None, help="이 채팅방의 span만 요약")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    if not spans:
+        print(f"[tracing] 기록된 span 없음: {args.path}")
+        return
+    traces = {item.get("trace_id") for item in spans if item.get("trace_id")}
+    print(f"[tracing] span {len(spans)}개, trace {len(traces)}개 ({args.path})")
+    print_summary(summarize(spans, args.room))
+
+
+if __name__ == "__main__":
+    main()
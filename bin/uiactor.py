@@ -0,0 +1,172 @@
+import time
+import heapq
+import itertools
+import threading
+from typing import Optional, Callable
+
+# ---------------------
+# 마우스 / 키보드 단독 사용 (UI actor)
+# ---------------------
+# 클릭 / 단축키가 들어가는 여러 단계 작업(채팅방 복사, 메시지 전송, 채팅방 열기, 종료)은
+# 하나의 actor 스레드가 우선순위 큐에서 하나씩 꺼내 끝까지 실행 (중간에 다른 작업이 끼어들지 않음)
+# 요청한 스레드는 작업이 끝날 때까지 기다렸다가 결과를 받음
+# 작업이 실행 중인 동안(is_busy) 픽셀 변경 감지는 쉼 (예전 clicking_in_progress / copying_in_progress)
+
+# 숫자가 작을수록 먼저 처리
+TRANSACTION_PRIORITY = {
+    "send_message": 0,  # 답장 전송이 가장 먼저
+    "copy_room": 1,
+    "finish": 1,
+    "open_room": 2,
+}
+
+# 이보다 오래 기다린 작업은 로그로 남김
+UI_WAIT_WARN_SEC = 1.0
+
+
+class UIActor:
+    def __init__(self):
+        self._cond = threading.Condition()
+        # [(priority, seq, command)] 대기 중인 작업
+        self._queue = []
+        self._seq = itertools.count()
+        self._current = None  # 실행 중인 작업 이름
+        self._thread = None
+        self._stats = {}
+
+    def _ensure_thread(self):
+        """actor 스레드 시작 (_cond를 잡은 상태)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _name_stats(self, name: str) -> dict:
+        return self._stats.setdefault(name, {
+            "count": 0,
+            "errors": 0,
+            "wait_sec": 0.0,  # 큐에서 기다린 시간 합
+            "max_wait_sec": 0.0,
+            "hold_sec": 0.0,  # 마우스 / 키보드를 잡고 있던 시간 합
+            "max_hold_sec": 0.0,
+        })
+
+    def submit(self, name: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        작업 하나를 actor에서 실행하고 결과 반환 (끝날 때까지 대기)
+
+        Args:
+            name: 작업 이름 (TRANSACTION_PRIORITY 키)
+            fn: 실행할 함수 (클릭 / 단축키를 포함한 여러 단계)
+            timeout: 실행이 시작되기까지 최대 대기 시간 (None이면 무제한, 넘으면 TimeoutError)
+
+        Returns:
+            fn의 반환값 (fn이 예외를 던지면 그대로 전달)
+        """
+        # 작업 안에서 다시 요청하면 바로 실행 (이미 마우스 / 키보드를 잡고 있음)
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+
+        command = {
+            "name": name, "fn": fn, "args": args, "kwargs": kwargs,
+            "enqueued": time.perf_counter(), "started": False, "cancelled": False,
+            "done": threading.Event(), "result": None, "error": None,
+        }
+        with self._cond:
+            priority = TRANSACTION_PRIORITY.get(name, len(TRANSACTION_PRIORITY))
+            heapq.heappush(self._queue, (priority, next(self._seq), command))
+            self._ensure_thread()
+            self._cond.notify()
+
+        if not command["done"].wait(timeout):
+            with self._cond:
+                if not command["started"]:
+                    command["cancelled"] = True
+                    raise TimeoutError(f"UI 작업 대기 시간 초과: {name}")
+            command["done"].wait()
+
+        if command["error"] is not None:
+            raise command["error"]
+        return command["result"]
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, command = heapq.heappop(self._queue)
+                if command["cancelled"]:
+                    continue
+                command["started"] = True
+                self._current = command["name"]
+
+            start = time.perf_counter()
+            try:
+                command["result"] = command["fn"](*command["args"], **command["kwargs"])
+            except Exception as e:
+                command["error"] = e
+            end = time.perf_counter()
+
+            wait_sec = start - command["enqueued"]
+            hold_sec = end - start
+            with self._cond:
+                self._current = None
+                stats = self._name_stats(command["name"])
+                stats["count"] += 1
+                stats["errors"] += command["error"] is not None
+                stats["wait_sec"] += wait_sec
+                stats["max_wait_sec"] = max(stats["max_wait_sec"], wait_sec)
+                stats["hold_sec"] += hold_sec
+                stats["max_hold_sec"] = max(stats["max_hold_sec"], hold_sec)
+            command["done"].set()
+
+            if wait_sec >= UI_WAIT_WARN_SEC:
+                print(f"[uiactor] [{command['name']}] {wait_sec:.2f}초 대기 후 실행 ({hold_sec:.2f}초 사용)")
+
+    def busy(self) -> bool:
+        """작업이 실행 중인지 (마우스 / 키보드 사용 중)"""
+        return self._current is not None
+
+    def get_stats(self) -> dict:
+        """
+        작업별 대기 / 사용 시간 통계와 현재 상태 반환
+
+        Returns:
+            dict: {"current", "queued", "transactions": {name: {"count", "errors",
+                   "avg_wait_sec", "max_wait_sec", "avg_hold_sec", "max_hold_sec"}}}
+        """
+        with self._cond:
+            transactions = {
+                name: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "avg_wait_sec": stats["wait_sec"] / stats["count"] if stats["count"] else 0.0,
+                    "max_wait_sec": stats["max_wait_sec"],
+                    "avg_hold_sec": stats["hold_sec"] / stats["count"] if stats["count"] else 0.0,
+                    "max_hold_sec": stats["max_hold_sec"],
+                }
+                for name, stats in self._stats.items()
+            }
+            return {
+                "current": self._current,
+                "queued": sum(1 for _, _, command in self._queue if not command["cancelled"]),
+                "transactions": transactions,
+            }
+
+
+# 마우스 / 키보드를 쓰는 모든 작업이 거치는 actor
+ACTOR = UIActor()
+
+
+def transaction(name: str, fn: Callable, *args, **kwargs):
+    """ACTOR.submit 단축 함수"""
+    return ACTOR.submit(name, fn, *args, **kwargs)
+
+
+def is_busy() -> bool:
+    """마우스 / 키보드 작업 실행 중이면 True (픽셀 변경 감지를 쉼)"""
+    return ACTOR.busy()
+
+
+def get_uiactor_stats() -> dict:
+    """UI actor 통계 반환"""
+    return ACTOR.get_stats()